@@ -0,0 +1,254 @@
+"""
+Бюджет времени импорта при холодном запуске.
+
+Запускает импорт модуля приложения (по умолчанию src/main.py) в отдельных
+процессах с ключом интерпретатора -X importtime, берет медиану по запускам
+и выводит общее время, разбивку по пакетам верхнего уровня и самые
+медленные модули. Скрипт завершается с кодом 1, если общее время превышает
+бюджет, время пакета выросло относительно базовых значений сверх
+допустимого отклонения или при запуске загружается модуль, который
+должен загружаться только по требованию.
+
+Время пакетов сравнивается в долях эталонного импорта (набор модулей
+стандартной библиотеки, не зависящий от кода приложения), измеренного
+в том же запуске, поэтому базовые значения переносимы между машинами.
+Бюджет общего времени - абсолютный.
+
+Примеры запуска:
+    python benchmarks/import_bench.py                      # сравнение с базой и бюджетом
+    python benchmarks/import_bench.py --budget-ms 800      # другой бюджет
+    python benchmarks/import_bench.py --record             # перезапись базовых значений
+"""
+# Импорт необходимых библиотек
+import argparse     # Разбор аргументов командной строки
+import json         # Чтение и запись базовых значений
+import os           # Работа с файлами
+import platform     # Описание окружения в базовых значениях
+import re           # Разбор строк вывода -X importtime
+import statistics   # Медиана по запускам
+import subprocess   # Запуск импорта в чистом процессе
+import sys          # Путь к текущему интерпретатору
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "imports.json"
+
+# Модули, которые загружаются по требованию и не должны попадать в запуск
+DEFERRED_MODULES = ("psutil", "api.proxy")
+
+# Изменения времени пакета меньше этого порога (в мс) считаются шумом измерения
+MIN_TIME_DELTA_MS = 5.0
+
+# Допустимое замедление пакета по умолчанию, если оно не сохранено в базовых значениях
+DEFAULT_TOLERANCE = 0.5
+
+# Эталонный импорт: модули стандартной библиотеки, которые приложение не изменяет
+REFERENCE_IMPORT = "asyncio, decimal, email.parser, http.client, json, sqlite3, xml.dom.minidom"
+
+# Строка вывода: "import time:  self [us] | cumulative | imported package"
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def run_once(module: str) -> dict:
+    """
+    Импорт модуля в новом процессе.
+
+    Args:
+        module (str): Импортируемый модуль приложения
+
+    Returns:
+        dict: Имя модуля -> (собственное время, время вместе с зависимостями) в мкс
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return timings
+
+
+def measure(module: str, runs: int) -> dict:
+    """
+    Медианы времени импорта по нескольким запускам.
+
+    Первый запуск не учитывается: он компилирует .pyc и прогревает
+    файловый кэш.
+
+    Returns:
+        dict: {"total_ms", "packages": {пакет: мс}, "modules": {модуль: [собств., общее]}}
+    """
+    run_once(module)
+    samples = [run_once(module) for _ in range(runs)]
+
+    totals = []
+    package_samples = defaultdict(list)
+    module_samples = defaultdict(list)
+    for timings in samples:
+        totals.append(sum(own for own, _ in timings.values()) / 1000)
+        packages = defaultdict(int)
+        for name, (own, cumulative) in timings.items():
+            packages[name.split(".")[0]] += own
+            module_samples[name].append((own, cumulative))
+        for package, own in packages.items():
+            package_samples[package].append(own / 1000)
+
+    return {
+        "total_ms": statistics.median(totals),
+        "packages": {
+            package: statistics.median(values + [0.0] * (runs - len(values)))
+            for package, values in package_samples.items()
+        },
+        "modules": {
+            name: [statistics.median(own for own, _ in values) / 1000,
+                   statistics.median(cumulative for _, cumulative in values) / 1000]
+            for name, values in module_samples.items()
+        }
+    }
+
+
+def speed_factor(results: dict, baseline: dict) -> float:
+    """
+    Во сколько раз текущая машина медленнее машины базовых значений.
+
+    Отношение времени эталонного импорта текущего и базового запусков;
+    1.0, если в базовых значениях эталона нет.
+    """
+    expected = baseline.get("reference_ms")
+    current = results.get("reference_ms")
+    if not expected or not current:
+        return 1.0
+    return current / expected
+
+
+def compare(results: dict, baseline: dict, budget_ms: float, tolerance: float) -> list:
+    """
+    Проверка бюджета, базовых значений и отложенных модулей.
+
+    Базовое время пакетов пересчитывается на скорость текущей машины
+    (см. speed_factor).
+
+    Returns:
+        list: Описания обнаруженных нарушений
+    """
+    problems = []
+    if results["total_ms"] > budget_ms:
+        problems.append(f"total: {results['total_ms']:.1f}ms > budget {budget_ms:.0f}ms")
+
+    factor = speed_factor(results, baseline)
+    for package, current in results["packages"].items():
+        expected = baseline.get("packages", {}).get(package)
+        if expected is None:
+            continue
+        expected *= factor
+        if current > expected * (1 + tolerance) and current - expected > MIN_TIME_DELTA_MS:
+            problems.append(
+                f"{package}: {current:.1f}ms > {expected:.1f}ms (+{tolerance:.0%})"
+            )
+
+    for name in DEFERRED_MODULES:
+        if name in results["modules"]:
+            problems.append(f"{name}: imported at startup, expected to load on demand")
+    return problems
+
+
+def print_results(results: dict, baseline: dict, top: int):
+    """Вывод общего времени, разбивки по пакетам и самых медленных модулей."""
+    factor = speed_factor(results, baseline)
+    expected_total = baseline.get("total_ms")
+    change = f" ({results['total_ms'] / (expected_total * factor) - 1:+.0%} vs base)" \
+        if expected_total else ""
+    print(f"Total import time: {results['total_ms']:.1f}ms{change}")
+    print(f"Reference import: {results['reference_ms']:.1f}ms "
+          f"(machine speed factor {factor:.2f})\n")
+
+    print(f"{'package':<28}{'self, ms':>12}{'share':>8}{'vs base':>10}")
+    packages = sorted(results["packages"].items(), key=lambda item: item[1], reverse=True)
+    for package, current in packages[:top]:
+        expected = baseline.get("packages", {}).get(package)
+        change = f"{current / (expected * factor) - 1:+.0%}" if expected else ""
+        share = current / results["total_ms"] if results["total_ms"] else 0
+        print(f"{package:<28}{current:>12.1f}{share:>8.0%}{change:>10}")
+
+    print(f"\n{'module':<40}{'self, ms':>12}{'cumulative, ms':>16}")
+    modules = sorted(results["modules"].items(), key=lambda item: item[1][1], reverse=True)
+    for name, (own, cumulative) in modules[:top]:
+        print(f"{name:<40}{own:>12.1f}{cumulative:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бюджет времени импорта при запуске")
+    parser.add_argument("--module", default="main", help="импортируемый модуль из src")
+    parser.add_argument("--runs", type=int, default=5, help="количество замеров")
+    parser.add_argument("--budget-ms", type=float, default=1000.0,
+                        help="максимальное общее время импорта")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                        help="файл базовых значений")
+    parser.add_argument("--record", action="store_true",
+                        help="записать результаты как новые базовые значения")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="допустимое относительное замедление пакета "
+                             f"(по умолчанию - из базовых значений или {DEFAULT_TOLERANCE})")
+    parser.add_argument("--top", type=int, default=15, help="строк в таблицах")
+    args = parser.parse_args()
+
+    baseline_data = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_data = json.load(f)
+    baseline = baseline_data.get("results", {}).get(args.module, {})
+    tolerance = args.tolerance if args.tolerance is not None \
+        else baseline_data.get("meta", {}).get("tolerance", DEFAULT_TOLERANCE)
+
+    results = measure(args.module, args.runs)
+    results["reference_ms"] = measure(REFERENCE_IMPORT, args.runs)["total_ms"]
+    print_results(results, baseline, args.top)
+
+    if args.record:
+        recorded = dict(baseline_data.get("results", {}))
+        recorded[args.module] = {
+            "total_ms": results["total_ms"],
+            "reference_ms": results["reference_ms"],
+            "packages": results["packages"]
+        }
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "machine": platform.machine(),
+                    "processor": platform.processor(),
+                    "cpu_count": os.cpu_count(),
+                    # Время пакетов сравнивается в долях эталонного импорта
+                    # с этим отклонением; бюджет общего времени абсолютный
+                    "reference": REFERENCE_IMPORT,
+                    "tolerance": tolerance
+                },
+                "results": recorded
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    problems = compare(results, baseline, args.budget_ms, tolerance)
+    if problems:
+        print("\nImport budget exceeded:")
+        for line in problems:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nWithin budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Нагрузочный тест OpenRouterClient.
+
+Выполняет заданное количество запросов с целевой степенью параллелизма
+и выводит пропускную способность и перцентили задержки (p50/p95/p99).
+По умолчанию запросы направляются во встроенную имитацию API
+(mock_openrouter.py), поэтому тест работает без сети и не тратит деньги.
+
+Примеры запуска:
+    python benchmarks/load_test.py --requests 2000 --concurrency 50
+    python benchmarks/load_test.py --operation stream --latency lognormal:-2.5:0.5 --rate-limit-rate 0.05
+    python benchmarks/load_test.py --base-url http://127.0.0.1:9000 --json results.json
+"""
+# Импорт необходимых библиотек
+import argparse     # Разбор аргументов командной строки
+import json         # Сохранение результатов
+import logging      # Отключение подробного логирования клиента на время теста
+import os           # Переменные окружения для настройки клиента
+import sys          # Доступ к пути поиска модулей
+import threading    # Синхронизация счетчиков
+import time         # Измерение задержек
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Модули приложения импортируются так же, как при запуске src/main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from mock_openrouter import add_mock_arguments, mock_from_args  # noqa: E402
+
+OPERATIONS = ("chat", "stream", "models", "balance")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """
+    Перцентиль по уже отсортированному списку (линейная интерполяция).
+
+    Args:
+        sorted_values (list): Отсортированные значения
+        q (float): Уровень перцентиля от 0 до 100
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def make_operation(client, operation: str, model: str, prompt: str):
+    """
+    Создание функции одного запроса для выбранной операции.
+
+    Returns:
+        callable: Функция без аргументов, возвращающая (ok, статус, время до первого байта)
+    """
+    if operation == "chat":
+        def run():
+            response = client.send_message(prompt, model)
+            if "error" in response:
+                return False, "429" if "429" in response["error"] else "error", None
+            return True, "ok", None
+    elif operation == "stream":
+        def run():
+            start = time.perf_counter()
+            payload = {"model": model, "stream": True,
+                       "messages": [{"role": "user", "content": prompt}]}
+            response = client.post_completion(payload, stream=True)
+            try:
+                if not response.ok:
+                    return False, str(response.status_code), None
+                first_byte = None
+                for line in response.iter_lines():
+                    if first_byte is None and line.startswith(b"data:"):
+                        first_byte = time.perf_counter() - start
+                return True, "ok", first_byte
+            finally:
+                response.close()
+    elif operation == "models":
+        def run():
+            response = client.session.get(f"{client.base_url}/models")
+            response.content
+            return response.ok, "ok" if response.ok else str(response.status_code), None
+    else:
+        def run():
+            # Запрос в обход client.get_balance(): одновременные вызовы клиента
+            # объединяются в один HTTP-запрос, а тест измеряет реальные запросы
+            # (как и до объединения, поэтому результаты сравнимы с прежними)
+            response = client.session.get(f"{client.base_url}/credits")
+            response.content
+            return response.ok, "ok" if response.ok else str(response.status_code), None
+    return run
+
+
+def run_load(client, operation: str, total: int, concurrency: int,
+             model: str, prompt: str) -> dict:
+    """
+    Выполнение нагрузочного теста.
+
+    Args:
+        client (OpenRouterClient): Настроенный клиент API
+        operation (str): Тип запроса: chat, stream, models или balance
+        total (int): Общее количество запросов
+        concurrency (int): Количество одновременно выполняемых запросов
+        model (str): Идентификатор модели для запросов к чату
+        prompt (str): Текст сообщения
+
+    Returns:
+        dict: Сводка результатов теста
+    """
+    run = make_operation(client, operation, model, prompt)
+    latencies = []
+    first_bytes = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(_):
+        start = time.perf_counter()
+        try:
+            ok, status, first_byte = run()
+        except Exception as e:
+            ok, status, first_byte = False, type(e).__name__, None
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if ok:
+                latencies.append(elapsed)
+                if first_byte is not None:
+                    first_bytes.append(first_byte)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(total)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    first_bytes.sort()
+    result = {
+        "operation": operation,
+        "requests": total,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "throughput_rps": total / duration if duration > 0 else 0.0,
+        "succeeded": len(latencies),
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": (latencies[-1] if latencies else 0.0) * 1000
+        }
+    }
+    if first_bytes:
+        result["time_to_first_byte_ms"] = {
+            "p50": percentile(first_bytes, 50) * 1000,
+            "p95": percentile(first_bytes, 95) * 1000,
+            "p99": percentile(first_bytes, 99) * 1000
+        }
+    return result
+
+
+def print_report(result: dict):
+    """Вывод результатов теста в консоль."""
+    latency = result["latency_ms"]
+    print(f"Operation:    {result['operation']}")
+    print(f"Requests:     {result['requests']} at concurrency {result['concurrency']}")
+    print(f"Duration:     {result['duration_s']:.2f}s")
+    print(f"Throughput:   {result['throughput_rps']:.1f} req/s")
+    print(f"Statuses:     {result['statuses']}")
+    print(f"Latency (ms): p50={latency['p50']:.1f} p95={latency['p95']:.1f} "
+          f"p99={latency['p99']:.1f} max={latency['max']:.1f}")
+    if "time_to_first_byte_ms" in result:
+        ttfb = result["time_to_first_byte_ms"]
+        print(f"TTFB (ms):    p50={ttfb['p50']:.1f} p95={ttfb['p95']:.1f} p99={ttfb['p99']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест OpenRouterClient")
+    parser.add_argument("--operation", choices=OPERATIONS, default="chat")
+    parser.add_argument("--requests", type=int, default=1000, help="общее количество запросов")
+    parser.add_argument("--concurrency", type=int, default=20, help="одновременных запросов")
+    parser.add_argument("--model", default="openai/mock-model-0")
+    parser.add_argument("--prompt", default="Привет! Расскажи о нагрузочном тестировании.")
+    parser.add_argument("--base-url", default=None,
+                        help="адрес уже запущенного API; по умолчанию запускается встроенная имитация")
+    parser.add_argument("--json", default=None, help="путь для сохранения результатов в JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = None
+    if args.base_url is None:
+        mock = mock_from_args(args)
+        base_url = mock.start()
+    else:
+        base_url = args.base_url
+
+    # Клиент настраивается через окружение так же, как в приложении;
+    # пул соединений должен вмещать все одновременные запросы
+    os.environ["BASE_URL"] = base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+    os.environ["HTTP_POOL_SIZE"] = str(max(args.concurrency, 1))
+
+    from api.openrouter import OpenRouterClient
+    client = OpenRouterClient()
+    logging.getLogger("ChatApp").setLevel(logging.WARNING)
+
+    try:
+        result = run_load(client, args.operation, args.requests, args.concurrency,
+                          args.model, args.prompt)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Локальная имитация OpenRouter API для офлайн-тестирования производительности.
+
+Поддерживает эндпоинты /models, /credits и /chat/completions (включая
+потоковые ответы SSE) с настраиваемыми задержками, долей ошибок и
+ответами 429 (превышение лимита запросов). Имитирует кэширование префикса
+запроса: повторно присланный префикс учитывается в
+usage.prompt_tokens_details.cached_tokens.
+
+Пример запуска:
+    python benchmarks/mock_openrouter.py --port 9000 --latency lognormal:-2.5:0.5 --error-rate 0.01
+"""
+# Импорт необходимых библиотек
+import argparse     # Разбор аргументов командной строки
+import hashlib      # Ключи кэша префиксов запроса
+import json         # Библиотека для работы с JSON форматом
+import random       # Генерация задержек и ошибок
+import threading    # Запуск сервера в фоновом потоке
+import time         # Имитация задержек
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyDistribution:
+    """
+    Распределение задержек ответа, задаваемое строкой вида "вид:параметры".
+
+    Поддерживаемые виды (значения в секундах):
+    - fixed:0.05              - постоянная задержка
+    - uniform:0.02:0.2        - равномерное распределение на отрезке
+    - normal:0.1:0.03         - нормальное распределение (среднее, отклонение)
+    - lognormal:-2.5:0.5      - логнормальное распределение (mu, sigma)
+    - exponential:0.1         - экспоненциальное распределение (среднее)
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed=None):
+        kind, *params = spec.split(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.random = random.Random(seed)
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        """Случайная задержка в секундах (всегда неотрицательная)."""
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            value = self.random.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = self.random.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = self.random.lognormvariate(p[0], p[1])
+        else:
+            value = self.random.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class MockOpenRouter:
+    """
+    Локальный сервер, имитирующий OpenRouter API.
+
+    Обеспечивает:
+    - Список моделей, баланс и ответы модели в формате OpenRouter
+    - Потоковые ответы (SSE) с задержкой между фрагментами
+    - Настраиваемые задержки, долю ошибок 500 и ответов 429
+    - Кэширование префикса запроса: автоматическое по границам сообщений,
+      а для моделей anthropic/* и google/* - только до меток cache_control
+    - Счетчики обработанных запросов для проверки в тестах
+    """
+    # Поставщики, кэширующие префикс только по явным меткам cache_control
+    CACHE_CONTROL_VENDORS = ("anthropic", "google")
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0",
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 models_count: int = 300, response_words: int = 50,
+                 stream_chunk_delay: float = 0.0, seed=None):
+        """
+        Args:
+            host (str): Адрес для прослушивания
+            port (int): Порт (0 - выбрать свободный автоматически)
+            latency (str): Распределение задержки до начала ответа
+            error_rate (float): Доля запросов, завершающихся ошибкой 500
+            rate_limit_rate (float): Доля запросов, получающих ответ 429
+            models_count (int): Количество моделей в каталоге
+            response_words (int): Количество слов в ответе модели
+            stream_chunk_delay (float): Задержка между фрагментами потока
+            seed: Зерно генератора случайных чисел для воспроизводимости
+        """
+        self.latency = LatencyDistribution(latency, seed)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.response_words = response_words
+        self.stream_chunk_delay = stream_chunk_delay
+        self.random = random.Random(seed)
+        self.models = _build_models(models_count)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0, "cache_hits": 0}
+        self.prompt_cache = set()   # Ключи закэшированных префиксов запросов
+
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Базовый URL для переменной окружения BASE_URL."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """
+        Запуск сервера в фоновом потоке.
+
+        Returns:
+            str: Базовый URL запущенного сервера
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Остановка сервера."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, name: str):
+        """Потокобезопасное увеличение счетчика."""
+        with self.lock:
+            self.counters[name] += 1
+
+    def pick_failure(self):
+        """
+        Выбор имитируемого сбоя для очередного запроса.
+
+        Returns:
+            int | None: HTTP статус сбоя (429 или 500) либо None
+        """
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def cached_tokens(self, model: str, messages: list) -> int:
+        """
+        Имитация кэша префиксов: количество токенов самого длинного префикса
+        messages (по границам сообщений), уже встречавшегося для этой модели.
+
+        Префиксы текущего запроса запоминаются: все - для автоматического
+        кэширования, только заканчивающиеся меткой cache_control - для
+        CACHE_CONTROL_VENDORS.
+        """
+        explicit = str(model).split("/", 1)[0] in self.CACHE_CONTROL_VENDORS
+        digest = hashlib.sha1(str(model).encode("utf-8"))
+        tokens = 0
+        cached = 0
+        keys = []
+        for message in messages:
+            text = _message_text(message)
+            digest.update(json.dumps([message.get("role"), text], ensure_ascii=False).encode("utf-8"))
+            tokens += _estimate_tokens(json.dumps(message, ensure_ascii=False))
+            key = digest.hexdigest()
+            if key in self.prompt_cache:
+                cached = tokens
+            if not explicit or _has_cache_control(message):
+                keys.append(key)
+        with self.lock:
+            self.prompt_cache.update(keys)
+            if cached:
+                self.counters["cache_hits"] += 1
+        return cached
+
+    def completion_text(self, messages: list) -> str:
+        """Детерминированный текст ответа заданной длины."""
+        prompt = _message_text(messages[-1]) if messages else ""
+        words = [f"token{i % 97}" for i in range(self.response_words)]
+        return f"Echo: {str(prompt)[:40]} " + " ".join(words)
+
+
+def _build_models(count: int) -> list:
+    """Синтетический каталог моделей в формате OpenRouter /models."""
+    vendors = ["openai", "anthropic", "google", "meta-llama", "mistralai", "deepseek"]
+    models = []
+    for i in range(count):
+        vendor = vendors[i % len(vendors)]
+        models.append({
+            "id": f"{vendor}/mock-model-{i}",
+            "name": f"{vendor.title()}: Mock Model {i}",
+            "context_length": 8192 * (1 + i % 16),
+            "pricing": {"prompt": "0.000001", "completion": "0.000002"}
+        })
+    return models
+
+
+def _message_text(message: dict) -> str:
+    """Текст сообщения (содержимое может быть строкой или списком частей)."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _has_cache_control(message: dict) -> bool:
+    """Есть ли в сообщении метка cache_control."""
+    content = message.get("content")
+    return "cache_control" in message or (
+        isinstance(content, list)
+        and any(isinstance(part, dict) and "cache_control" in part for part in content)
+    )
+
+
+def _estimate_tokens(text: str) -> int:
+    """Грубая оценка количества токенов (около 4 символов на токен)."""
+    return max(1, len(text) // 4)
+
+
+def _make_handler(mock: MockOpenRouter):
+    """Создание класса обработчика запросов, привязанного к экземпляру mock."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Заголовки и тело пишутся раздельно; без TCP_NODELAY алгоритм Нейгла
+        # добавляет к каждому ответу ~40 мс и искажает измерения
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            # Логирование каждого запроса искажает результаты нагрузочных тестов
+            pass
+
+        def do_GET(self):
+            mock.count("requests")
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path.endswith("/models"):
+                self._delay_or_fail() or self._send_json(200, {"data": mock.models})
+            elif path.endswith("/credits"):
+                self._delay_or_fail() or self._send_json(
+                    200, {"data": {"total_credits": 100.0, "total_usage": 12.5}}
+                )
+            else:
+                self._send_json(404, {"error": {"message": "Not found", "code": 404}})
+
+        def do_HEAD(self):
+            # Клиент заранее открывает соединение (OpenRouterClient.prewarm)
+            mock.count("requests")
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            mock.count("requests")
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b"{}"
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found", "code": 404}})
+                return
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "Invalid JSON", "code": 400}})
+                return
+            if self._delay_or_fail():
+                return
+
+            messages = payload.get("messages", [])
+            text = mock.completion_text(messages)
+            prompt_tokens = sum(_estimate_tokens(json.dumps(m, ensure_ascii=False)) for m in messages)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _estimate_tokens(text),
+                "total_tokens": prompt_tokens + _estimate_tokens(text),
+                "prompt_tokens_details": {
+                    "cached_tokens": mock.cached_tokens(payload.get("model"), messages)
+                }
+            }
+            if payload.get("stream"):
+                self._stream(payload, text, usage)
+            else:
+                self._send_json(200, {
+                    "id": "gen-mock",
+                    "object": "chat.completion",
+                    "model": payload.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": usage
+                })
+
+        def _delay_or_fail(self) -> bool:
+            """
+            Имитация задержки и сбоев.
+
+            Returns:
+                bool: True, если вместо нормального ответа уже отправлена ошибка
+            """
+            time.sleep(mock.latency.sample())
+            status = mock.pick_failure()
+            if status == 429:
+                mock.count("rate_limited")
+                self._send_json(429, {"error": {"message": "Rate limit exceeded", "code": 429}},
+                                {"Retry-After": "1"})
+                return True
+            if status == 500:
+                mock.count("errors")
+                self._send_json(500, {"error": {"message": "Internal server error", "code": 500}})
+                return True
+            return False
+
+        def _stream(self, payload: dict, text: str, usage: dict):
+            """Отправка ответа в виде потока событий SSE."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for word in text.split(" "):
+                    chunk = {
+                        "id": "gen-mock",
+                        "object": "chat.completion.chunk",
+                        "model": payload.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": word + " "}}]
+                    }
+                    self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+                    self.wfile.flush()
+                    if mock.stream_chunk_delay:
+                        time.sleep(mock.stream_chunk_delay)
+                final = {"id": "gen-mock", "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                         "usage": usage}
+                self.wfile.write(b"data: " + json.dumps(final).encode("utf-8") + b"\n\n")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Клиент прервал чтение потока
+                pass
+
+        def _send_json(self, status: int, payload: dict, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Добавление общих параметров имитации в парсер аргументов."""
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="распределение задержки: fixed|uniform|normal|lognormal|exponential")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--models", type=int, default=300, help="размер каталога моделей")
+    parser.add_argument("--response-words", type=int, default=50, help="слов в ответе модели")
+    parser.add_argument("--chunk-delay", type=float, default=0.0,
+                        help="задержка между фрагментами потока, с")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+
+
+def mock_from_args(args, host: str = "127.0.0.1", port: int = 0) -> MockOpenRouter:
+    """Создание MockOpenRouter из разобранных аргументов командной строки."""
+    return MockOpenRouter(
+        host=host,
+        port=port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        models_count=args.models,
+        response_words=args.response_words,
+        stream_chunk_delay=args.chunk_delay,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Имитация OpenRouter API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args, args.host, args.port)
+    print(f"Mock OpenRouter listening on {mock.base_url} (BASE_URL={mock.base_url})")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Микробенчмарки хранилища (ChatCache) и аналитики (Analytics).
+
+Заполняет синтетические базы данных заданного размера, измеряет время и
+пиковый объем выделенной Python-памяти для основных операций и сравнивает
+результаты с сохраненными базовыми значениями. При регрессии сверх
+допустимого отклонения скрипт завершается с кодом 1.
+
+Абсолютное время зависит от машины, поэтому время операций сравнивается
+в долях эталонной операции (чтение таблицы сообщений напрямую через
+sqlite3, без кода приложения), измеренной в том же запуске на той же базе.
+
+Примеры запуска:
+    python benchmarks/storage_bench.py                          # сравнение с базой
+    python benchmarks/storage_bench.py --sizes 10000,100000     # только малые базы
+    python benchmarks/storage_bench.py --record                 # перезапись базовых значений
+"""
+# Импорт необходимых библиотек
+import argparse     # Разбор аргументов командной строки
+import gc           # Сборка мусора между замерами
+import json         # Чтение и запись базовых значений
+import os           # Работа с файлами баз данных
+import platform     # Описание окружения в базовых значениях
+import sqlite3      # Быстрое заполнение синтетических баз
+import sys          # Доступ к пути поиска модулей
+import tempfile     # Временная директория для баз
+import time         # Измерение времени
+import tracemalloc  # Измерение выделений памяти
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Модули приложения импортируются так же, как при запуске src/main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from utils.analytics import Analytics  # noqa: E402
+from utils.cache import ChatCache      # noqa: E402
+from utils.exporter import ChatExporter  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "storage.json"
+
+# Количество вставок при измерении save_message (время считается на одну вставку)
+SAVE_MESSAGE_OPS = 200
+
+# Изменения времени меньше этого порога считаются шумом измерения
+MIN_TIME_DELTA = 0.002
+
+# Допустимые отклонения по умолчанию, если они не сохранены в базовых значениях
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_MEMORY_TOLERANCE = 0.2
+
+# Имя эталонной операции в результатах
+REFERENCE = "reference_scan"
+
+MODELS = ["openai/gpt-4o", "anthropic/claude-3.5-sonnet", "google/gemini-pro",
+          "meta-llama/llama-3-70b", "deepseek/deepseek-coder"]
+WORDS = ("алгоритм data модель ответ function кэш query индекс token поток "
+         "request строка value база ошибка result список class метод").split()
+
+
+def synthetic_text(i: int, words: int) -> str:
+    """Детерминированный псевдотекст заданной длины в словах."""
+    return " ".join(WORDS[(i * 7 + k * 3) % len(WORDS)] for k in range(words))
+
+
+def seed_database(path: str, rows: int):
+    """
+    Заполнение базы синтетическими сообщениями и записями аналитики.
+
+    Args:
+        path (str): Путь к файлу базы данных
+        rows (int): Количество строк в каждой таблице
+    """
+    ChatCache(db_name=path)  # Создание схемы штатным кодом приложения
+    conn = sqlite3.connect(path)
+    base = datetime(2024, 1, 1)
+    batch = 50_000
+
+    for offset in range(0, rows, batch):
+        messages = []
+        analytics = []
+        for i in range(offset, min(offset + batch, rows)):
+            timestamp = (base + timedelta(seconds=i, microseconds=i % 997 + 1)).strftime(
+                "%Y-%m-%d %H:%M:%S.%f"
+            )
+            model = MODELS[i % len(MODELS)]
+            user_message = synthetic_text(i, 8 + i % 24)
+            messages.append((model, user_message, synthetic_text(i + 1, 30 + i % 90),
+                             timestamp, 50 + i % 400))
+            analytics.append((timestamp, model, len(user_message), 0.5 + (i % 50) / 10,
+                              50 + i % 400))
+        conn.executemany(
+            "INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used) "
+            "VALUES (?, ?, ?, ?, ?)", messages
+        )
+        conn.executemany(
+            "INSERT INTO analytics_messages "
+            "(timestamp, model, message_length, response_time, tokens_used) "
+            "VALUES (?, ?, ?, ?, ?)", analytics
+        )
+        conn.commit()
+    conn.close()
+
+
+def measure(operation, repeat: int, ops: int = 1) -> dict:
+    """
+    Измерение времени (лучшее из repeat запусков) и пиковых выделений памяти.
+
+    Args:
+        operation (callable): Измеряемая операция без аргументов
+        repeat (int): Количество повторов для измерения времени
+        ops (int): Сколько элементарных операций выполняет один вызов
+
+    Returns:
+        dict: {"time_s": время одной операции, "peak_bytes": пик выделений}
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        operation()
+        best = min(best, time.perf_counter() - start)
+
+    # Отдельный запуск под tracemalloc: трассировка замедляет выполнение
+    gc.collect()
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"time_s": best / ops, "peak_bytes": peak}
+
+
+def reference_scan(path: str):
+    """
+    Эталонная операция: чтение всех сообщений напрямую через sqlite3.
+
+    Не зависит от кода приложения и поэтому отражает только скорость
+    машины (диска, SQLite и интерпретатора) на базе того же размера.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        total = 0
+        for model, user_message, ai_response, timestamp in conn.execute(
+            "SELECT model, user_message, ai_response, timestamp FROM messages"
+        ):
+            total += len(user_message or "") + len(ai_response or "")
+        return total
+    finally:
+        conn.close()
+
+
+def run_suite(rows: int, workdir: str, repeat: int) -> dict:
+    """
+    Выполнение всех замеров для базы заданного размера.
+
+    Returns:
+        dict: Результаты по операциям
+    """
+    path = os.path.join(workdir, f"bench_{rows}.db")
+    if not os.path.exists(path):
+        print(f"Seeding {rows} rows...", flush=True)
+        seed_database(path, rows)
+
+    cache = ChatCache(db_name=path)
+    analytics = Analytics(cache)
+    results = {
+        REFERENCE: measure(lambda: reference_scan(path), repeat),
+        "get_chat_history": measure(lambda: cache.get_chat_history(), repeat),
+        "get_formatted_history": measure(cache.get_formatted_history, repeat),
+        "load_historical_data": measure(lambda: Analytics(cache), repeat),
+        "get_statistics": measure(analytics.get_statistics, repeat),
+        "export_jsonl": measure(
+            lambda: ChatExporter(cache, os.path.join(workdir, "exports")).export("jsonl"), repeat
+        )
+    }
+
+    # Вставки изменяют базу, поэтому выполняются последними
+    counter = iter(range(10 ** 9))
+
+    def save_batch():
+        for _ in range(SAVE_MESSAGE_OPS):
+            i = next(counter)
+            cache.save_message(MODELS[i % len(MODELS)], synthetic_text(i, 12),
+                               synthetic_text(i + 1, 60), 100)
+
+    results["save_message"] = measure(save_batch, repeat, ops=SAVE_MESSAGE_OPS)
+    return results
+
+
+def expected_time(size: str, name: str, results: dict, baseline: dict):
+    """
+    Ожидаемое время операции на текущей машине.
+
+    Базовое время операции переводится в доли эталонной операции базового
+    запуска и умножается на время эталонной операции текущего запуска.
+    Для базовых значений без эталона используется абсолютное время.
+
+    Returns:
+        float: Ожидаемое время в секундах или None, если базы нет
+    """
+    expected = baseline.get(size, {}).get(name)
+    if expected is None:
+        return None
+    base_reference = baseline.get(size, {}).get(REFERENCE)
+    current_reference = results.get(size, {}).get(REFERENCE)
+    if name == REFERENCE or not base_reference or not current_reference \
+            or base_reference["time_s"] <= 0:
+        return expected["time_s"]
+    return expected["time_s"] / base_reference["time_s"] * current_reference["time_s"]
+
+
+def compare(results: dict, baseline: dict, tolerance: float, memory_tolerance: float) -> list:
+    """
+    Сравнение результатов с базовыми значениями.
+
+    Время сравнивается относительно эталонной операции (см. expected_time),
+    пиковые выделения памяти - напрямую. Сама эталонная операция не
+    проверяется: ее время описывает машину, а не код приложения.
+
+    Returns:
+        list: Описания обнаруженных регрессий
+    """
+    regressions = []
+    for size, operations in results.items():
+        for name, current in operations.items():
+            if name == REFERENCE:
+                continue
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            expected_s = expected_time(size, name, results, baseline)
+            time_limit = expected_s * (1 + tolerance)
+            if current["time_s"] > time_limit and \
+                    current["time_s"] - expected_s > MIN_TIME_DELTA:
+                regressions.append(
+                    f"{name}@{size}: time {current['time_s'] * 1000:.2f}ms "
+                    f"> {expected_s * 1000:.2f}ms expected on this machine (+{tolerance:.0%})"
+                )
+            memory_limit = expected["peak_bytes"] * (1 + memory_tolerance)
+            if current["peak_bytes"] > memory_limit:
+                regressions.append(
+                    f"{name}@{size}: peak alloc {current['peak_bytes'] / 1024:.0f}KiB "
+                    f"> {expected['peak_bytes'] / 1024:.0f}KiB (+{memory_tolerance:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: dict, baseline: dict):
+    """Вывод таблицы результатов с изменением относительно ожидаемого времени."""
+    print(f"{'operation':<24}{'rows':>10}{'time, ms':>14}{'vs base':>10}{'peak, KiB':>14}")
+    for size, operations in results.items():
+        for name, current in operations.items():
+            expected_s = expected_time(size, name, results, baseline)
+            change = ""
+            if expected_s:
+                change = f"{current['time_s'] / expected_s - 1:+.0%}"
+            print(f"{name:<24}{size:>10}{current['time_s'] * 1000:>14.3f}"
+                  f"{change:>10}{current['peak_bytes'] / 1024:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки ChatCache и Analytics")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="размеры баз через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов каждого замера")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                        help="файл базовых значений")
+    parser.add_argument("--record", action="store_true",
+                        help="записать результаты как новые базовые значения")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="допустимое относительное замедление "
+                             f"(по умолчанию - из базовых значений или {DEFAULT_TOLERANCE})")
+    parser.add_argument("--memory-tolerance", type=float, default=None,
+                        help="допустимый относительный рост пиковых выделений "
+                             f"(по умолчанию - из базовых значений или {DEFAULT_MEMORY_TOLERANCE})")
+    parser.add_argument("--workdir", default=None,
+                        help="директория для синтетических баз (сохраняются между запусками)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="aichat_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    baseline_data = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_data = json.load(f)
+    baseline = baseline_data.get("results", {})
+    meta = baseline_data.get("meta", {})
+    tolerance = args.tolerance if args.tolerance is not None \
+        else meta.get("tolerance", DEFAULT_TOLERANCE)
+    memory_tolerance = args.memory_tolerance if args.memory_tolerance is not None \
+        else meta.get("memory_tolerance", DEFAULT_MEMORY_TOLERANCE)
+
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = run_suite(rows, workdir, args.repeat)
+
+    print_results(results, baseline)
+
+    if args.record:
+        merged = dict(baseline)
+        merged.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "platform": platform.platform(),
+                    "machine": platform.machine(),
+                    "processor": platform.processor(),
+                    "cpu_count": os.cpu_count(),
+                    # Время операций сравнивается в долях эталонной операции
+                    # с этими отклонениями, поэтому базовые значения переносимы
+                    # между машинами с точностью до tolerance
+                    "reference": REFERENCE,
+                    "tolerance": tolerance,
+                    "memory_tolerance": memory_tolerance
+                },
+                "results": merged
+            }, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, tolerance, memory_tolerance)
+    if regressions:
+        print("\nRegressions detected:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,90 +2,257 @@
 import os  # Для работы с операционной системой
 import sys  # Для доступа к системным параметрам и функциям
 import shutil  # Для операций с файлами и директориями
+import argparse  # Для разбора аргументов командной строки
+import statistics  # Для расчета медианы времени запуска
 import subprocess  # Для запуска внешних процессов
+import tempfile  # Для временной рабочей директории при замерах запуска
+import time  # Для измерения времени запуска
 from pathlib import Path  # Для удобной работы с путями файловой системы
 
-def build_windows():
-    """Сборка исполняемого файла для Windows с помощью PyInstaller"""
-    print("Building Windows executable...")
-    
-    # Устанавливаем зависимости проекта для Windows из файла requirements.txt
+# Модули стандартной библиотеки, которые приложение не использует.
+# Профиль fast исключает их из сборки, уменьшая объем загружаемых файлов
+EXCLUDED_MODULES = (
+    "tkinter",
+    "unittest",
+    "test",
+    "pydoc",
+    "doctest",
+    "pdb",
+    "lib2to3",
+    "xmlrpc"
+)
+
+# Профили сборки PyInstaller:
+# - onefile: один исполняемый файл, который при каждом запуске
+#   распаковывается во временную директорию
+# - fast: директория с приложением (--onedir) без распаковки при запуске,
+#   без неиспользуемых модулей, без сжатия UPX и с байткодом,
+#   скомпилированным с оптимизацией (-O: без assert)
+BUILD_PROFILES = {
+    "onefile": ["--onefile"],
+    "fast": [
+        "--onedir",
+        "--noupx",
+        "--optimize=1",
+        *[f"--exclude-module={module}" for module in EXCLUDED_MODULES]
+    ]
+}
+
+def install_requirements():
+    """Установка зависимостей проекта из файла requirements.txt"""
     # sys.executable - путь к текущему интерпретатору Python
     subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
-    
+
+def run_pyinstaller(name, profile, extra_args, distpath="dist", workpath="build"):
+    """
+    Запуск PyInstaller с параметрами профиля сборки
+
+    Args:
+        name: имя исполняемого файла
+        profile: ключ BUILD_PROFILES
+        extra_args: параметры, зависящие от платформы
+        distpath: директория результата сборки
+        workpath: директория временных файлов сборки
+
+    Returns:
+        bool: True если сборка завершилась успешно
+    """
+    # Общие параметры:
+    # --windowed: запускать без консольного окна
+    # --name: задать имя выходного файла
+    # --specpath: хранить .spec рядом с временными файлами профиля
+    result = subprocess.run([
+        "pyinstaller",
+        *BUILD_PROFILES[profile],
+        "--windowed",
+        f"--name={name}",
+        f"--distpath={distpath}",
+        f"--workpath={workpath}",
+        f"--specpath={workpath}",
+        *extra_args,
+        "src/main.py"
+    ])
+    return result.returncode == 0
+
+def executable_path(distpath, name, profile):
+    """Путь к исполняемому файлу сборки (в профиле fast - внутри директории приложения)"""
+    suffix = ".exe" if sys.platform.startswith('win') else ""
+    if profile == "onefile":
+        return Path(distpath) / f"{name}{suffix}"
+    return Path(distpath) / name / f"{name}{suffix}"
+
+def move_to_bin(source, target):
+    """Перемещение результата сборки в директорию bin с заменой прежнего"""
+    target = Path(target)
+    if target.is_dir():
+        shutil.rmtree(target)
+    elif target.exists():
+        target.unlink()
+    shutil.move(str(source), str(target))
+
+def build_windows(profile="onefile"):
+    """Сборка исполняемого файла для Windows с помощью PyInstaller"""
+    print(f"Building Windows executable ({profile})...")
+
     # Создаём директорию bin, если она не существует
     # exist_ok=True позволяет не выбрасывать ошибку, если директория уже существует
     bin_dir = Path("bin")
     bin_dir.mkdir(exist_ok=True)
-    
-    # Запускаем PyInstaller со следующими параметрами:
-    # --onefile: создать один исполняемый файл
-    # --windowed: запускать без консольного окна
-    # --name: задать имя выходного файла
+
+    # Параметры для Windows:
     # --clean: очистить кэш PyInstaller перед сборкой
     # --noupx: не использовать UPX для сжатия
     # --uac-admin: запрашивать права администратора при запуске
-    subprocess.run([
-        "pyinstaller",
-        "--onefile",
-        "--windowed",
-        "--name=AI Chat",
-        "--clean",
-        "--noupx",
-        "--uac-admin",
-        "src/main.py"
-    ])
-    
-    # Перемещаем собранный файл в директорию bin
+    run_pyinstaller("AI Chat", profile, ["--clean", "--noupx", "--uac-admin"])
+
+    # Перемещаем собранный файл (или директорию приложения) в директорию bin
     # Используем try/except для обработки возможных ошибок при перемещении
+    source, target = ("dist/AI Chat.exe", "bin/AIChat.exe") if profile == "onefile" \
+        else ("dist/AI Chat", "bin/AIChat")
     try:
-        shutil.move("dist/AI Chat.exe", "bin/AIChat.exe")
-        print("Windows build completed! Executable location: bin/AIChat.exe")
+        move_to_bin(source, target)
+        print(f"Windows build completed! Executable location: {executable_path('bin', 'AIChat', profile)}")
     except:
-        print("Windows build completed! Executable location: dist/AI Chat.exe")
+        print(f"Windows build completed! Executable location: {executable_path('dist', 'AI Chat', profile)}")
 
-def build_linux():
+def build_linux(profile="onefile"):
     """Сборка исполняемого файла для Linux с помощью PyInstaller"""
-    print("Building Linux executable...")
-    
-    # Устанавливаем зависимости проекта для Linux
-    subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
-    
+    print(f"Building Linux executable ({profile})...")
+
     # Создаём директорию bin, если она не существует
     bin_dir = Path("bin")
     bin_dir.mkdir(exist_ok=True)
-    
-    # Запускаем PyInstaller для Linux со следующими параметрами:
-    # --onefile: создать один исполняемый файл
-    # --windowed: запускать без консольного окна
+
+    # Параметры для Linux:
     # --icon: указать иконку приложения
-    # --name: задать имя выходного файла
-    subprocess.run([
-        "pyinstaller",
-        "--onefile",
-        "--windowed",
-        "--icon=assets/icon.ico",
-        "--name=aichat",
-        "src/main.py"
-    ])
-    
-    # Перемещаем собранный файл в директорию bin
+    run_pyinstaller("aichat", profile, ["--icon=assets/icon.ico"])
+
+    # Перемещаем собранный файл (или директорию приложения) в директорию bin
+    target = "bin/aichat" if profile == "onefile" else "bin/aichat-fast"
     try:
-        shutil.move("dist/aichat", "bin/aichat")
-        print("Linux build completed! Executable location: bin/aichat")
+        move_to_bin("dist/aichat", target)
+        location = target if profile == "onefile" else f"{target}/aichat"
+        print(f"Linux build completed! Executable location: {location}")
     except:
-        print("Linux build completed! Executable location: dist/aichat")
+        print(f"Linux build completed! Executable location: {executable_path('dist', 'aichat', profile)}")
+
+def drop_page_cache():
+    """
+    Сброс страничного кэша Linux перед холодным запуском
+
+    Returns:
+        bool: True если кэш сброшен (нужны права root)
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+def launch_once(executable, workdir, env):
+    """
+    Запуск сборки в режиме проверки запуска (AICHAT_STARTUP_CHECK)
+
+    Приложение импортирует модули, инициализируется и завершается,
+    не открывая окно.
+
+    Returns:
+        float: время от запуска процесса до его завершения в миллисекундах
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [str(executable)],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=120
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{executable} exited with code {result.returncode}")
+    return elapsed
+
+def measure_launch(executable, runs):
+    """
+    Замер холодного и теплого запуска сборки
+
+    Холодный запуск - первый после сброса страничного кэша (если есть
+    права root, иначе первый запуск после сборки), теплый - медиана
+    следующих runs запусков.
+
+    Returns:
+        dict: cold_ms, warm_ms и признак сброса кэша
+    """
+    env = dict(os.environ, AICHAT_STARTUP_CHECK="1")
+    env.setdefault("OPENROUTER_API_KEY", "startup-check")
+    # Рабочая директория с базой и логами не должна зависеть от прошлых запусков
+    with tempfile.TemporaryDirectory(prefix="aichat_launch_") as workdir:
+        dropped = drop_page_cache()
+        cold = launch_once(executable, workdir, env)
+        warm = [launch_once(executable, workdir, env) for _ in range(runs)]
+    return {"cold_ms": cold, "warm_ms": statistics.median(warm), "cache_dropped": dropped}
+
+def bundle_size(path):
+    """Размер исполняемого файла или директории приложения в мегабайтах"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size / 1024 / 1024
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 / 1024
+
+def compare_profiles(runs):
+    """Сборка всех профилей и сравнение времени запуска (только Linux)"""
+    results = {}
+    for profile in BUILD_PROFILES:
+        print(f"Building profile {profile}...")
+        root = Path("build") / "profiles" / profile
+        distpath = root / "dist"
+        if not run_pyinstaller("aichat", profile, ["--icon=assets/icon.ico"],
+                               distpath=str(distpath), workpath=str(root / "work")):
+            print(f"Profile {profile} failed to build")
+            continue
+        executable = executable_path(distpath, "aichat", profile)
+        results[profile] = measure_launch(executable, runs)
+        results[profile]["size_mb"] = bundle_size(distpath / "aichat")
+
+    # Вывод таблицы сравнения профилей
+    print(f"\n{'profile':<10}{'size, MB':>10}{'cold, ms':>10}{'warm, ms':>10}")
+    for profile, result in results.items():
+        print(f"{profile:<10}{result['size_mb']:>10.1f}{result['cold_ms']:>10.0f}{result['warm_ms']:>10.0f}")
+    if results and not all(result["cache_dropped"] for result in results.values()):
+        print("\nPage cache was not dropped (requires root): cold = first launch after build")
 
 def main():
     """Основная функция сборки
-    
+
     Определяет операционную систему и запускает соответствующую функцию сборки
     """
+    parser = argparse.ArgumentParser(description="Сборка исполняемого файла AI Chat")
+    parser.add_argument("--profile", choices=list(BUILD_PROFILES), default="onefile",
+                        help="профиль сборки")
+    parser.add_argument("--compare", action="store_true",
+                        help="собрать все профили и сравнить время запуска (Linux)")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="количество теплых запусков при сравнении")
+    args = parser.parse_args()
+
+    # Сравнение профилей выполняется только на Linux
+    if args.compare and not sys.platform.startswith('linux'):
+        print("Profile comparison is supported on Linux only")
+        return
+
+    # Устанавливаем зависимости проекта из файла requirements.txt
+    install_requirements()
+
     # Проверяем тип операционной системы
-    if sys.platform.startswith('win'):  # Если Windows
-        build_windows()
+    if args.compare:
+        compare_profiles(args.runs)
+    elif sys.platform.startswith('win'):  # Если Windows
+        build_windows(args.profile)
     elif sys.platform.startswith('linux'):  # Если Linux
-        build_linux()
+        build_linux(args.profile)
     else:  # Если другая ОС
         print("Unsupported platform")
 
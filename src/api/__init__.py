@@ -1,7 +1,29 @@
 """
 API package initialization.
-Contains OpenRouter API client implementations.
+Contains OpenRouter API client implementations
+and the local OpenAI-compatible proxy server.
+
+Classes are imported on first access (PEP 562), so the chat client
+does not load the proxy server.
 """
-from .openrouter import OpenRouterClient
+import importlib
+
+# Экспортируемое имя -> модуль пакета, в котором оно определено
+_EXPORTS = {
+    'OpenRouterClient': '.openrouter',
+    'ProxyServer': '.proxy'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ['OpenRouterClient']
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,61 @@
+# Импорт необходимых библиотек
+import socket       # Прерывание чтения ответа на уровне сокета
+import threading    # Остановка запрашивается из другого потока
+
+
+class Cancellation(threading.Event):
+    """
+    Остановка потокового ответа API.
+
+    Как и threading.Event, устанавливается методом set(). Кроме флага,
+    прерывает чтение привязанного ответа: сокет соединения закрывается
+    для чтения и записи, поэтому рабочий поток, ждущий следующую строку
+    ответа (например, пока поставщик молчит), сразу получает ошибку
+    соединения, а поставщик прекращает генерацию.
+
+    Сам ответ закрывает рабочий поток: response.close() из другого потока
+    ждал бы, пока рабочий поток освободит буфер чтения.
+    """
+
+    def __init__(self):
+        """Инициализация без привязанного ответа."""
+        super().__init__()
+        self._response = None
+        self._lock = threading.Lock()   # Защита _response
+
+    def attach(self, response):
+        """
+        Привязка ответа, чтение которого прерывается при остановке.
+
+        Если остановка уже запрошена, ответ прерывается сразу.
+
+        Args:
+            response (requests.Response): Потоковый ответ или None, чтобы
+                                          отвязать прочитанный ответ
+        """
+        with self._lock:
+            self._response = response
+        if response is not None and self.is_set():
+            _abort(response)
+
+    def set(self):
+        """Запрос остановки и прерывание привязанного ответа."""
+        super().set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            _abort(response)
+
+
+def _abort(response):
+    """Прерывание чтения ответа закрытием сокета его соединения."""
+    # Соединение недоступно, если ответ уже прочитан и вернул его в пул
+    connection = getattr(response.raw, "connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # Соединение уже закрыто
+        pass
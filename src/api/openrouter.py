@@ -1,12 +1,22 @@
 # Импорт необходимых библиотек
 import requests  # Библиотека для выполнения HTTP-запросов к API
+from requests.adapters import HTTPAdapter  # Адаптер с пулом постоянных соединений
+from requests.structures import CaseInsensitiveDict  # Заголовки ответа из снимка
+from requests.utils import get_encoding_from_headers  # Кодировка ответа из снимка
 import os       # Библиотека для работы с операционной системой и переменными окружения
+import json     # Библиотека для разбора фрагментов потокового ответа
 from dotenv import load_dotenv  # Библиотека для загрузки переменных окружения из .env файла
 from utils.logger import AppLogger  # Импорт собственного логгера для отслеживания работы
+from utils.tokens import model_family  # Определение семейства модели по ее ID
+from .singleflight import SingleFlight  # Объединение одновременных одинаковых запросов
 
 # Загрузка переменных окружения из .env файла при импорте модуля
 load_dotenv()
 
+# Семейства моделей, кэширующие префикс запроса только по явным меткам
+# cache_control (у остальных поставщиков кэширование автоматическое)
+CACHE_CONTROL_FAMILIES = {"anthropic", "google"}
+
 class OpenRouterClient:
     """
     Клиент для взаимодействия с OpenRouter API.
@@ -15,7 +25,7 @@ class OpenRouterClient:
     языковым моделям (GPT, Claude и др.) через единый API интерфейс.
     """
     
-    def __init__(self):
+    def __init__(self, load_models: bool = True):
         """
         Инициализация клиента OpenRouter.
         
@@ -23,8 +33,15 @@ class OpenRouterClient:
         - Систему логирования
         - API ключ и базовый URL из переменных окружения
         - Заголовки для HTTP запросов
+        - Общую HTTP-сессию с пулом соединений
+        - Объединение одновременных одинаковых запросов
         - Список доступных моделей
         
+        Args:
+            load_models (bool): Загрузить каталог моделей сразу. При False
+                                список пуст до вызова get_models (например,
+                                в фоне после отрисовки интерфейса)
+        
         Raises:
             ValueError: Если API ключ не найден в переменных окружения
         """
@@ -48,11 +65,44 @@ class OpenRouterClient:
             "Content-Type": "application/json"          # Указание формата данных
         }
 
+        # Общая HTTP-сессия: соединения с API переиспользуются между запросами
+        # и потоками, поэтому TLS-рукопожатие выполняется один раз на соединение.
+        # HTTP_POOL_SIZE ограничивает число одновременно открытых соединений.
+        self.pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+        # Одновременные одинаковые запросы (например, проверка баланса при
+        # запуске и по таймеру) выполняются одним HTTP-запросом
+        self._flights = SingleFlight()
+
         # Логирование успешной инициализации клиента
         self.logger.info("OpenRouterClient initialized successfully")
         
         # Загрузка списка доступных моделей при инициализации
-        self.available_models = self.get_models()
+        self.available_models = self.get_models() if load_models else []
+
+    def prewarm(self) -> bool:
+        """
+        Заблаговременное открытие соединения с API.
+        
+        Легкий запрос HEAD устанавливает TCP и TLS соединение, которое
+        остается в пуле сессии, поэтому следующий запрос (например, первое
+        сообщение пользователя) не тратит время на рукопожатие.
+        
+        Returns:
+            bool: Соединение установлено (статус ответа не важен)
+        """
+        try:
+            self.session.head(self.base_url, timeout=10).close()
+            self.logger.debug("API connection prewarmed")
+            return True
+        except Exception as e:
+            self.logger.warning(f"API connection prewarm failed: {e}")
+            return False
 
     def get_models(self):
         """
@@ -60,7 +110,8 @@ class OpenRouterClient:
         
         Returns:
             list: Список словарей с информацией о моделях:
-                 [{"id": "model-id", "name": "Model Name"}, ...]
+                 [{"id": "model-id", "name": "Model Name",
+                   "context_length": 8192, "pricing": {"prompt": "0.000001", ...}}, ...]
                  
         Note:
             При ошибке запроса возвращает список базовых моделей по умолчанию
@@ -70,21 +121,19 @@ class OpenRouterClient:
         
         try:
             # Выполнение GET запроса к API для получения списка моделей
-            response = requests.get(
-                f"{self.base_url}/models",
-                headers=self.headers
-            )
-            # Преобразование ответа из JSON в словарь Python
-            models_data = response.json()
+            # и преобразование ответа из JSON в словарь Python
+            models_data = self._get_json("/models")
             
             # Логирование успешного получения списка моделей
-            self.logger.info(f"Retrieved {len(models_data["data"])} models")
+            self.logger.info(f"Retrieved {len(models_data['data'])} models")
             
             # Преобразование данных в нужный формат
             return [
                 {
                     "id": model["id"],     # Идентификатор модели для API
-                    "name": model["name"]   # Человекочитаемое название модели
+                    "name": model["name"],  # Человекочитаемое название модели
+                    "context_length": model.get("context_length"),  # Размер окна контекста
+                    "pricing": model.get("pricing")  # Цены в долларах за токен
                 }
                 for model in models_data["data"]
             ]
@@ -99,13 +148,45 @@ class OpenRouterClient:
             self.logger.info(f"Retrieved {len(models_default)} models with Error: {e}")
             return models_default
 
-    def send_message(self, message: str, model: str):
+    @staticmethod
+    def build_messages(message: str, history: list = None, model: str = None) -> list:
+        """
+        Формирование списка сообщений запроса.
+        
+        Поставщики кэшируют совпадающий побайтно префикс запроса, поэтому
+        неизменные части (системное сообщение, предыдущие реплики) идут
+        первыми и в неизменном виде, а новое сообщение - последним. Для моделей,
+        которым нужны явные метки, cache_control ставится на системное
+        сообщение и на последнее сообщение истории.
+        
+        Args:
+            message (str): Текст нового сообщения пользователя
+            history (list): Предыдущие сообщения беседы в формате API
+                            ({"role", "content"}) в хронологическом порядке
+            model (str): Идентификатор модели (определяет метки кэша)
+            
+        Returns:
+            list: Сообщения для поля "messages" запроса
+        """
+        messages = list(history or ())
+        if messages and model_family(model) in CACHE_CONTROL_FAMILIES:
+            breakpoints = {len(messages) - 1}
+            if messages[0]["role"] == "system":
+                breakpoints.add(0)
+            for index in breakpoints:
+                messages[index] = _with_cache_control(messages[index])
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def send_message(self, message: str, model: str, history: list = None, max_tokens: int = None):
         """
         Отправка сообщения выбранной языковой модели.
         
         Args:
             message (str): Текст сообщения для отправки
             model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения беседы в формате API
+            max_tokens (int): Ограничение длины ответа в токенах
             
         Returns:
             dict: Ответ от API, содержащий либо ответ модели, либо информацию об ошибке
@@ -116,19 +197,17 @@ class OpenRouterClient:
         # Формирование данных для отправки в API
         data = {
             "model": model,  # Идентификатор выбранной модели
-            "messages": [{"role": "user", "content": message}]  # Сообщение в формате API
+            "messages": self.build_messages(message, history, model)  # Сообщения в формате API
         }
+        if max_tokens:
+            data["max_tokens"] = max_tokens
         
         try:
             # Логирование начала выполнения запроса
             self.logger.debug("Making API request")
 
             # Отправка POST запроса к API
-            response = requests.post(
-                f"{self.base_url}/chat/completions",  # Эндпоинт для чата
-                headers=self.headers,                 # Заголовки с авторизацией
-                json=data                            # Данные запроса
-            )
+            response = self.post_completion(data)
             
             # Проверка на ошибки HTTP
             response.raise_for_status()
@@ -145,7 +224,130 @@ class OpenRouterClient:
             # Логирование ошибки с полным стектрейсом для отладки
             self.logger.error(error_msg, exc_info=True)
             # Возврат сообщения об ошибке в формате ответа API
-            return {"error": str(e)}       
+            return {"error": str(e)}
+
+    def stream_message(self, message: str, model: str, on_delta, history: list = None,
+                       cancel=None):
+        """
+        Потоковая отправка сообщения выбранной языковой модели.
+        
+        Фрагменты ответа передаются в on_delta по мере генерации. Метод
+        блокирующий и предназначен для вызова из рабочего потока.
+        
+        Args:
+            message (str): Текст сообщения для отправки
+            model (str): Идентификатор выбранной модели
+            on_delta (callable): Функция, получающая каждый новый фрагмент текста
+            history (list): Предыдущие сообщения беседы в формате API
+            cancel (Cancellation): Остановка генерации: после установки чтение
+                                   ответа прерывается, а соединение закрывается
+            
+        Returns:
+            dict: Ответ в том же формате, что и send_message: собранный текст
+                  и статистика токенов либо информация об ошибке. У остановленной
+                  генерации текст частичный, а "truncated" равен True
+        """
+        self.logger.debug(f"Streaming message to model: {model}")
+        
+        data = {
+            "model": model,
+            "messages": self.build_messages(message, history, model),
+            "stream": True,
+            "stream_options": {"include_usage": True}  # Статистика токенов в конце потока
+        }
+        
+        parts = []    # Полученные фрагменты ответа
+        usage = {}    # Статистика токенов из последнего фрагмента
+        truncated = False
+        try:
+            response = self.post_completion(data, stream=True)
+            # Остановка закрывает соединение, даже пока поставщик молчит:
+            # генерация прекращается, и не сгенерированные токены не оплачиваются
+            if cancel is not None:
+                cancel.attach(response)
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if cancel is not None and cancel.is_set():
+                        truncated = True
+                        break
+                    chunk = parse_sse_line(line)
+                    if chunk is None:
+                        continue
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"].get("message", chunk["error"]))
+                    choices = chunk.get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+                    if chunk.get("usage"):
+                        usage = chunk["usage"]
+            except Exception:
+                # Ошибка чтения из-за закрытого остановкой соединения - не сбой
+                if cancel is None or not cancel.is_set():
+                    raise
+                truncated = True
+            finally:
+                if cancel is not None:
+                    cancel.attach(None)
+                response.close()
+            
+            if truncated:
+                self.logger.info(f"Stream cancelled after {len(parts)} chunks")
+            else:
+                self.logger.info("Successfully received streamed response from API")
+            return {
+                "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}],
+                "usage": usage,
+                "truncated": truncated
+            }
+        
+        except Exception as e:
+            error_msg = f"API stream failed: {str(e)}"
+            self.logger.error(error_msg, exc_info=True)
+            return {"error": str(e)}
+
+    def post_completion(self, payload: dict, stream: bool = False):
+        """
+        Отправка произвольного запроса к эндпоинту /chat/completions.
+        
+        Используется как основа для send_message и для прокси-сервера,
+        которому нужен «сырой» ответ API (статус, тело, поток SSE).
+        
+        Одинаковые детерминированные запросы (temperature = 0, без потока),
+        отправленные одновременно, выполняются один раз: каждый вызов получает
+        собственный объект ответа с тем же статусом, заголовками и телом.
+        
+        Args:
+            payload (dict): Тело запроса в формате OpenAI Chat Completions
+            stream (bool): Читать ли ответ потоково (для payload["stream"] = True)
+            
+        Returns:
+            requests.Response: Ответ API; при stream=True его нужно закрыть после чтения
+        """
+        def post():
+            return self.session.post(
+                f"{self.base_url}/chat/completions",  # Эндпоинт для чата
+                json=payload,                         # Данные запроса
+                stream=stream                         # Потоковое чтение ответа
+            )
+
+        # Ответы с ненулевой температурой различаются, а поток читается один раз
+        if stream or payload.get("temperature") != 0:
+            return post()
+        def fetch():
+            # Ожидающим вызовам передается неизменяемый снимок ответа:
+            # requests.Response хранит состояние чтения и не может быть общим
+            response = post()
+            return (response.status_code, response.reason, response.url,
+                    tuple(response.headers.items()), response.content)
+
+        key = ("POST", "/chat/completions", json.dumps(payload, sort_keys=True, ensure_ascii=False))
+        snapshot, shared = self._flights.do(key, fetch)
+        if shared:
+            self.logger.debug("Joined in-flight request: POST /chat/completions")
+        return _response_from_snapshot(snapshot)
 
     def get_balance(self):
         """
@@ -155,13 +357,8 @@ class OpenRouterClient:
             str: Строка с балансом в формате '$X.XX' или 'Ошибка' при неудаче
         """
         try:
-            # Запрос баланса через API
-            response = requests.get(
-                f"{self.base_url}/credits",  # Эндпоинт для проверки баланса
-                headers=self.headers         # Заголовки с авторизацией
-            )
-            # Получение данных из ответа
-            data = response.json()
+            # Запрос баланса через API (эндпоинт для проверки баланса)
+            data = self._get_json("/credits")
             if data:
                 data = data.get('data')
                 # Вычисление доступного баланса (всего кредитов минус использовано)
@@ -174,3 +371,76 @@ class OpenRouterClient:
             self.logger.error(error_msg, exc_info=True)
             # Возврат сообщения об ошибке
             return "Ошибка"
+
+    def _get_json(self, path: str):
+        """
+        GET-запрос к API с разбором ответа из JSON.
+        
+        Одновременные запросы к одному пути выполняются одним HTTP-запросом,
+        остальные вызовы получают тот же (общий) результат.
+        
+        Args:
+            path (str): Путь эндпоинта относительно base_url, например "/credits"
+            
+        Returns:
+            dict: Данные ответа
+        """
+        data, shared = self._flights.do(
+            ("GET", path),
+            lambda: self.session.get(f"{self.base_url}{path}").json()
+        )
+        if shared:
+            self.logger.debug(f"Joined in-flight request: GET {path}")
+        return data
+
+
+def _response_from_snapshot(snapshot: tuple) -> requests.Response:
+    """
+    Отдельный объект ответа из снимка (статус, причина, URL, заголовки, тело).
+
+    Поддерживает тот же интерфейс, что и ответ requests: ok, json(),
+    raise_for_status() и т.д.
+    """
+    status_code, reason, url, headers, content = snapshot
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
+
+
+def _with_cache_control(message: dict) -> dict:
+    """Копия сообщения с меткой кэширования префикса до него включительно."""
+    return {
+        "role": message["role"],
+        "content": [{
+            "type": "text",
+            "text": message["content"],
+            "cache_control": {"type": "ephemeral"}
+        }]
+    }
+
+
+def parse_sse_line(line: bytes):
+    """
+    Разбор строки потокового ответа (Server-Sent Events).
+    
+    Args:
+        line (bytes): Строка потока без завершающего перевода строки
+        
+    Returns:
+        dict | None: Данные фрагмента или None для служебных строк,
+                     комментариев и маркера завершения [DONE]
+    """
+    if not line.startswith(b"data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == b"[DONE]":
+        return None
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,420 @@
+# Импорт необходимых библиотек
+import asyncio      # Асинхронный сервер и конкурентная обработка клиентов
+import json         # Библиотека для работы с JSON форматом
+import threading    # Флаги отмены и блокировки для рабочих потоков
+import time         # Измерение времени ответа
+from concurrent.futures import ThreadPoolExecutor  # Пул потоков для блокирующих вызовов
+from http import HTTPStatus                       # Текстовые описания HTTP статусов
+from utils.logger import AppLogger                # Импорт собственного логгера
+from utils.tokens import cached_prompt_tokens     # Токены запроса из кэша поставщика
+from .openrouter import parse_sse_line            # Разбор строк потокового ответа
+
+# Максимальный размер тела входящего запроса (защита от случайных гигантских тел)
+MAX_BODY_SIZE = 32 * 1024 * 1024
+
+
+class ProxyServer:
+    """
+    Локальный OpenAI-совместимый прокси-сервер поверх OpenRouterClient.
+
+    Позволяет внутренним инструментам использовать ключ OpenRouter, кэш,
+    аналитику и логирование приложения без импорта Flet-интерфейса.
+
+    Обеспечивает:
+    - Эндпоинты /v1/chat/completions (включая stream) и /v1/models
+    - Конкурентную обработку клиентов на asyncio
+    - Общий пул «прогретых» HTTP-соединений к API для всех клиентов
+    - Запись диалогов в ChatCache и метрик в Analytics
+    """
+
+    def __init__(self, client, cache, analytics, host: str = "127.0.0.1", port: int = 8765):
+        """
+        Инициализация прокси-сервера.
+
+        Args:
+            client (OpenRouterClient): Клиент API с общим пулом соединений
+            cache (ChatCache): Хранилище истории сообщений
+            analytics (Analytics): Система сбора статистики
+            host (str): Адрес для прослушивания (по умолчанию только localhost)
+            port (int): Порт для прослушивания
+        """
+        self.client = client
+        self.cache = cache
+        self.analytics = analytics
+        self.host = host
+        self.port = port
+        self.logger = AppLogger()
+        self.server = None
+
+        # Диалоги клиентов прокси сохраняются в отдельную беседу,
+        # которая создается при первом запросе
+        self.conversation_id = None
+
+        # Блокирующие HTTP-вызовы выполняются в пуле потоков размером с пул
+        # соединений клиента: сколько бы клиентов ни подключилось, к API
+        # одновременно идет не больше запросов, чем есть соединений
+        self.executor = ThreadPoolExecutor(
+            max_workers=client.pool_size,
+            thread_name_prefix="proxy"
+        )
+
+        # Analytics хранит счетчики в обычных словарях, поэтому запись
+        # результатов из разных потоков выполняется последовательно
+        self._record_lock = threading.Lock()
+
+    async def start(self):
+        """Запуск прослушивания порта."""
+        self.server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.logger.info(f"Proxy server listening on http://{self.host}:{self.port}/v1")
+
+    async def serve_forever(self):
+        """Запуск сервера и обработка подключений до остановки процесса."""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Остановка сервера и освобождение пула потоков."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Обработка одного клиентского соединения (с поддержкой keep-alive).
+
+        Args:
+            reader (asyncio.StreamReader): Поток чтения запроса
+            writer (asyncio.StreamWriter): Поток записи ответа
+        """
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as e:
+                    await _write_json(writer, 400, _error_body(str(e)))
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                await self._dispatch(method, path, body, writer)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Клиент закрыл соединение - это штатная ситуация
+            pass
+        except Exception as e:
+            self.logger.error(f"Proxy connection error: {e}", exc_info=True)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer):
+        """Маршрутизация запроса к обработчику эндпоинта."""
+        path = path.rstrip("/")
+        if method == "GET" and path == "/v1/models":
+            await _write_json(writer, 200, self._models_payload())
+        elif method == "POST" and path == "/v1/chat/completions":
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                await _write_json(writer, 400, _error_body("Invalid JSON body"))
+                return
+            # Тело запроса к модели - только JSON объект
+            if not isinstance(payload, dict):
+                await _write_json(writer, 400, _error_body("Request body must be a JSON object"))
+                return
+            if payload.get("stream"):
+                await self._stream_completion(payload, writer)
+            else:
+                await self._completion(payload, writer)
+        else:
+            await _write_json(writer, 404, _error_body(f"Unknown endpoint: {method} {path}"))
+
+    def _models_payload(self) -> dict:
+        """Список моделей в формате OpenAI /v1/models."""
+        return {
+            "object": "list",
+            "data": [
+                {
+                    "id": model["id"],
+                    "object": "model",
+                    "created": 0,
+                    "owned_by": model["id"].split("/")[0],
+                    "name": model["name"]
+                }
+                for model in self.client.available_models
+            ]
+        }
+
+    async def _completion(self, payload: dict, writer):
+        """
+        Обработка обычного (непотокового) запроса к модели.
+
+        Ответ API передается клиенту без изменений, включая HTTP статус.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        try:
+            response = await loop.run_in_executor(
+                self.executor, self.client.post_completion, payload
+            )
+        except Exception as e:
+            self.logger.error(f"Proxy upstream request failed: {e}", exc_info=True)
+            await _write_json(writer, 502, _error_body(f"Upstream request failed: {e}"))
+            return
+
+        await _write_response(
+            writer,
+            response.status_code,
+            response.content,
+            response.headers.get("Content-Type", "application/json")
+        )
+
+        if response.ok:
+            try:
+                data = response.json()
+                text = data["choices"][0]["message"]["content"] or ""
+                usage = data.get("usage") or {}
+            except (ValueError, KeyError, IndexError):
+                return
+            await self._record(payload, text, usage, time.time() - start_time)
+
+    async def _stream_completion(self, payload: dict, writer):
+        """
+        Обработка потокового запроса (Server-Sent Events).
+
+        Чтение ответа API выполняется в рабочем потоке, строки SSE
+        передаются в цикл событий через очередь и сразу отправляются клиенту.
+        Если клиент отключился, чтение из API прерывается, чтобы не платить
+        за ненужные токены.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+        start_time = time.time()
+
+        def put(kind, value=None):
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+
+        def pump():
+            try:
+                response = self.client.post_completion(payload, stream=True)
+            except Exception as e:
+                put("error", e)
+                return
+            try:
+                if not response.ok:
+                    put("body", response)
+                    return
+                put("start", response)
+                for line in response.iter_lines():
+                    if cancelled.is_set():
+                        break
+                    put("line", line)
+            except Exception as e:
+                put("error", e)
+            finally:
+                response.close()
+                put("end")
+
+        loop.run_in_executor(self.executor, pump)
+
+        parts = []          # Фрагменты текста ответа для сохранения в кэш
+        usage = {}          # Итоговая статистика токенов (если API ее прислал)
+        started = False
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "error":
+                    self.logger.error(f"Proxy upstream stream failed: {value}")
+                    if not started:
+                        await _write_json(writer, 502, _error_body(f"Upstream request failed: {value}"))
+                        return
+                    # Поток уже начат: клиент получает событие с ошибкой и
+                    # завершение ответа, иначе он ждал бы продолжения или принял
+                    # следующий ответ на этом соединении за часть текущего
+                    error = json.dumps(_error_body(f"Upstream stream failed: {value}"),
+                                       ensure_ascii=False)
+                    await _write_chunk(writer, f"data: {error}\n\n".encode("utf-8"))
+                    break
+                if kind == "body":
+                    await _write_response(
+                        writer,
+                        value.status_code,
+                        value.content,
+                        value.headers.get("Content-Type", "application/json")
+                    )
+                    return
+                if kind == "start":
+                    started = True
+                    writer.write(_response_head(200, {
+                        "Content-Type": "text/event-stream",
+                        "Cache-Control": "no-cache",
+                        "Transfer-Encoding": "chunked"
+                    }))
+                    await writer.drain()
+                elif kind == "line":
+                    # Пустые строки разделяют события SSE и тоже передаются клиенту
+                    await _write_chunk(writer, value + b"\n")
+                    delta, chunk_usage = _parse_sse_line(value)
+                    if delta:
+                        parts.append(delta)
+                    if chunk_usage:
+                        usage = chunk_usage
+                elif kind == "end":
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            cancelled.set()
+            raise
+
+        # Завершение ответа и сохранение полученного текста (при ошибке
+        # потока - частичного)
+        if started:
+            await _write_chunk(writer, b"")
+            await self._record(payload, "".join(parts), usage, time.time() - start_time)
+
+    async def _record(self, payload: dict, text: str, usage: dict, response_time: float):
+        """
+        Сохранение диалога в ChatCache и метрик в Analytics.
+
+        Запись выполняется в пуле потоков, чтобы не блокировать цикл событий.
+        """
+        model = payload.get("model")
+        user_message = _last_user_message(payload.get("messages", []))
+        tokens_used = usage.get("total_tokens", 0)
+
+        def record():
+            with self._record_lock:
+                if self.conversation_id is None:
+                    self.conversation_id = self.cache.create_conversation("API прокси")
+                self.cache.save_message(
+                    model=model,
+                    user_message=user_message,
+                    ai_response=text,
+                    tokens_used=tokens_used,
+                    conversation_id=self.conversation_id
+                )
+                self.analytics.track_message(
+                    model=model,
+                    message_length=len(user_message),
+                    response_time=response_time,
+                    tokens_used=tokens_used,
+                    prompt_tokens=usage.get("prompt_tokens", 0),
+                    cached_tokens=cached_prompt_tokens(usage)
+                )
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, record)
+        except Exception as e:
+            self.logger.error(f"Proxy failed to record message: {e}", exc_info=True)
+
+
+async def _read_request(reader):
+    """
+    Чтение HTTP/1.1 запроса из потока.
+
+    Returns:
+        tuple | None: (method, path, headers, body) или None, если клиент
+                      закрыл соединение
+
+    Raises:
+        ValueError: Если запрос имеет некорректный формат
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ValueError("Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_SIZE:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _response_head(status: int, headers: dict) -> bytes:
+    """Формирование строки статуса и заголовков ответа."""
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _write_response(writer, status: int, body: bytes, content_type: str):
+    """Отправка ответа с телом фиксированной длины."""
+    writer.write(_response_head(status, {
+        "Content-Type": content_type,
+        "Content-Length": len(body)
+    }) + body)
+    await writer.drain()
+
+
+async def _write_json(writer, status: int, payload: dict):
+    """Отправка JSON ответа."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await _write_response(writer, status, body, "application/json")
+
+
+async def _write_chunk(writer, data: bytes):
+    """Отправка одного фрагмента в chunked-кодировке (пустой - завершающий)."""
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+    await writer.drain()
+
+
+def _error_body(message: str) -> dict:
+    """Тело ошибки в формате OpenAI API."""
+    return {"error": {"message": message, "type": "proxy_error"}}
+
+
+def _parse_sse_line(line: bytes):
+    """
+    Извлечение фрагмента текста и статистики токенов из строки SSE.
+
+    Returns:
+        tuple: (текст дельты или None, словарь usage или None)
+    """
+    chunk = parse_sse_line(line)
+    if chunk is None:
+        return None, None
+
+    delta = None
+    choices = chunk.get("choices") or []
+    if choices:
+        delta = (choices[0].get("delta") or {}).get("content")
+    return delta, chunk.get("usage")
+
+
+def _last_user_message(messages: list) -> str:
+    """Текст последнего сообщения пользователя из списка messages."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                # Мультимодальный формат: берем только текстовые части
+                content = "".join(
+                    part.get("text", "") for part in content if isinstance(part, dict)
+                )
+            return content
+    return ""
@@ -0,0 +1,69 @@
+# Импорт необходимых библиотек
+import threading    # Запросы выполняются из разных потоков
+
+
+class _Call:
+    """Выполняющийся вызов и его результат."""
+
+    def __init__(self):
+        self.done = threading.Event()   # Устанавливается по завершении вызова
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вызовов.
+
+    Пока вызов с ключом выполняется, остальные потоки с тем же ключом
+    не повторяют его, а ждут и получают тот же результат (или то же
+    исключение). После завершения ключ освобождается, поэтому результаты
+    не кэшируются: следующий вызов снова выполняется.
+
+    Результат общий для всех ожидавших потоков и не должен изменяться.
+    """
+
+    def __init__(self):
+        """Инициализация без выполняющихся вызовов."""
+        self._calls = {}                # Ключ -> выполняющийся вызов
+        self._lock = threading.Lock()
+        self.shared = 0                 # Вызовов, получивших результат чужого запроса
+
+    def do(self, key, fn):
+        """
+        Выполнение fn или ожидание уже выполняющегося вызова с тем же ключом.
+
+        Args:
+            key: Неизменяемый ключ запроса
+            fn (callable): Вызов без аргументов
+
+        Returns:
+            tuple: (результат, True если он получен от чужого вызова)
+
+        Raises:
+            Exception: Исключение fn (в том числе у ожидавших потоков)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
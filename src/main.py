@@ -1,21 +1,40 @@
 # Импорт необходимых библиотек и модулей
+import time                                        # Библиотека для работы с временными метками
+
+# Начало отсчета этапов запуска (до импорта тяжелых модулей)
+STARTUP_ORIGIN = time.perf_counter()
+
 import flet as ft                                  # Фреймворк для создания кроссплатформенных приложений с современным UI
 from api.openrouter import OpenRouterClient        # Клиент для взаимодействия с AI API через OpenRouter
+from api.cancellation import Cancellation          # Остановка потокового ответа API
 from ui.styles import AppStyles                    # Модуль с настройками стилей интерфейса
-from ui.components import MessageBubble, ModelSelector  # Компоненты пользовательского интерфейса
+from ui.components import (                        # Компоненты пользовательского интерфейса
+    ConversationSelector,
+    MessageBubble,
+    ModelSelector
+)
+from ui.scheduler import UIUpdateScheduler         # Планировщик объединенных обновлений интерфейса
+from ui.chat_list import VirtualChatList           # Виртуализированный список сообщений
 from utils.cache import ChatCache                  # Модуль для кэширования истории чата
+from utils.exporter import ChatExporter            # Потоковый экспорт истории чата
+from utils.importer import ChatImporter            # Массовый импорт истории чата
+from utils.retention import RetentionManager       # Политики хранения и архивация старой истории
+from utils.send_queue import SendQueue             # Очереди отправки сообщений по беседам
+from utils.tokens import (                          # Локальная оценка количества токенов
+    TokenEstimator,
+    cached_prompt_tokens
+)
+from utils.summarizer import ConversationSummarizer  # Краткое содержание длинных бесед
 from utils.logger import AppLogger                 # Модуль для логирования работы приложения
 from utils.analytics import Analytics              # Модуль для сбора и анализа статистики использования
 from utils.monitor import PerformanceMonitor       # Модуль для мониторинга производительности
+from utils.timeline import StartupTimeline         # Отметки этапов запуска
 from utils.notifications import (                  # Модуль для уведомлений
     check_and_notify_low_balance, 
     notify_startup, 
     notify_error
 )
 import asyncio                                     # Библиотека для асинхронного программирования
-import time                                        # Библиотека для работы с временными метками
-import json                                        # Библиотека для работы с JSON-данными
-from datetime import datetime                      # Класс для работы с датой и временем
 import os                                          # Библиотека для работы с операционной системой
 import threading                                   # Библиотека для работы с потоками
 
@@ -24,6 +43,9 @@ class ChatApp:
     Основной класс приложения чата.
     Управляет всей логикой работы приложения, включая UI и взаимодействие с API.
     """
+    # Соединение с API, не использовавшееся дольше этого времени (в секундах),
+    # заново открывается заранее, когда пользователь начинает набирать сообщение
+    PREWARM_INTERVAL = 30
     def __init__(self):
         """
         Инициализация основных компонентов приложения:
@@ -33,8 +55,12 @@ class ChatApp:
         - Система аналитики для сбора статистики
         - Система мониторинга для отслеживания производительности
         """
+        # Шкала этапов запуска: время до первой отрисовки и до готовности к работе
+        self.timeline = StartupTimeline(STARTUP_ORIGIN)
+        
         # Инициализация основных компонентов
-        self.api_client = OpenRouterClient()       # Создание клиента для работы с AI API
+        # Каталог моделей загружается в фоне после отрисовки интерфейса
+        self.api_client = OpenRouterClient(load_models=False)  # Создание клиента для работы с AI API
         self.cache = ChatCache()                   # Инициализация системы кэширования
         self.logger = AppLogger()                  # Инициализация системы логирования
         self.analytics = Analytics(self.cache)     # Инициализация системы аналитики с передачей кэша
@@ -49,10 +75,47 @@ class ChatApp:
         # Создание директории для экспорта истории чата
         self.exports_dir = "exports"               # Путь к директории экспорта
         os.makedirs(self.exports_dir, exist_ok=True)  # Создание директории, если её нет
+        self.exporter = ChatExporter(self.cache, self.exports_dir)  # Экспорт истории
+        self.importer = ChatImporter(self.cache)    # Импорт истории
+        
+        # Очистка по политикам хранения (RETENTION_*): устаревшие сообщения
+        # архивируются в директорию archive
+        self.retention = RetentionManager(self.cache, "archive")
+        
+        # Оценка токенов: бюджет истории беседы (CONTEXT_TOKENS) и резерв
+        # под ответ модели (MAX_TOKENS)
+        self.tokens = TokenEstimator()
+        self.context_tokens = int(os.getenv("CONTEXT_TOKENS", "4000"))
+        self.max_tokens = int(os.getenv("MAX_TOKENS", "1000"))
+        
+        # Старая часть длинных бесед сворачивается дешевой моделью (SUMMARY_MODEL)
+        self.summarizer = ConversationSummarizer(
+            self.api_client, self.cache, self.tokens, self.analytics,
+            on_update=self.refresh_history_tokens
+        )
+        
+        # Оценка токенов истории бесед для счетчика под полем ввода (ID беседы ->
+        # токены): пересчитывается при изменении истории, а не на каждое нажатие
+        self.history_tokens = {}
         
         # Флаг для отслеживания отправки уведомления о низком балансе
         self.low_balance_notified = False
         
+        # Идущие генерации ответов: ID беседы -> событие их остановки
+        self.generations = {}
+        
+        # Интервал проверки изменений базы другими экземплярами приложения
+        # (в секундах, 0 - не проверять)
+        self.db_poll_interval = float(os.getenv("DB_POLL_INTERVAL", "2"))
+        
+        # Планировщик обновлений интерфейса (создается вместе со страницей)
+        self.ui = None
+        
+        # Время последнего использования соединения с API (time.monotonic)
+        self._warmed_at = 0.0
+        
+        self.timeline.mark("init")
+        
     def get_openrouter_balance(self) -> float:
         """
         Получает текущий баланс аккаунта OpenRouter
@@ -62,14 +125,20 @@ class ChatApp:
         """
         try:
             balance = self.api_client.get_balance()
-            return float(balance)
+            return float(balance.lstrip("$"))
         except Exception as e:
             self.logger.error(f"Ошибка получения баланса: {e}")
             return 0.0
 
     def periodic_balance_check(self):
-        """Периодическая проверка баланса каждые 30 минут"""
+        """
+        Периодическая проверка баланса каждые 30 минут.
+        Первая проверка выполняется при запуске (start_background_tasks).
+        """
         while True:
+            # Ожидание 30 минут перед следующей проверкой
+            time.sleep(1800)  # 30 минут * 60 секунд
+            
             try:
                 balance = self.get_openrouter_balance()
                 self.update_balance_display(balance)
@@ -88,9 +157,6 @@ class ChatApp:
                     
             except Exception as e:
                 self.logger.error(f"Ошибка периодической проверки баланса: {e}")
-            
-            # Ожидание 30 минут перед следующей проверкой
-            time.sleep(1800)  # 30 минут * 60 секунд
 
     def update_balance_display(self, balance: float):
         """Обновление отображения баланса в UI"""
@@ -102,34 +168,221 @@ class ChatApp:
                 self.balance_text.color = ft.Colors.ORANGE_400
             else:
                 self.balance_text.color = ft.Colors.GREEN_400
+            
+            # Метод вызывается и из фонового потока проверки баланса,
+            # поэтому изменение отправляется через планировщик
+            if self.ui:
+                self.ui.mark_dirty(self.balance_text)
         except Exception as e:
             self.logger.error(f"Ошибка обновления отображения баланса: {e}")
 
+    def build_context(self, message: str, model: str, conversation_id: int,
+                      update_window: bool = True):
+        """
+        Подбор последних сообщений беседы в контекст запроса.
+        
+        Сообщения, свернутые в краткое содержание, заменяются им. Контекст
+        ограничен CONTEXT_TOKENS и окном контекста модели за вычетом нового
+        сообщения и резерва под ответ.
+        
+        Args:
+            message (str): Текст нового сообщения
+            model (str): ID выбранной модели
+            conversation_id (int): ID беседы
+            update_window (bool): Запомнить сдвиг окна истории (False - только оценка)
+            
+        Returns:
+            tuple: (история в формате API, оценка токенов истории,
+                    оценка токенов нового сообщения)
+        """
+        message_tokens = self.tokens.count(message, model)
+        budget = self.context_tokens
+        context_length = (self.models_by_id.get(model) or {}).get("context_length")
+        if context_length:
+            budget = min(budget, context_length - self.max_tokens - message_tokens)
+        if conversation_id is None or budget <= 0:
+            return [], 0, message_tokens
+        
+        history, history_tokens = self.summarizer.build_context(
+            conversation_id, budget, model, update_window=update_window
+        )
+        return history, history_tokens, message_tokens
+
+    def refresh_history_tokens(self, conversation_id: int = None):
+        """
+        Пересчет токенов истории беседы для счетчика под полем ввода.
+        
+        Вызывается при изменении истории или модели (открытие беседы, сохранение
+        ответа, обновление содержания), поэтому обработчик нажатий клавиш
+        не читает базу и не сдвигает окно истории.
+        
+        Args:
+            conversation_id (int): ID беседы (None - открытая)
+        """
+        try:
+            if conversation_id is None:
+                conversation_id = self.chat_history.conversation_id
+            if conversation_id is None:
+                return
+            _, history_tokens, _ = self.build_context(
+                "", self.model_dropdown.value, conversation_id, update_window=False
+            )
+            self.history_tokens[conversation_id] = history_tokens
+            if conversation_id == self.chat_history.conversation_id:
+                self.update_token_counter()
+        except Exception as e:
+            self.logger.error(f"Ошибка оценки токенов истории: {e}")
+
+    def update_token_counter(self, e=None):
+        """
+        Обновление оценки токенов и стоимости запроса под полем ввода.
+        
+        Вызывается на каждое нажатие клавиши: оценивается только набираемый
+        текст, токены истории берутся из history_tokens.
+        """
+        try:
+            message = self.message_input.value or ""
+            if not message:
+                self.token_text.value = ""
+            else:
+                # Пользователь набирает сообщение - соединение понадобится скоро
+                self.prewarm_connection()
+                model = self.model_dropdown.value
+                message_tokens = self.tokens.count(message, model)
+                history_tokens = self.history_tokens.get(self.chat_history.conversation_id, 0)
+                text = f"≈{message_tokens} ток."
+                if history_tokens:
+                    text += f" (+{history_tokens} история)"
+                cost = self.tokens.estimate_cost(
+                    (self.models_by_id.get(model) or {}).get("pricing"),
+                    message_tokens + history_tokens
+                )
+                if cost:
+                    text += f" · ≈${cost:.4f}"
+                self.token_text.value = text
+            self.ui.mark_dirty(self.token_text)
+        except Exception as e:
+            self.logger.error(f"Ошибка оценки токенов: {e}")
+
     def load_chat_history(self):
         """
         Загрузка истории чата из кэша и отображение её в интерфейсе.
-        Сообщения добавляются в обратном порядке для правильной хронологии.
+        Открывается последняя беседа (или создается новая, если бесед нет).
+        Отображаются последние сообщения; более старые подгружаются
+        списком при прокрутке вверх.
         """
         try:
-            history = self.cache.get_chat_history()    # Получение истории из кэша
-            for msg in reversed(history):              # Перебор сообщений в обратном порядке
-                # Распаковка данных сообщения в отдельные переменные
-                _, model, user_message, ai_response, timestamp, tokens = msg
-                # Добавление пары сообщений (пользователь + AI) в интерфейс
-                self.chat_history.controls.extend([
-                    MessageBubble(                     # Создание пузырька сообщения пользователя
-                        message=user_message,
-                        is_user=True
-                    ),
-                    MessageBubble(                     # Создание пузырька ответа AI
-                        message=ai_response,
-                        is_user=False
-                    )
-                ])
+            conversations = self.cache.list_conversations()
+            if conversations:
+                conversation_id = conversations[0][0]
+            else:
+                conversation_id = self.cache.create_conversation()
+            self.open_conversation(conversation_id)
         except Exception as e:
             # Логирование ошибки при загрузке истории
             self.logger.error(f"Ошибка загрузки истории чата: {e}")
 
+    def open_conversation(self, conversation_id: int):
+        """
+        Переключение на беседу.
+        
+        Args:
+            conversation_id (int): ID беседы
+        """
+        self.chat_history.switch_conversation(conversation_id)
+        self.update_conversation_list()
+        self.update_send_controls()
+        self.refresh_history_tokens(conversation_id)
+
+    def update_send_controls(self, conversation_id=None):
+        """
+        Обновление кнопок отправки и остановки для открытой беседы.
+        
+        Кнопка остановки видна, пока в беседе генерируется ответ. Кнопка
+        отправки показывает количество сообщений в очереди беседы.
+        
+        Args:
+            conversation_id (int): ID изменившейся беседы (None - открытая)
+        """
+        current = self.chat_history.conversation_id
+        if conversation_id is not None and conversation_id != current:
+            return
+        self.stop_button.visible = current in self.generations
+        
+        queued = self.send_queue.pending(current)
+        self.send_button.text = AppStyles.SEND_BUTTON["text"]
+        self.send_button.tooltip = AppStyles.SEND_BUTTON["tooltip"]
+        if queued:
+            self.send_button.text += f" ({queued})"
+        if self.send_queue.saturated(current):
+            self.send_button.tooltip = "Очередь заполнена: сообщение будет добавлено к последнему в очереди"
+        self.ui.mark_dirty(self.stop_button, self.send_button)
+
+    def estimate_savings(self, text: str, model: str, generation_time: float):
+        """
+        Оценка токенов и времени, сэкономленных остановкой генерации.
+        
+        Ожидаемая длина ответа - резерв MAX_TOKENS, скорость генерации
+        измеряется по уже полученной части ответа.
+        
+        Args:
+            text (str): Полученная часть ответа
+            model (str): ID модели
+            generation_time (float): Время от первого фрагмента до остановки в секундах
+            
+        Returns:
+            tuple: (оценка токенов полученной части, сэкономленных токенов,
+                    сэкономленного времени в секундах)
+        """
+        generated = self.tokens.count(text, model)
+        saved_tokens = max(0, self.max_tokens - generated)
+        saved_time = 0.0
+        if generated and generation_time > 0:
+            saved_time = saved_tokens * generation_time / generated
+        return generated, saved_tokens, saved_time
+
+    def update_conversation_list(self):
+        """Обновление списка бесед в интерфейсе."""
+        self.conversation_selector.set_conversations(
+            self.cache.list_conversations(),
+            self.chat_history.conversation_id
+        )
+        self.ui.mark_dirty(self.conversation_selector)
+
+    async def watch_database(self):
+        """
+        Отслеживание изменений базы другими экземплярами приложения.
+        
+        Раз в DB_POLL_INTERVAL секунд проверяется версия данных базы; если
+        она изменилась, история открытой беседы, список бесед и аналитика
+        дополняются новыми записями без полной перезагрузки.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.db_poll_interval)
+            try:
+                if not await loop.run_in_executor(None, self.cache.poll_changes):
+                    continue
+                await loop.run_in_executor(None, self.analytics.refresh)
+                self.refresh_from_database()
+            except Exception as e:
+                self.logger.error(f"Ошибка проверки изменений базы: {e}")
+
+    def refresh_from_database(self):
+        """Отображение изменений базы, сделанных другим экземпляром приложения."""
+        conversations = self.cache.list_conversations()
+        if not any(row[0] == self.chat_history.conversation_id for row in conversations):
+            # Открытая беседа удалена в другом экземпляре
+            self.load_chat_history()
+            return
+        if self.chat_history.append_new():
+            self.logger.info("История дополнена сообщениями другого экземпляра приложения")
+            self.refresh_history_tokens()
+        self.conversation_selector.set_conversations(
+            conversations, self.chat_history.conversation_id
+        )
+        self.ui.mark_dirty(self.conversation_selector)
+
     def update_balance(self):
         """
         Обновление отображения баланса API в интерфейсе.
@@ -150,8 +403,67 @@ class ChatApp:
             # Обработка ошибки получения баланса
             self.balance_text.value = "Баланс: н/д"
             self.balance_text.color = ft.Colors.RED_400
+            self.ui.mark_dirty(self.balance_text)
             self.logger.error(f"Ошибка обновления баланса: {e}")
             
+    def load_models(self):
+        """
+        Загрузка каталога моделей и заполнение списка выбора модели.
+        Выполняется в фоновом потоке; после нее приложение готово к отправке.
+        """
+        models = self.api_client.get_models()
+        self.api_client.available_models = models
+        self.models_by_id = {model["id"]: model for model in models}
+        self.model_dropdown.set_models(models)
+        self.ui.mark_dirty(self.model_dropdown)
+        
+        # Запрос каталога открыл соединение с API, оно остается в пуле
+        self._warmed_at = time.monotonic()
+        self.timeline.mark("interactive")
+
+    def start_background_tasks(self):
+        """
+        Параллельный запуск сетевых операций старта в фоновых потоках:
+        загрузки каталога моделей, проверки баланса и уведомления о запуске.
+        Когда все завершены, в лог пишутся этапы запуска.
+        """
+        tasks = {
+            "models": self.load_models,
+            "balance": self.update_balance,
+            "notify": lambda: notify_startup("1.0.0")
+        }
+        pending = [len(tasks)]
+        lock = threading.Lock()
+        
+        def run(name, task):
+            try:
+                task()
+            except Exception as e:
+                self.logger.error(f"Ошибка фоновой задачи запуска {name}: {e}")
+            finally:
+                self.timeline.mark(name)
+                with lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    self.logger.info(f"Этапы запуска: {self.timeline.format()}")
+        
+        for name, task in tasks.items():
+            threading.Thread(
+                target=run, args=(name, task), name=f"startup-{name}", daemon=True
+            ).start()
+
+    def prewarm_connection(self):
+        """
+        Заблаговременное открытие соединения с API в фоне, если оно
+        не использовалось дольше PREWARM_INTERVAL (сервер мог его закрыть).
+        """
+        now = time.monotonic()
+        if now - self._warmed_at < self.PREWARM_INTERVAL:
+            return
+        self._warmed_at = now
+        threading.Thread(target=self.api_client.prewarm, daemon=True).start()
+
     def main(self, page: ft.Page):
         """
         Основная функция инициализации интерфейса приложения.
@@ -166,13 +478,14 @@ class ChatApp:
 
         AppStyles.set_window_size(page)    # Установка размеров окна приложения
 
-        # Инициализация выпадающего списка для выбора модели AI
-        models = self.api_client.available_models
-        self.model_dropdown = ModelSelector(models)
-        self.model_dropdown.value = models[0] if models else None
+        # Все частые обновления интерфейса объединяются не чаще UI_FPS раз в секунду
+        self.ui = UIUpdateScheduler(page, fps=int(os.getenv("UI_FPS", "30")))
 
-        # Уведомление о запуске приложения
-        notify_startup("1.0.0")
+        # Инициализация выпадающего списка для выбора модели AI
+        # (заполняется после загрузки каталога в фоне)
+        self.model_dropdown = ModelSelector(self.api_client.available_models)
+        self.model_dropdown.on_change = lambda e: self.refresh_history_tokens()
+        self.models_by_id = {}
 
         # Запуск периодической проверки баланса в отдельном потоке
         balance_thread = threading.Thread(
@@ -181,83 +494,195 @@ class ChatApp:
         )
         balance_thread.start()
 
+        # Запуск фоновой очистки истории, если заданы политики хранения
+        if self.retention.enabled:
+            self.retention.start()
+
         async def send_message_click(e):
             """
             Асинхронная функция отправки сообщения.
+            
+            Сообщение добавляется в очередь беседы: ответы на сообщения одной
+            беседы запрашиваются по одному и отображаются в порядке отправки.
+            Если очередь заполнена, текст добавляется к последнему
+            ожидающему сообщению.
             """
-            if not self.message_input.value:
+            # Без выбранной модели (каталог еще загружается) отправлять некуда
+            if not self.message_input.value or not self.model_dropdown.value:
                 return
 
-            try:
-                # Визуальная индикация процесса
-                self.message_input.border_color = ft.Colors.BLUE_400
-                page.update()
+            # Визуальная индикация процесса
+            self.message_input.border_color = ft.Colors.BLUE_400
+
+            user_message = self.message_input.value
+            conversation_id = self.chat_history.conversation_id
+            self.message_input.value = ""
+            self.token_text.value = ""
+            self.ui.mark_dirty(self.message_input, self.token_text)
+
+            # Очередь заполнена: сообщение объединяется с последним ожидающим
+            item = self.send_queue.last(conversation_id)
+            if item is not None and self.send_queue.saturated(conversation_id):
+                item["text"] += "\n\n" + user_message
+                self.ui.mark_dirty(*item["user_bubble"].set_text(item["text"]))
+                self.logger.info(f"Очередь беседы {conversation_id} заполнена: сообщение объединено")
+                return
+
+            # Добавление сообщения пользователя и индикатора загрузки
+            # (или отметки об ожидании, если беседа занята предыдущим сообщением)
+            user_bubble = MessageBubble(message=user_message, is_user=True)
+            if self.send_queue.busy(conversation_id):
+                placeholder = ft.Text("В очереди", **AppStyles.QUEUED_NOTE)
+            else:
+                placeholder = ft.ProgressRing()
+            entry = self.chat_history.add_live(user_bubble, placeholder)
 
-                # Сохранение данных сообщения
+            self.send_queue.submit(conversation_id, {
+                "text": user_message,
+                "model": self.model_dropdown.value,
+                "conversation_id": conversation_id,
+                "entry": entry,
+                "user_bubble": user_bubble,
+                "placeholder": placeholder
+            })
+
+        async def process_message(item):
+            """
+            Отправка сообщения из очереди и сохранение ответа.
+            
+            Args:
+                item (dict): Сообщение, добавленное send_message_click
+            """
+            try:
+                # Сохранение данных сообщения (время ответа - без ожидания в очереди)
                 start_time = time.time()
-                user_message = self.message_input.value
-                self.message_input.value = ""
-                page.update()
+                user_message = item["text"]
+                model = item["model"]
+                conversation_id = item["conversation_id"]
+                entry = item["entry"]
 
-                # Добавление сообщения пользователя
-                self.chat_history.controls.append(
-                    MessageBubble(message=user_message, is_user=True)
+                # История беседы, помещающаяся в бюджет токенов; собирается
+                # при отправке, чтобы включить ответы на предыдущие сообщения
+                history, history_tokens, message_tokens = self.build_context(
+                    user_message, model, conversation_id
                 )
 
-                # Индикатор загрузки
+                # Индикатор загрузки вместо отметки об ожидании
                 loading = ft.ProgressRing()
-                self.chat_history.controls.append(loading)
-                page.update()
+                self.chat_history.replace_control(entry, item["placeholder"], loading)
+                self._warmed_at = time.monotonic()
 
-                # Асинхронная отправка запроса
+                # Пузырек ответа заменяет индикатор загрузки с первым фрагментом
+                # и дополняется по мере генерации
+                ai_bubble = MessageBubble(message="", is_user=False)
                 loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(
-                    None,
-                    lambda: self.api_client.send_message(
-                        user_message, 
-                        self.model_dropdown.value
-                    )
-                )
+                first_delta_at = []     # Время первого фрагмента ответа
+
+                def show_bubble():
+                    self.chat_history.replace_control(entry, loading, ai_bubble)
 
-                # Удаление индикатора загрузки
-                self.chat_history.controls.remove(loading)
+                def apply_delta(delta):
+                    if not first_delta_at:
+                        first_delta_at.append(time.monotonic())
+                    show_bubble()
+                    self.ui.mark_dirty(*ai_bubble.append_text(delta))
+
+                # Генерацию можно остановить кнопкой "Стоп", пока она идет
+                cancel = Cancellation()
+                self.generations[conversation_id] = cancel
+                self.update_send_controls(conversation_id)
+
+                # Асинхронная потоковая отправка запроса: фрагменты передаются
+                # из рабочего потока в цикл событий страницы
+                try:
+                    response = await loop.run_in_executor(
+                        None,
+                        lambda: self.api_client.stream_message(
+                            user_message, 
+                            model,
+                            on_delta=lambda delta: loop.call_soon_threadsafe(apply_delta, delta),
+                            history=history,
+                            cancel=cancel
+                        )
+                    )
+                finally:
+                    if self.generations.get(conversation_id) is cancel:
+                        del self.generations[conversation_id]
+                    self.update_send_controls(conversation_id)
 
                 # Обработка ответа
+                truncated = response.get("truncated", False)
+                saved_tokens, saved_time = 0, 0.0
                 if "error" in response:
                     response_text = f"Ошибка: {response['error']}"
                     tokens_used = 0
+                    usage = {}
                     self.logger.error(f"Ошибка API: {response['error']}")
                     # Уведомление об ошибке в Telegram
                     notify_error(f"API Error: {response['error']}")
                 else:
                     response_text = response["choices"][0]["message"]["content"]
-                    tokens_used = response.get("usage", {}).get("total_tokens", 0)
+                    usage = response.get("usage", {})
+                    tokens_used = usage.get("total_tokens", 0)
+                    if truncated:
+                        # Поток закрыт до статистики токенов: оценка по тексту
+                        generated, saved_tokens, saved_time = self.estimate_savings(
+                            response_text,
+                            model,
+                            time.monotonic() - first_delta_at[0] if first_delta_at else 0.0
+                        )
+                        usage = {"prompt_tokens": history_tokens + message_tokens}
+                        tokens_used = usage["prompt_tokens"] + generated
+                        self.logger.info(
+                            f"Генерация остановлена: получено ≈{generated} ток., "
+                            f"сэкономлено ≈{saved_tokens} ток. и ≈{saved_time:.1f} с"
+                        )
 
-                # Сохранение в кэш
-                self.cache.save_message(
-                    model=self.model_dropdown.value,
+                # Сохранение в кэш до изменения интерфейса: ошибка отображения
+                # не должна приводить к потере ответа
+                row_id = self.cache.save_message(
+                    model=model,
                     user_message=user_message,
                     ai_response=response_text,
-                    tokens_used=tokens_used
+                    tokens_used=tokens_used,
+                    conversation_id=conversation_id,
+                    truncated=truncated
                 )
 
-                # Добавление ответа в чат
-                self.chat_history.controls.append(
-                    MessageBubble(message=response_text, is_user=False)
-                )
+                # Окончательный вид ответа (запись может быть не видна,
+                # если пользователь открыл другую беседу)
+                show_bubble()
+                if "error" in response:
+                    self.ui.mark_dirty(*ai_bubble.set_text(response_text))
+                else:
+                    ai_bubble.finish()
+                    if truncated:
+                        self.ui.mark_dirty(*ai_bubble.mark_truncated())
+                self.chat_history.commit(entry, row_id)
+                self.refresh_history_tokens(conversation_id)
+
+                # Сворачивание старой части беседы, если она стала слишком длинной
+                self.summarizer.schedule(conversation_id)
+
+                # Первое сообщение дает беседе название и поднимает ее в списке
+                self.update_conversation_list()
 
                 # Обновление аналитики
                 response_time = time.time() - start_time
                 self.analytics.track_message(
-                    model=self.model_dropdown.value,
+                    model=model,
                     message_length=len(user_message),
                     response_time=response_time,
-                    tokens_used=tokens_used
+                    tokens_used=tokens_used,
+                    prompt_tokens=usage.get("prompt_tokens", 0),
+                    cached_tokens=cached_prompt_tokens(usage),
+                    cancelled=truncated,
+                    saved_tokens=saved_tokens,
+                    saved_time=saved_time
                 )
 
                 # Логирование метрик
                 self.monitor.log_metrics(self.logger)
-                page.update()
 
             except Exception as e:
                 self.logger.error(f"Ошибка отправки сообщения: {e}")
@@ -277,7 +702,13 @@ class ChatApp:
                 )
                 page.overlay.append(snack)
                 snack.open = True
-                page.update()
+                self.ui.mark_dirty()
+
+        async def stop_generation(e):
+            """Остановка генерации ответа в открытой беседе"""
+            cancel = self.generations.get(self.chat_history.conversation_id)
+            if cancel is not None:
+                cancel.set()
 
         def show_error_snack(page, message: str):
             """Показ уведомления об ошибке"""
@@ -304,6 +735,15 @@ class ChatApp:
                     ft.Text(f"Всего сообщений: {stats['total_messages']}"),
                     ft.Text(f"Всего токенов: {stats['total_tokens']}"),
                     ft.Text(f"Среднее токенов/сообщение: {stats['tokens_per_message']:.2f}"),
+                    ft.Text(
+                        f"Токенов запроса из кэша: {stats['cached_tokens']} "
+                        f"({stats['cache_hit_rate']:.0%})"
+                    ),
+                    ft.Text(
+                        f"Остановлено генераций: {stats['cancelled_messages']} "
+                        f"(сэкономлено ≈{stats['saved_tokens']} токенов, "
+                        f"≈{stats['saved_time']:.0f} с)"
+                    ),
                     ft.Text(f"Сообщений в минуту: {stats['messages_per_minute']:.2f}")
                 ]),
                 actions=[
@@ -322,7 +762,7 @@ class ChatApp:
             try:
                 self.cache.clear_history()          # Очистка кэша
                 self.analytics.clear_data()         # Очистка аналитики
-                self.chat_history.controls.clear()  # Очистка истории чата
+                self.load_chat_history()            # Новая пустая беседа
                 
             except Exception as e:
                 self.logger.error(f"Ошибка очистки истории: {e}")
@@ -355,6 +795,39 @@ class ChatApp:
             dialog.open = True
             page.update()
             
+        async def new_conversation(e):
+            """Создание новой беседы (пустая текущая беседа используется повторно)."""
+            if not self.chat_history.entries:
+                return
+            self.open_conversation(self.cache.create_conversation())
+
+        async def confirm_delete_conversation(e):
+            """Подтверждение удаления текущей беседы"""
+            async def delete_confirmed(e):
+                try:
+                    self.cache.delete_conversation(self.chat_history.conversation_id)
+                    self.load_chat_history()
+                except Exception as e:
+                    self.logger.error(f"Ошибка удаления беседы: {e}")
+                    show_error_snack(page, f"Ошибка удаления беседы: {str(e)}")
+                    notify_error(f"Delete conversation error: {e}")
+                close_dialog(dialog)
+
+            dialog = ft.AlertDialog(
+                modal=True,
+                title=ft.Text("Удаление беседы"),
+                content=ft.Text("Удалить текущую беседу со всеми сообщениями?"),
+                actions=[
+                    ft.TextButton("Отмена", on_click=lambda e: close_dialog(dialog)),
+                    ft.TextButton("Удалить", on_click=delete_confirmed),
+                ],
+                actions_alignment=ft.MainAxisAlignment.END,
+            )
+
+            page.overlay.append(dialog)
+            dialog.open = True
+            page.update()
+
         def close_dialog(dialog):
             """Закрытие диалогового окна"""
             dialog.open = False                   # Закрытие диалога
@@ -365,82 +838,196 @@ class ChatApp:
       
         async def save_dialog(e):
             """
-            Сохранение истории диалога в JSON файл.
+            Экспорт истории диалога в файл.
+            Пользователь выбирает формат, экспорт выполняется в рабочем потоке
+            с отображением прогресса.
             """
-            try:
-                # Получение истории из кэша
-                history = self.cache.get_chat_history()
-
-                # Форматирование данных для сохранения
-                dialog_data = []
-                for msg in history:
-                    dialog_data.append({
-                        "timestamp": msg[4],
-                        "model": msg[1],
-                        "user_message": msg[2],
-                        "ai_response": msg[3],
-                        "tokens_used": msg[5]
-                    })
-
-                # Создание имени файла
-                filename = f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                filepath = os.path.join(self.exports_dir, filename)
-
-                # Сохранение в JSON
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(dialog_data, f, ensure_ascii=False, indent=2, default=str)
-
-                # Создание диалога успешного сохранения
-                dialog = ft.AlertDialog(
-                    modal=True,
-                    title=ft.Text("Диалог сохранен"),
-                    content=ft.Column([
+            format_dropdown = ft.Dropdown(
+                value="jsonl",
+                options=[
+                    ft.dropdown.Option(key="jsonl", text="JSON Lines (.jsonl)"),
+                    ft.dropdown.Option(key="markdown", text="Markdown (.md)"),
+                ],
+                **AppStyles.EXPORT_FORMAT_DROPDOWN
+            )
+            compress_checkbox = ft.Checkbox(label="Сжать (gzip)", value=False)
+            incremental_checkbox = ft.Checkbox(
+                label="Только новые с прошлого экспорта", value=False
+            )
+            progress_bar = ft.ProgressBar(value=0, visible=False)
+
+            async def start_export(e):
+                """Запуск экспорта в рабочем потоке."""
+                export_button.disabled = True
+                progress_bar.visible = True
+                self.ui.mark_dirty(dialog)
+
+                loop = asyncio.get_event_loop()
+
+                def set_progress(value):
+                    progress_bar.value = value
+                    self.ui.mark_dirty(progress_bar)
+
+                try:
+                    result = await loop.run_in_executor(
+                        None,
+                        lambda: self.exporter.export(
+                            fmt=format_dropdown.value,
+                            compress=compress_checkbox.value,
+                            incremental=incremental_checkbox.value,
+                            on_progress=lambda value: loop.call_soon_threadsafe(set_progress, value)
+                        )
+                    )
+                except Exception as e:
+                    close_dialog(dialog)
+                    self.logger.error(f"Ошибка сохранения: {e}")
+                    show_error_snack(page, f"Ошибка сохранения: {str(e)}")
+                    notify_error(f"Save dialog error: {e}")
+                    return
+
+                # Отображение результата экспорта
+                dialog.title = ft.Text("Диалог сохранен")
+                if result["path"]:
+                    dialog.content = ft.Column([
+                        ft.Text(f"Сообщений: {result['messages']}"),
                         ft.Text("Путь сохранения:"),
-                        ft.Text(filepath, selectable=True, weight=ft.FontWeight.BOLD),
-                    ]),
-                    actions=[
-                        ft.TextButton("OK", on_click=lambda e: close_dialog(dialog)),
-                        ft.TextButton("Открыть папку", 
-                            on_click=lambda e: os.startfile(self.exports_dir)
-                        ),
-                    ],
-                )
+                        ft.Text(result["path"], selectable=True, weight=ft.FontWeight.BOLD),
+                    ], tight=True)
+                else:
+                    dialog.content = ft.Text("Новых сообщений с прошлого экспорта нет")
+                dialog.actions = [
+                    ft.TextButton("OK", on_click=lambda e: close_dialog(dialog)),
+                    ft.TextButton("Открыть папку", 
+                        on_click=lambda e: os.startfile(self.exports_dir)
+                    ),
+                ]
+                self.ui.mark_dirty(dialog)
+
+            export_button = ft.TextButton("Экспорт", on_click=start_export)
+
+            # Создание диалога экспорта
+            dialog = ft.AlertDialog(
+                modal=True,
+                title=ft.Text("Экспорт истории"),
+                content=ft.Column([
+                    format_dropdown,
+                    compress_checkbox,
+                    incremental_checkbox,
+                    progress_bar,
+                ], tight=True),
+                actions=[
+                    ft.TextButton("Отмена", on_click=lambda e: close_dialog(dialog)),
+                    export_button,
+                ],
+            )
+
+            page.overlay.append(dialog)
+            dialog.open = True
+            page.update()
+
+        async def import_history(e: ft.FilePickerResultEvent):
+            """
+            Импорт выбранного файла экспорта или базы данных.
+            Импорт выполняется в рабочем потоке, после него перезагружаются
+            история чата и аналитика.
+            """
+            if not e.files:
+                return
+            path = e.files[0].path
+
+            status_text = ft.Text("Чтение файла...")
+            dialog = ft.AlertDialog(
+                modal=True,
+                title=ft.Text("Импорт истории"),
+                content=ft.Row([ft.ProgressRing(), status_text], tight=True),
+            )
+            page.overlay.append(dialog)
+            dialog.open = True
+            page.update()
 
-                page.overlay.append(dialog)
-                dialog.open = True
-                page.update()
+            loop = asyncio.get_event_loop()
 
+            def set_progress(read):
+                status_text.value = f"Прочитано сообщений: {read}"
+                self.ui.mark_dirty(status_text)
+
+            try:
+                if path.endswith(".db"):
+                    result = await loop.run_in_executor(None, self.importer.import_database, path)
+                else:
+                    result = await loop.run_in_executor(
+                        None,
+                        lambda: self.importer.import_file(
+                            path,
+                            on_progress=lambda read: loop.call_soon_threadsafe(set_progress, read)
+                        )
+                    )
+                await loop.run_in_executor(None, self.analytics.reload)
+                self.update_conversation_list()     # Импортированные беседы
             except Exception as e:
-                self.logger.error(f"Ошибка сохранения: {e}")
-                show_error_snack(page, f"Ошибка сохранения: {str(e)}")
-                notify_error(f"Save dialog error: {e}")
+                close_dialog(dialog)
+                self.logger.error(f"Ошибка импорта: {e}")
+                show_error_snack(page, f"Ошибка импорта: {str(e)}")
+                notify_error(f"Import error: {e}")
+                return
+
+            # Отображение результата импорта
+            dialog.content = ft.Column([
+                ft.Text(f"Добавлено сообщений: {result['imported']}"),
+                ft.Text(f"Пропущено дубликатов: {result['duplicates']}"),
+            ], tight=True)
+            dialog.actions = [ft.TextButton("OK", on_click=lambda e: close_dialog(dialog))]
+            self.ui.mark_dirty(dialog)
+
+        # Выбор файла для импорта
+        import_picker = ft.FilePicker(on_result=import_history)
+        page.overlay.append(import_picker)
 
         # Создание компонентов интерфейса
-        self.message_input = ft.TextField(**AppStyles.MESSAGE_INPUT) # Поле ввода
-        self.chat_history = ft.ListView(**AppStyles.CHAT_HISTORY)    # История чата
+        self.message_input = ft.TextField(                           # Поле ввода
+            on_change=self.update_token_counter,
+            **AppStyles.MESSAGE_INPUT
+        )
+        self.token_text = ft.Text("", **AppStyles.TOKEN_COUNTER)     # Оценка токенов
+        self.stop_button = ft.ElevatedButton(                        # Остановка генерации
+            on_click=stop_generation,
+            **AppStyles.STOP_BUTTON
+        )
+        self.send_button = ft.ElevatedButton(                        # Отправка сообщения
+            on_click=send_message_click,
+            **AppStyles.SEND_BUTTON
+        )
+        # Очереди отправки: сообщения беседы обрабатываются по одному
+        self.send_queue = SendQueue(process_message, on_change=self.update_send_controls)
+        self.chat_history = VirtualChatList(                         # История чата
+            self.cache, self.ui, **AppStyles.CHAT_HISTORY
+        )
+        self.conversation_selector = ConversationSelector(           # Выбор беседы
+            on_select=self.open_conversation
+        )
 
         # Загрузка существующей истории
         self.load_chat_history()
 
-        # Первоначальное обновление баланса
-        self.update_balance()
-
         # Создание кнопок управления
         save_button = ft.ElevatedButton(
             on_click=save_dialog,           # Привязка функции сохранения
             **AppStyles.SAVE_BUTTON         # Применение стилей
         )
 
+        import_button = ft.ElevatedButton(
+            on_click=lambda e: import_picker.pick_files(
+                dialog_title="Импорт истории",
+                allowed_extensions=["json", "jsonl", "gz", "db"]
+            ),
+            **AppStyles.IMPORT_BUTTON       # Применение стилей
+        )
+
         clear_button = ft.ElevatedButton(
             on_click=confirm_clear_history, # Привязка функции очистки
             **AppStyles.CLEAR_BUTTON        # Применение стилей
         )
 
-        send_button = ft.ElevatedButton(
-            on_click=send_message_click,    # Привязка функции отправки
-            **AppStyles.SEND_BUTTON         # Применение стилей
-        )
-
         analytics_button = ft.ElevatedButton(
             on_click=show_analytics,        # Привязка функции аналитики
             **AppStyles.ANALYTICS_BUTTON    # Применение стилей
@@ -452,6 +1039,7 @@ class ChatApp:
         control_buttons = ft.Row(  
             controls=[                      # Размещение кнопок в ряд
                 save_button,
+                import_button,
                 analytics_button,
                 clear_button
             ],
@@ -461,8 +1049,12 @@ class ChatApp:
         # Создание строки ввода с кнопкой отправки
         input_row = ft.Row(
             controls=[                      # Размещение элементов ввода
-                self.message_input,
-                send_button
+                ft.Column(
+                    controls=[self.message_input, self.token_text],
+                    **AppStyles.INPUT_COLUMN
+                ),
+                self.stop_button,
+                self.send_button
             ],
             **AppStyles.INPUT_ROW           # Применение стилей к строке ввода
         )
@@ -482,12 +1074,31 @@ class ChatApp:
             **AppStyles.BALANCE_CONTAINER        # Применение стилей к контейнеру
         )
 
+        # Создание строки выбора беседы
+        conversation_row = ft.Row(
+            controls=[                            # Список бесед и кнопки управления ими
+                self.conversation_selector,
+                ft.IconButton(
+                    icon=ft.icons.ADD_COMMENT,
+                    tooltip="Новая беседа",
+                    on_click=new_conversation
+                ),
+                ft.IconButton(
+                    icon=ft.icons.DELETE_OUTLINE,
+                    tooltip="Удалить беседу",
+                    on_click=confirm_delete_conversation
+                ),
+            ],
+            **AppStyles.CONVERSATION_ROW          # Применение стилей к строке
+        )
+
         # Создание колонки выбора модели
         model_selection = ft.Column(
             controls=[                            # Размещение элементов выбора модели
                 self.model_dropdown.search_field,
                 self.model_dropdown,
-                balance_container
+                balance_container,
+                conversation_row
             ],
             **AppStyles.MODEL_SELECTION_COLUMN   # Применение стилей к колонке
         )
@@ -504,6 +1115,14 @@ class ChatApp:
 
         # Добавление основной колонки на страницу
         page.add(self.main_column)
+        self.timeline.mark("first_paint")
+        
+        # Каталог моделей, баланс и уведомление о запуске - параллельно в фоне
+        self.start_background_tasks()
+        
+        # Изменения базы другими экземплярами приложения
+        if self.db_poll_interval > 0:
+            page.run_task(self.watch_database)
         
         # Запуск монитора
         self.monitor.get_metrics()
@@ -514,6 +1133,10 @@ class ChatApp:
 def main():
     """Точка входа в приложение"""
     app = ChatApp()                              # Создание экземпляра приложения
+    if os.getenv("AICHAT_STARTUP_CHECK"):
+        # Замер запуска сборки (build.py --compare): импорт и инициализация без окна
+        app.logger.info(f"Проверка запуска: {app.timeline.format()}")
+        return
     ft.app(target=app.main)                      # Запуск приложения
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+# Импорт необходимых библиотек и модулей
+import asyncio                                     # Библиотека для асинхронного программирования
+import os                                          # Библиотека для работы с переменными окружения
+from api.openrouter import OpenRouterClient        # Клиент для взаимодействия с AI API через OpenRouter
+from api.proxy import ProxyServer                  # OpenAI-совместимый прокси-сервер
+from utils.cache import ChatCache                  # Модуль для кэширования истории чата
+from utils.analytics import Analytics              # Модуль для сбора и анализа статистики использования
+
+
+def main():
+    """
+    Точка входа в режим прокси-сервера (без графического интерфейса).
+
+    Адрес и порт задаются переменными окружения PROXY_HOST и PROXY_PORT.
+    """
+    client = OpenRouterClient()                    # Клиент с общим пулом соединений
+    cache = ChatCache()                            # Общая история сообщений
+    analytics = Analytics(cache)                   # Общая статистика использования
+
+    server = ProxyServer(
+        client,
+        cache,
+        analytics,
+        host=os.getenv("PROXY_HOST", "127.0.0.1"),
+        port=int(os.getenv("PROXY_PORT", "8765"))
+    )
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cache.close()                              # Закрытие соединений с базой
+
+
+if __name__ == "__main__":
+    main()                                         # Запуск если файл запущен напрямую
@@ -2,7 +2,9 @@
 UI package initialization.
 Contains UI components and styles.
 """
-from .components import MessageBubble, ModelSelector
+from .chat_list import VirtualChatList
+from .components import ConversationSelector, MessageBubble, ModelSelector
+from .scheduler import UIUpdateScheduler
 from .styles import AppStyles
 
-__all__ = ['MessageBubble', 'ModelSelector', 'AppStyles']
+__all__ = ['MessageBubble', 'ModelSelector', 'ConversationSelector', 'VirtualChatList', 'UIUpdateScheduler', 'AppStyles']
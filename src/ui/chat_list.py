@@ -0,0 +1,321 @@
+# Импорт необходимых библиотек и модулей
+import flet as ft                         # Фреймворк для создания пользовательского интерфейса
+from ui.components import MessageBubble   # Компонент сообщения чата
+
+
+class ChatEntry:
+    """
+    Запись списка чата: одна строка истории (вопрос и ответ) и ее элементы.
+
+    Args:
+        row_id (int | None): ID сообщения в ChatCache; None - еще не сохранено
+        controls (list): Элементы интерфейса, отображающие запись
+    """
+    __slots__ = ("row_id", "controls")
+
+    def __init__(self, row_id, controls):
+        self.row_id = row_id
+        self.controls = controls
+
+
+class VirtualChatList(ft.ListView):
+    """
+    Виртуализированный список сообщений чата.
+
+    В интерфейсе одновременно находится только окно из последних
+    просмотренных записей. Остальная история остается в ChatCache и
+    подгружается страницами по первичному ключу при прокрутке к краю списка.
+    Элементы, вышедшие за пределы окна, переиспользуются для новых записей.
+
+    Обеспечивает:
+    - Ограниченный размер дерева элементов при любой длине диалога
+    - Подгрузку старых сообщений при прокрутке вверх и новых - вниз
+    - Повторное использование пузырьков сообщений
+    - Добавление «живых» записей (отправляемое сообщение и поток ответа)
+    - Дополнение записями, сохраненными другими экземплярами приложения
+    - Переключение между беседами
+
+    Args:
+        cache (ChatCache): Хранилище истории сообщений
+        ui (UIUpdateScheduler): Планировщик обновлений интерфейса
+        **kwargs: Параметры ft.ListView (стили)
+    """
+    # Максимальное количество сохраненных записей в окне
+    WINDOW_ROWS = 40
+
+    # Количество записей, подгружаемых за одну прокрутку к краю
+    PAGE_ROWS = 10
+
+    # Расстояние до края списка (в пикселях), при котором подгружается страница
+    EDGE_THRESHOLD = 80
+
+    # Максимальное количество пузырьков в пуле для повторного использования
+    POOL_SIZE = 20
+
+    def __init__(self, cache, ui, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.ui = ui
+        self.conversation_id = None            # Отображаемая беседа
+        self.entries = []                      # Записи окна в хронологическом порядке
+        self._pool = {True: [], False: []}     # Свободные пузырьки по типу отправителя
+        self._has_older = False                # В кэше есть записи до окна
+        self._has_newer = False                # В кэше есть записи после окна
+        self._loading = False                  # Идет подгрузка страницы
+        self._synced_id = 0                    # Последний ID, прочитанный из кэша до конца истории
+        self._live = {}                        # ID беседы -> несохраненные записи беседы
+
+        self.on_scroll_interval = 100
+        self.on_scroll = self._on_scroll
+
+    def load_latest(self):
+        """
+        Отображение последних записей истории (начальная загрузка).
+
+        Несохраненные записи беседы (ответ на них еще генерируется) в кэше
+        отсутствуют, поэтому добавляются после загруженных записей, а их
+        элементы не возвращаются в пул.
+        """
+        self._release(entry for entry in self.entries if entry.row_id is not None)
+        rows = self.cache.get_messages_page(
+            limit=self.PAGE_ROWS * 2, conversation_id=self.conversation_id
+        )
+        self.entries = [self._entry_from_row(row) for row in rows]
+        self._has_older = len(rows) == self.PAGE_ROWS * 2
+        self._has_newer = False
+        self._synced_id = rows[-1][0] if rows else 0
+        self.entries.extend(self._live.get(self.conversation_id, ()))
+        self._sync_controls()
+        self.auto_scroll = True
+        self.ui.mark_dirty(self)
+
+    def switch_conversation(self, conversation_id: int):
+        """
+        Отображение другой беседы.
+
+        Последние сообщения недавно открытых бесед ChatCache хранит в памяти,
+        поэтому переключение между ними не обращается к базе. Несохраненные
+        записи прежней беседы (ответ еще генерируется) остаются в ее списке
+        и снова отображаются при возврате к ней.
+
+        Args:
+            conversation_id (int): ID беседы
+        """
+        self.conversation_id = conversation_id
+        self.load_latest()
+
+    def clear_messages(self):
+        """Удаление всех сохраненных записей из окна (история очищена)."""
+        self._release(entry for entry in self.entries if entry.row_id is not None)
+        self.entries = list(self._live.get(self.conversation_id, ()))
+        self._has_older = self._has_newer = False
+        self._sync_controls()
+        self.ui.mark_dirty(self)
+
+    def add_live(self, *controls) -> ChatEntry:
+        """
+        Добавление новой, еще не сохраненной записи в конец списка.
+
+        Если пользователь просматривал старую историю, список сначала
+        возвращается к последним сообщениям. До commit() запись остается
+        в списке беседы, даже если открыта другая беседа или список
+        перезагружен.
+
+        Args:
+            *controls: Элементы записи (сообщение пользователя, индикатор загрузки)
+
+        Returns:
+            ChatEntry: Запись для последующего изменения и сохранения
+        """
+        if self._has_newer:
+            self.load_latest()
+        entry = ChatEntry(None, list(controls))
+        self._live.setdefault(self.conversation_id, []).append(entry)
+        self.entries.append(entry)
+        self.controls.extend(entry.controls)
+        self._trim(from_top=True)
+        self.auto_scroll = True
+        self.ui.mark_dirty(self)
+        return entry
+
+    def append_new(self) -> bool:
+        """
+        Дополнение окна записями, сохраненными в обход этого списка
+        (другим экземпляром приложения).
+
+        Читаются только записи с ID больше прочитанных ранее. Если окно не
+        доходит до конца истории, новые записи подгрузятся прокруткой вниз.
+
+        Returns:
+            bool: True если добавлены записи
+        """
+        if self._has_newer or self._loading:
+            return False
+        known = {entry.row_id for entry in self.entries}
+        added = False
+        while True:
+            rows = self.cache.get_messages_page(
+                after_id=self._synced_id, limit=self.PAGE_ROWS,
+                conversation_id=self.conversation_id
+            )
+            for row in rows:
+                # Собственные записи уже в окне
+                if row[0] in known:
+                    continue
+                # Запись встает по порядку ID: перед несохраненными записями
+                # и сохраненными позже нее
+                index = len(self.entries)
+                while index and (self.entries[index - 1].row_id is None
+                                 or self.entries[index - 1].row_id > row[0]):
+                    index -= 1
+                self.entries.insert(index, self._entry_from_row(row))
+                added = True
+            if rows:
+                self._synced_id = rows[-1][0]
+            if len(rows) < self.PAGE_ROWS:
+                break
+
+        if added:
+            self._trim(from_top=True)
+            self._sync_controls()
+            self.ui.mark_dirty(self)
+        return added
+
+    def replace_control(self, entry: ChatEntry, old, new):
+        """
+        Замена элемента записи (например, индикатора загрузки на ответ).
+
+        Если запись сейчас не отображается (открыта другая беседа), меняется
+        только сама запись: новый элемент появится при ее следующем показе.
+        """
+        if old not in entry.controls:
+            return
+        entry.controls[entry.controls.index(old)] = new
+        if entry not in self.entries:
+            return
+        self.controls[self.controls.index(old)] = new
+        self.ui.mark_dirty(self)
+
+    def commit(self, entry: ChatEntry, row_id: int):
+        """
+        Пометка записи как сохраненной в ChatCache.
+
+        После этого запись может быть выгружена из окна и загружена снова.
+        Для записи, которая сейчас не отображается, изменяется только ее
+        состояние: окно открытой беседы не затрагивается.
+        """
+        entry.row_id = row_id
+        for conversation_id, entries in list(self._live.items()):
+            if entry in entries:
+                entries.remove(entry)
+                if not entries:
+                    del self._live[conversation_id]
+
+    async def _on_scroll(self, e):
+        """Подгрузка страницы при приближении к краю списка."""
+        if self._loading or e.pixels is None or e.max_scroll_extent is None:
+            return
+        if e.pixels <= self.EDGE_THRESHOLD and self._has_older:
+            self._load_page(older=True)
+        elif e.max_scroll_extent - e.pixels <= self.EDGE_THRESHOLD and self._has_newer:
+            self._load_page(older=False)
+
+    def _load_page(self, older: bool):
+        """
+        Подгрузка страницы записей с одного края окна и выгрузка с другого.
+
+        Args:
+            older (bool): True - подгрузить записи до окна, False - после окна
+        """
+        self._loading = True
+        try:
+            saved = [entry.row_id for entry in self.entries if entry.row_id is not None]
+            if older:
+                rows = self.cache.get_messages_page(
+                    before_id=saved[0] if saved else None, limit=self.PAGE_ROWS,
+                    conversation_id=self.conversation_id
+                )
+                self._has_older = len(rows) == self.PAGE_ROWS
+            else:
+                rows = self.cache.get_messages_page(
+                    after_id=saved[-1] if saved else 0, limit=self.PAGE_ROWS,
+                    conversation_id=self.conversation_id
+                )
+                self._has_newer = len(rows) == self.PAGE_ROWS
+                if rows and not self._has_newer:
+                    self._synced_id = max(self._synced_id, rows[-1][0])
+            if not rows:
+                return
+
+            new_entries = [self._entry_from_row(row) for row in rows]
+            if older:
+                self.entries[:0] = new_entries
+            else:
+                self.entries.extend(new_entries)
+            self._trim(from_top=not older)
+            self._sync_controls()
+
+            # Автопрокрутка к концу списка при подгрузке истории сбила бы позицию
+            self.auto_scroll = False
+            self.ui.mark_dirty(self)
+        finally:
+            self._loading = False
+
+    def _trim(self, from_top: bool):
+        """
+        Выгрузка сохраненных записей, не помещающихся в окно.
+
+        Несохраненные записи никогда не выгружаются.
+        """
+        while sum(1 for entry in self.entries if entry.row_id is not None) > self.WINDOW_ROWS:
+            index = 0 if from_top else len(self.entries) - 1
+            step = 1 if from_top else -1
+            while self.entries[index].row_id is None:
+                index += step
+            entry = self.entries.pop(index)
+            for control in entry.controls:
+                if control in self.controls:
+                    self.controls.remove(control)
+            self._release([entry])
+            if from_top:
+                self._has_older = True
+            else:
+                self._has_newer = True
+
+    def _sync_controls(self):
+        """Пересборка списка элементов из записей окна."""
+        self.controls = [control for entry in self.entries for control in entry.controls]
+
+    def _entry_from_row(self, row) -> ChatEntry:
+        """Создание записи окна из строки ChatCache."""
+        row_id, _, user_message, ai_response, _, _, truncated = row
+        return ChatEntry(row_id, [
+            self._bubble(user_message, is_user=True),
+            self._bubble(ai_response, is_user=False, truncated=bool(truncated))
+        ])
+
+    def _bubble(self, text: str, is_user: bool, truncated: bool = False) -> MessageBubble:
+        """
+        Пузырек сообщения из пула или новый, если подходящего нет в пуле.
+
+        Состояние пузырька из пула (включая отметку об остановленной
+        генерации) полностью заменяется состоянием новой записи.
+        """
+        pool = self._pool[is_user]
+        for index in range(len(pool) - 1, -1, -1):
+            # Пузырек, удаление которого еще не отправлено клиенту, нельзя
+            # добавить в том же обновлении - берутся только отключенные от страницы
+            if pool[index].page is None:
+                bubble = pool.pop(index)
+                bubble.set_text(text, truncated=truncated)
+                return bubble
+        return MessageBubble(message=text, is_user=is_user, truncated=truncated)
+
+    def _release(self, entries):
+        """Возврат пузырьков выгруженных записей в пул."""
+        for entry in entries:
+            for control in entry.controls:
+                if isinstance(control, MessageBubble):
+                    pool = self._pool[control.is_user]
+                    if len(pool) < self.POOL_SIZE and control not in pool:
+                        pool.append(control)
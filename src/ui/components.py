@@ -1,6 +1,9 @@
 # Импорт необходимых библиотек и модулей
 import flet as ft                  # Фреймворк для создания пользовательского интерфейса
 from ui.styles import AppStyles    # Импорт стилей приложения
+from ui.markdown import MarkdownContent  # Поблочная отрисовка Markdown с кэшированием
+from ui.paging import LARGE_MESSAGE_CHARS, PagedText  # Постраничное отображение длинных сообщений
+from utils.search import ModelSearchIndex  # Поисковый индекс по каталогу моделей
 import asyncio                     # Библиотека для асинхронного программирования
 
 class MessageBubble(ft.Container):
@@ -9,15 +12,21 @@ class MessageBubble(ft.Container):
     
     Наследуется от ft.Container для создания стилизованного контейнера сообщения.
     Отображает сообщения пользователя и AI с разными стилями и позиционированием.
+    Ответы AI отображаются как Markdown с подсветкой кода и могут
+    дополняться по мере потоковой генерации.
     
     Args:
         message (str): Текст сообщения для отображения
         is_user (bool): Флаг, указывающий, является ли это сообщением пользователя
+        truncated (bool): Генерация ответа была остановлена пользователем
     """
-    def __init__(self, message: str, is_user: bool):
+    def __init__(self, message: str, is_user: bool, truncated: bool = False):
         # Инициализация родительского класса Container
         super().__init__()
         
+        # Тип отправителя (нужен для повторного использования пузырька)
+        self.is_user = is_user
+        
         # Настройка отступов внутри пузырька
         self.padding = 10
         
@@ -45,21 +54,109 @@ class MessageBubble(ft.Container):
             bottom=5                         # Отступ снизу
         )
         
+        # Текст пользователя отображается как есть (очень длинный - постранично),
+        # ответ AI - как Markdown
+        if is_user:
+            self.body = _user_body(message)
+        else:
+            self.body = MarkdownContent(message)
+        
         # Создание содержимого пузырька
         self.content = ft.Column(
-            controls=[
-                # Текст сообщения с настройками отображения
-                ft.Text(
-                    value=message,                    # Текст сообщения
-                    color=ft.Colors.WHITE,            # Белый цвет текста
-                    size=16,                         # Размер шрифта
-                    selectable=True,                 # Возможность выделения текста
-                    weight=ft.FontWeight.W_400       # Нормальная толщина шрифта
-                )
-            ],
+            controls=[self.body],
             tight=True  # Плотное расположение элементов в колонке
         )
 
+        # Отметка об остановленной генерации (создается при первой необходимости)
+        self.note = None
+        self._set_truncated(truncated)
+
+    def append_text(self, delta: str) -> list:
+        """
+        Дополнение ответа AI новым фрагментом при потоковой генерации.
+        
+        Args:
+            delta (str): Новый фрагмент текста
+            
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        return self.body.append(delta)
+
+    def set_text(self, text: str, truncated: bool = False) -> list:
+        """
+        Замена текста сообщения целиком.
+        
+        Отметка об остановленной генерации приводится в соответствие с
+        truncated: пузырек из пула не должен сохранить отметку прежнего ответа.
+        
+        Args:
+            text (str): Новый текст сообщения
+            truncated (bool): Генерация ответа была остановлена пользователем
+            
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        if not self.is_user:
+            return self.body.set_text(text) + self._set_truncated(truncated)
+        if isinstance(self.body, ft.Text) and len(text) <= LARGE_MESSAGE_CHARS:
+            self.body.value = text
+            return [self.body]
+        # Длинный текст (или замена длинного) отображается новым элементом
+        self.body = _user_body(text)
+        self.content.controls = [self.body]
+        return [self.content]
+
+    def finish(self):
+        """Завершение потоковой генерации (кэширование результата разбора)."""
+        if isinstance(self.body, MarkdownContent):
+            self.body.finish()
+
+    def mark_truncated(self) -> list:
+        """
+        Отметка ответа, генерация которого остановлена пользователем.
+        
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        return self._set_truncated(True)
+
+    def _set_truncated(self, truncated: bool) -> list:
+        """
+        Добавление или удаление отметки об остановленной генерации.
+        
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        shown = self.note is not None and self.note in self.content.controls
+        if truncated == shown:
+            return []
+        if truncated:
+            if self.note is None:
+                self.note = ft.Text("Генерация остановлена", **AppStyles.TRUNCATED_NOTE)
+            self.content.controls.append(self.note)
+        else:
+            self.content.controls.remove(self.note)
+        return [self.content]
+
+
+def _user_body(message: str):
+    """Элемент текста пользователя: обычный или постраничный для длинных сообщений."""
+    if len(message) > LARGE_MESSAGE_CHARS:
+        return PagedText(message, make_text=_user_text)
+    return _user_text(message)
+
+
+def _user_text(value: str) -> ft.Text:
+    """Элемент ft.Text в стиле сообщения пользователя."""
+    return ft.Text(
+        value=value,                      # Текст сообщения
+        color=ft.Colors.WHITE,            # Белый цвет текста
+        size=16,                         # Размер шрифта
+        selectable=True,                 # Возможность выделения текста
+        weight=ft.FontWeight.W_400       # Нормальная толщина шрифта
+    )
+
 
 class ModelSelector(ft.Dropdown):
     """
@@ -72,6 +169,10 @@ class ModelSelector(ft.Dropdown):
         models (list): Список доступных моделей в формате:
                       [{"id": "model-id", "name": "Model Name"}, ...]
     """
+    # Задержка перед применением фильтра: поиск выполняется после паузы
+    # в наборе текста, а не на каждое нажатие клавиши
+    SEARCH_DEBOUNCE = 0.15
+
     def __init__(self, models: list):
         # Инициализация родительского класса Dropdown
         super().__init__()
@@ -84,6 +185,29 @@ class ModelSelector(ft.Dropdown):
         self.label = None                    # Убираем текстовую метку
         self.hint_text = "Выбор модели"      # Текст-подсказка
         
+        # Номер последнего изменения поля поиска (для отбрасывания устаревших)
+        self._search_generation = 0
+        
+        # Заполнение списка (каталог может загружаться позже - см. set_models)
+        self.set_models(models)
+        
+        # Создание поля поиска для фильтрации моделей
+        self.search_field = ft.TextField(
+            on_change=self.filter_options,        # Функция обработки изменений
+            hint_text="Поиск модели",            # Текст-подсказка в поле поиска
+            **AppStyles.MODEL_SEARCH_FIELD       # Применение стилей из конфигурации
+        )
+
+    def set_models(self, models: list):
+        """
+        Замена каталога моделей.
+        
+        Выбранная модель сохраняется, если она есть в новом каталоге,
+        иначе выбирается первая.
+        
+        Args:
+            models (list): Список моделей в формате [{"id", "name"}, ...]
+        """
         # Создание списка опций из предоставленных моделей
         self.options = [
             ft.dropdown.Option(
@@ -95,36 +219,106 @@ class ModelSelector(ft.Dropdown):
         # Сохранение полного списка опций для фильтрации
         self.all_options = self.options.copy()
         
-        # Установка начального значения (первая модель из списка)
-        self.value = models[0]['id'] if models else None
+        # Опции по ID: результаты поиска собираются из тех же объектов,
+        # поэтому Flet отправляет клиенту только изменения списка
+        self.options_by_key = {opt.key: opt for opt in self.all_options}
         
-        # Создание поля поиска для фильтрации моделей
-        self.search_field = ft.TextField(
-            on_change=self.filter_options,        # Функция обработки изменений
-            hint_text="Поиск модели",            # Текст-подсказка в поле поиска
-            **AppStyles.MODEL_SEARCH_FIELD       # Применение стилей из конфигурации
-        )
+        # Поисковый индекс строится один раз для всего каталога
+        self.search_index = ModelSearchIndex(models)
+        
+        # Установка начального значения (первая модель из списка)
+        if self.value not in self.options_by_key:
+            self.value = models[0]['id'] if models else None
 
-    def filter_options(self, e):
+    async def filter_options(self, e):
         """
         Фильтрация списка моделей на основе введенного текста поиска.
         
+        Фильтр применяется только после паузы SEARCH_DEBOUNCE в наборе
+        текста; промежуточные нажатия клавиш отбрасываются.
+        
         Args:
             e: Событие изменения текста в поле поиска
         """
-        # Получение текста поиска в нижнем регистре
-        search_text = self.search_field.value.lower() if self.search_field.value else ""
+        self._search_generation += 1
+        generation = self._search_generation
+        
+        await asyncio.sleep(self.SEARCH_DEBOUNCE)
+        
+        # За время ожидания текст изменился - фильтр применит следующий вызов
+        if generation != self._search_generation:
+            return
+        
+        if self.apply_filter(self.search_field.value or ""):
+            # Обновляется только сам список, а не вся страница
+            self.update()
+
+    def apply_filter(self, search_text: str) -> bool:
+        """
+        Применение поискового запроса к списку опций.
         
-        # Если поле поиска пустое - показываем все модели
-        if not search_text:
-            self.options = self.all_options
+        Args:
+            search_text (str): Текст поискового запроса
+            
+        Returns:
+            bool: True, если список опций изменился и его нужно отправить клиенту
+        """
+        # Если поле поиска пустое - показываем все модели,
+        # иначе - найденные модели в порядке релевантности
+        if not search_text.strip():
+            options = self.all_options
         else:
-            # Фильтрация моделей по тексту поиска
-            # Ищем совпадения в названии или ID модели
-            self.options = [
-                opt for opt in self.all_options
-                if search_text in opt.text.lower() or search_text in opt.key.lower()
+            options = [
+                self.options_by_key[key]
+                for key in self.search_index.search(search_text)
             ]
         
-        # Обновление интерфейса для отображения отфильтрованного списка
-        e.page.update()
+        if [opt.key for opt in options] == [opt.key for opt in self.options]:
+            return False
+        
+        self.options = list(options)
+        return True
+
+
+class ConversationSelector(ft.Dropdown):
+    """
+    Выпадающий список бесед.
+    
+    Наследуется от ft.Dropdown. Список бесед передается извне
+    (из ChatCache), выбор беседы передается обработчику on_select.
+    
+    Args:
+        on_select (callable): Обработчик выбора, получает ID беседы
+    """
+    def __init__(self, on_select):
+        # Инициализация родительского класса Dropdown
+        super().__init__()
+        
+        # Применение стилей из конфигурации к компоненту
+        for key, value in AppStyles.CONVERSATION_DROPDOWN.items():
+            setattr(self, key, value)
+        
+        self.hint_text = "Беседа"            # Текст-подсказка
+        self.on_select = on_select           # Обработчик выбора беседы
+        self.on_change = self._on_change     # Обработка выбора в списке
+
+    def set_conversations(self, conversations: list, current_id):
+        """
+        Обновление списка бесед.
+        
+        Args:
+            conversations (list): Кортежи (id, title, updated_at)
+            current_id (int): ID текущей беседы
+        """
+        self.options = [
+            ft.dropdown.Option(
+                key=str(conversation_id),    # Ключи Dropdown - строки
+                text=title or "Новый чат"    # Беседа без сообщений еще не имеет названия
+            ) for conversation_id, title, _ in conversations
+        ]
+        self.value = str(current_id) if current_id is not None else None
+
+    def _on_change(self, e):
+        """Передача выбранной беседы обработчику."""
+        if self.value:
+            self.on_select(int(self.value))
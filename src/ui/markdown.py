@@ -0,0 +1,398 @@
+# Импорт необходимых библиотек и модулей
+import flet as ft                  # Фреймворк для создания пользовательского интерфейса
+import hashlib                     # Хеширование содержимого для ключей кэша
+import re                          # Регулярные выражения для поиска блоков кода
+import threading                   # Блокировка общего кэша
+from collections import OrderedDict  # Упорядоченный словарь для LRU-кэша
+from ui.styles import AppStyles    # Импорт стилей приложения
+from ui.paging import (            # Постраничное отображение длинных сообщений
+    LARGE_MESSAGE_CHARS,
+    PAGE_CHARS,
+    show_more_button,
+    text_page_spans
+)
+
+# Открывающая строка блока кода: ``` или ~~~ (три и более символа)
+_FENCE = re.compile(r"^(`{3,}|~{3,})")
+
+# Максимальное количество разобранных сообщений в кэше
+BLOCK_CACHE_SIZE = 512
+
+# Незавершенный блок кода длиннее этого значения при потоковом выводе
+# фиксируется частями, чтобы каждый фрагмент не пересылал весь блок заново
+STREAM_TAIL_CHARS = 4_000
+
+_block_cache = OrderedDict()       # sha1(текста) -> кортеж блоков
+_block_cache_lock = threading.Lock()
+
+
+def parse_blocks(text: str) -> tuple:
+    """
+    Разбиение Markdown-текста на блоки верхнего уровня с кэшированием.
+
+    Результат кэшируется по хешу содержимого, поэтому повторная отрисовка
+    истории не разбирает старые сообщения заново.
+
+    Args:
+        text (str): Markdown-текст сообщения
+
+    Returns:
+        tuple: Тексты блоков в порядке следования
+    """
+    key = hashlib.sha1(text.encode("utf-8")).digest()
+    with _block_cache_lock:
+        blocks = _block_cache.get(key)
+        if blocks is not None:
+            _block_cache.move_to_end(key)
+            return blocks
+
+    blocks = tuple(_block_text(text, span) for span in _block_spans(text))
+    _remember(key, blocks)
+    return blocks
+
+
+def _remember(key: bytes, blocks: tuple):
+    """Сохранение результата разбора в LRU-кэш."""
+    with _block_cache_lock:
+        _block_cache[key] = blocks
+        _block_cache.move_to_end(key)
+        while len(_block_cache) > BLOCK_CACHE_SIZE:
+            _block_cache.popitem(last=False)
+
+
+def _block_spans(text: str, start: int = 0) -> list:
+    """
+    Границы блоков верхнего уровня начиная с позиции start.
+
+    Блоки разделяются пустыми строками вне блоков кода. Блок, начинающийся
+    с отступа, считается продолжением предыдущего (например, абзац внутри
+    элемента списка), чтобы не отрисовать его как отдельный блок кода.
+
+    Args:
+        text (str): Markdown-текст
+        start (int): Позиция начала разбора (должна быть границей блока)
+
+    Returns:
+        list: Список пар [начало, конец] для каждого блока
+    """
+    spans = []
+    block_start = None    # Начало текущего блока
+    fence = None          # Маркер открытого блока кода
+    position = start
+    length = len(text)
+
+    while position < length:
+        newline = text.find("\n", position)
+        line_end = length if newline == -1 else newline + 1
+        line = text[position:line_end]
+        stripped = line.strip()
+
+        if fence:
+            # Внутри блока кода пустые строки не разделяют блоки
+            if stripped.startswith(fence) and set(stripped) == {fence[0]}:
+                fence = None
+        elif not stripped:
+            if block_start is not None:
+                spans.append([block_start, position])
+                block_start = None
+        else:
+            if block_start is None:
+                if spans and line[:1] in (" ", "\t"):
+                    block_start = spans.pop()[0]
+                else:
+                    block_start = position
+            match = _FENCE.match(stripped)
+            if match:
+                fence = match.group(1)
+        position = line_end
+
+    if block_start is not None:
+        spans.append([block_start, length])
+    return spans
+
+
+def _find_fence_close(text: str, position: int, marker: str):
+    """
+    Поиск строки, закрывающей блок кода.
+
+    Args:
+        text (str): Markdown-текст
+        position (int): Начало поиска (первая строка внутри блока)
+        marker (str): Маркер открывающей строки (``` или ~~~)
+
+    Returns:
+        int | None: Позиция сразу после закрывающей строки или None
+    """
+    length = len(text)
+    while position < length:
+        newline = text.find("\n", position)
+        line_end = length if newline == -1 else newline + 1
+        stripped = text[position:line_end].strip()
+        if stripped.startswith(marker) and set(stripped) == {marker[0]}:
+            return line_end
+        position = line_end
+    return None
+
+
+def paginate_blocks(blocks: tuple, size: int = PAGE_CHARS) -> list:
+    """
+    Группировка блоков в страницы примерно заданного размера.
+
+    Блок длиннее страницы разрезается по строкам; блок кода при этом
+    разбивается на несколько самостоятельных блоков кода.
+
+    Args:
+        blocks (tuple): Тексты блоков
+        size (int): Примерный размер страницы
+
+    Returns:
+        list: Список страниц, каждая - список текстов блоков
+    """
+    pages = []
+    page = []
+    page_size = 0
+    for block in blocks:
+        for piece in _split_block(block, size):
+            if page and page_size + len(piece) > size:
+                pages.append(page)
+                page, page_size = [], 0
+            page.append(piece)
+            page_size += len(piece)
+    if page:
+        pages.append(page)
+    return pages
+
+
+def _split_block(block: str, size: int) -> list:
+    """Разрезание слишком длинного блока на части."""
+    if len(block) <= size:
+        return [block]
+
+    first_line, _, body = block.partition("\n")
+    match = _FENCE.match(first_line.strip())
+    if not match:
+        return [block[start:end].strip("\n") for start, end in text_page_spans(block, size=size)]
+
+    # Блок кода: каждая часть получает свои открывающую и закрывающую строки
+    marker = match.group(1)
+    last_line = body.rstrip("\n").rsplit("\n", 1)[-1].strip()
+    if last_line.startswith(marker) and set(last_line) == {marker[0]}:
+        body = body.rstrip("\n")[:-len(last_line)]
+    return [
+        f"{first_line}\n{body[start:end].rstrip(chr(10))}\n{marker}"
+        for start, end in text_page_spans(body, size=size)
+    ]
+
+
+def _block_text(text: str, span: list) -> str:
+    """Текст блока без окружающих переводов строк."""
+    return text[span[0]:span[1]].strip("\n")
+
+
+def _markdown_block(value: str) -> ft.Markdown:
+    """Элемент отрисовки одного блока Markdown с подсветкой кода."""
+    return ft.Markdown(value=value, **AppStyles.MESSAGE_MARKDOWN)
+
+
+class MarkdownContent(ft.Column):
+    """
+    Отрисовка Markdown-текста с поблочным обновлением.
+
+    Каждый блок верхнего уровня (абзац, список, таблица, блок кода)
+    отображается отдельным элементом ft.Markdown. При потоковом выводе
+    завершенные блоки больше не изменяются, а каждый новый фрагмент
+    обновляет только последний, еще не завершенный блок. Очень длинные
+    готовые тексты отображаются постранично.
+
+    Args:
+        text (str): Начальный текст (готовое сообщение)
+    """
+    def __init__(self, text: str = ""):
+        super().__init__(tight=True, spacing=8)
+        self.text = ""
+        self._stable_offset = 0   # Начало последнего (незавершенного) блока
+        self._tail = None         # Элемент последнего блока
+        self._open_fence = None   # (открывающая строка, маркер) разрезанного блока кода
+        self._fence_split = False # Блок кода был разрезан при потоковом выводе
+        self._pages = []          # Еще не показанные страницы длинного текста
+        self._more_button = None  # Кнопка «Показать ещё»
+        if text:
+            self.set_text(text)
+
+    def set_text(self, text: str) -> list:
+        """
+        Полная отрисовка готового текста.
+
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        self.text = text
+        blocks = parse_blocks(text)
+        if len(text) > LARGE_MESSAGE_CHARS:
+            self._pages = paginate_blocks(blocks)
+        else:
+            self._pages = [list(blocks)]
+        self.controls = []
+        self._show_next_page()
+        self._tail = None
+        self._open_fence = None
+        self._stable_offset = None    # Текст отрисован целиком, не потоком
+        return [self]
+
+    def append(self, delta: str) -> list:
+        """
+        Добавление фрагмента текста при потоковом выводе.
+
+        Разбирается только текст начиная с последнего незавершенного блока.
+
+        Args:
+            delta (str): Новый фрагмент текста
+
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        if not delta:
+            return []
+        if self._stable_offset is None:
+            self._resume_stream()
+
+        self.text += delta
+        dirty = []
+
+        # Продолжение разрезанного блока кода
+        if self._open_fence is not None:
+            dirty = self._continue_fence()
+            if self._open_fence is not None:
+                return dirty
+
+        spans = _block_spans(self.text, self._stable_offset)
+        if not spans:
+            return dirty
+
+        *finished, tail = spans
+        if not finished and self._tail is not None:
+            # Изменился только последний блок
+            self._tail.value = _block_text(self.text, tail)
+            dirty.append(self._tail)
+        else:
+            # Завершенные блоки фиксируются, последний становится новым «хвостом»
+            blocks = [_block_text(self.text, span) for span in finished]
+            if self._tail is not None and blocks:
+                self._tail.value = blocks.pop(0)
+            self.controls.extend(_markdown_block(block) for block in blocks)
+            self._tail = _markdown_block(_block_text(self.text, tail))
+            self.controls.append(self._tail)
+            self._stable_offset = tail[0]
+            dirty = [self]
+
+        if self._split_long_fence():
+            dirty = [self]
+        return dirty
+
+    def finish(self):
+        """
+        Завершение потокового вывода.
+
+        Результат разбора сохраняется в кэш, поэтому при следующей загрузке
+        истории это сообщение не будет разбираться заново.
+        """
+        if self._stable_offset is None:
+            return
+        # Разрезанные блоки кода не совпадают с обычным разбором и не кэшируются
+        if not self._fence_split:
+            blocks = tuple(control.value for control in self.controls)
+            _remember(hashlib.sha1(self.text.encode("utf-8")).digest(), blocks)
+        self._stable_offset = None
+        self._open_fence = None
+
+    def _show_next_page(self, e=None):
+        """Добавление следующей страницы длинного текста."""
+        if self._more_button in self.controls:
+            self.controls.remove(self._more_button)
+
+        page = self._pages.pop(0) if self._pages else []
+        self.controls.extend(_markdown_block(block) for block in page)
+
+        if self._pages:
+            remaining = sum(len(block) for page in self._pages for block in page)
+            self._more_button = show_more_button(remaining, self._show_next_page)
+            self.controls.append(self._more_button)
+
+        if e is not None:
+            self.update()
+
+    def _resume_stream(self):
+        """Переход от полностью отрисованного текста к потоковому выводу."""
+        self._pages = []
+        self.controls = [_markdown_block(block) for block in parse_blocks(self.text)]
+        spans = _block_spans(self.text)
+        self._stable_offset = spans[-1][0] if spans else 0
+        self._tail = self.controls[-1] if self.controls else None
+
+    def _continue_fence(self) -> list:
+        """
+        Обновление хвоста внутри разрезанного блока кода.
+
+        Returns:
+            list: Элементы, которые нужно обновить в интерфейсе
+        """
+        opening, marker = self._open_fence
+        start = self._stable_offset
+        close = _find_fence_close(self.text, start, marker)
+
+        if close is not None:
+            # Блок кода завершен: хвост фиксируется, разбор продолжается как обычно
+            self._tail.value = f"{opening}\n{self.text[start:close].rstrip(chr(10))}"
+            dirty = [self._tail]
+            self._tail = None
+            self._open_fence = None
+            self._stable_offset = close
+            return dirty
+
+        if len(self.text) - start > STREAM_TAIL_CHARS:
+            cut = self.text.rfind("\n", start, len(self.text))
+            if cut > start:
+                self._tail.value = f"{opening}\n{self.text[start:cut]}\n{marker}"
+                self._tail = _markdown_block(f"{opening}\n{self.text[cut + 1:]}")
+                self.controls.append(self._tail)
+                self._stable_offset = cut + 1
+                return [self]
+
+        self._tail.value = f"{opening}\n{self.text[start:]}"
+        return [self._tail]
+
+    def _split_long_fence(self) -> bool:
+        """
+        Разрезание слишком длинного незавершенного блока кода в хвосте.
+
+        Returns:
+            bool: True, если блок был разрезан
+        """
+        start = self._stable_offset
+        if len(self.text) - start <= STREAM_TAIL_CHARS:
+            return False
+
+        first_line_end = self.text.find("\n", start)
+        if first_line_end == -1:
+            return False
+        opening = self.text[start:first_line_end].strip()
+        match = _FENCE.match(opening)
+        if not match:
+            return False
+        marker = match.group(1)
+        if _find_fence_close(self.text, first_line_end + 1, marker) is not None:
+            return False
+
+        cut = self.text.rfind("\n", first_line_end + 1, len(self.text))
+        if cut <= first_line_end:
+            return False
+
+        # Готовые строки фиксируются закрытым блоком кода, остаток
+        # продолжается в новом блоке с той же открывающей строкой
+        self._tail.value = f"{self.text[start:cut]}\n{marker}"
+        self._open_fence = (opening, marker)
+        self._fence_split = True
+        self._stable_offset = cut + 1
+        self._tail = _markdown_block(f"{opening}\n{self.text[cut + 1:]}")
+        self.controls.append(self._tail)
+        return True
@@ -0,0 +1,103 @@
+# Импорт необходимых библиотек и модулей
+import flet as ft                  # Фреймворк для создания пользовательского интерфейса
+from ui.styles import AppStyles    # Импорт стилей приложения
+
+# Сообщения длиннее этого порога отображаются постранично
+LARGE_MESSAGE_CHARS = 20_000
+
+# Примерный размер одной страницы в символах
+PAGE_CHARS = 8_000
+
+
+def text_page_spans(text: str, start: int = 0, end: int = None, size: int = PAGE_CHARS) -> list:
+    """
+    Разбиение текста на страницы по границам строк.
+
+    Страницы задаются смещениями, а не копиями текста: сам текст хранится
+    в единственном экземпляре, а подстрока создается только при отображении.
+    Строка длиннее страницы разрезается принудительно.
+
+    Args:
+        text (str): Исходный текст
+        start (int): Начало разбиваемого фрагмента
+        end (int): Конец разбиваемого фрагмента (по умолчанию - конец текста)
+        size (int): Примерный размер страницы
+
+    Returns:
+        list: Пары (начало, конец) для каждой страницы
+    """
+    end = len(text) if end is None else end
+    spans = []
+    position = start
+    while position < end:
+        limit = min(position + size, end)
+        if limit < end:
+            # Разрез по последнему переводу строки во второй половине страницы
+            newline = text.rfind("\n", position + size // 2, limit)
+            if newline != -1:
+                limit = newline + 1
+        spans.append((position, limit))
+        position = limit
+    return spans
+
+
+def show_more_button(remaining_chars: int, on_click) -> ft.TextButton:
+    """
+    Кнопка отображения следующей страницы сообщения.
+
+    Args:
+        remaining_chars (int): Количество еще не показанных символов
+        on_click (callable): Обработчик нажатия
+    """
+    return ft.TextButton(
+        text=f"Показать ещё (осталось {_format_size(remaining_chars)})",
+        on_click=on_click,
+        **AppStyles.SHOW_MORE_BUTTON
+    )
+
+
+def _format_size(chars: int) -> str:
+    """Человекочитаемый размер текста."""
+    if chars >= 1024 * 1024:
+        return f"{chars / (1024 * 1024):.1f} млн симв."
+    if chars >= 1024:
+        return f"{chars // 1024} тыс. симв."
+    return f"{chars} симв."
+
+
+class PagedText(ft.Column):
+    """
+    Постраничное отображение очень длинного простого текста.
+
+    Сразу отображается только первая страница; остальные добавляются
+    по одной кнопкой «Показать ещё». Клиенту отправляются только
+    показанные страницы.
+
+    Args:
+        text (str): Исходный текст
+        make_text (callable): Функция создания элемента ft.Text для страницы
+    """
+    def __init__(self, text: str, make_text):
+        super().__init__(tight=True, spacing=0)
+        self.text = text
+        self.make_text = make_text
+        self.spans = text_page_spans(text)
+        self.shown = 0
+        self.more_button = None
+        self.show_next_page()
+
+    def show_next_page(self, e=None):
+        """Добавление следующей страницы текста."""
+        if self.more_button in self.controls:
+            self.controls.remove(self.more_button)
+
+        start, end = self.spans[self.shown]
+        self.controls.append(self.make_text(self.text[start:end]))
+        self.shown += 1
+
+        if self.shown < len(self.spans):
+            self.more_button = show_more_button(len(self.text) - end, self.show_next_page)
+            self.controls.append(self.more_button)
+
+        if e is not None:
+            self.update()
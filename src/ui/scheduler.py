@@ -0,0 +1,107 @@
+# Импорт необходимых библиотек
+import asyncio     # Библиотека для асинхронного программирования
+import threading   # Блокировка для вызовов из фоновых потоков
+import time        # Измерение интервалов между кадрами
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+
+class UIUpdateScheduler:
+    """
+    Планировщик обновлений интерфейса с объединением по кадрам.
+
+    Каждый вызов page.update() сериализует все измененные элементы и
+    отправляет их клиенту Flet. Вместо немедленных обновлений компоненты
+    помечают элементы как измененные, а планировщик отправляет все
+    накопленные изменения одним обновлением не чаще одного раза за кадр.
+
+    Обеспечивает:
+    - Объединение любого количества пометок в одно обновление за кадр
+    - Безопасные вызовы из фоновых потоков (обновление выполняется в цикле событий страницы)
+    - Обновление только помеченных элементов, если полное обновление не запрошено
+    """
+
+    def __init__(self, page, fps: int = 30):
+        """
+        Инициализация планировщика.
+
+        Args:
+            page (ft.Page): Страница, изменения которой отправляются клиенту
+            fps (int): Максимальное количество обновлений в секунду
+        """
+        self.page = page
+        self.interval = 1.0 / fps          # Минимальный интервал между обновлениями
+        self.logger = AppLogger()
+
+        self._lock = threading.Lock()
+        self._dirty = {}                   # id(элемента) -> элемент
+        self._full_update = False          # Запрошено обновление всей страницы
+        self._scheduled = False            # Обновление уже запланировано
+        self._last_flush = 0.0             # Время последнего обновления
+
+    def mark_dirty(self, *controls):
+        """
+        Пометка элементов как измененных.
+
+        Без аргументов помечает всю страницу. Можно вызывать из любого потока.
+
+        Args:
+            *controls: Элементы, изменения которых нужно отправить клиенту.
+                       Если изменился список дочерних элементов, помечать
+                       нужно родителя.
+        """
+        with self._lock:
+            if controls:
+                for control in controls:
+                    self._dirty[id(control)] = control
+            else:
+                self._full_update = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        loop = self.page.loop
+        if _running_loop() is loop:
+            self._schedule()
+        else:
+            loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        """Планирование обновления на начало следующего кадра."""
+        delay = self._last_flush + self.interval - time.monotonic()
+        self.page.loop.call_later(max(0.0, delay), self.flush)
+
+    def flush(self):
+        """
+        Немедленная отправка всех накопленных изменений.
+
+        Вызывается планировщиком; вызов вручную нужен, только если изменения
+        должны появиться до следующего кадра.
+        """
+        with self._lock:
+            # Элементы, еще не добавленные на страницу, пропускаются:
+            # их текущее состояние будет отправлено при добавлении
+            controls = [c for c in self._dirty.values() if c.page is not None]
+            full_update = self._full_update
+            self._dirty.clear()
+            self._full_update = False
+            self._scheduled = False
+
+        if not controls and not full_update:
+            return
+
+        self._last_flush = time.monotonic()
+        try:
+            if full_update:
+                self.page.update()
+            else:
+                self.page.update(*controls)
+        except Exception as e:
+            self.logger.error(f"Ошибка обновления интерфейса: {e}")
+
+
+def _running_loop():
+    """Текущий цикл событий или None, если вызов сделан из другого потока."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
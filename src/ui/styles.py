@@ -61,6 +61,21 @@ class AppStyles:
         "width": 130,                        # Ширина кнопки
     }
 
+    # Настройки кнопки остановки генерации ответа
+    STOP_BUTTON = {
+        "text": "Стоп",                      # Текст на кнопке
+        "icon": ft.icons.STOP,               # Иконка остановки
+        "style": ft.ButtonStyle(             # Стиль оформления кнопки
+            color=ft.Colors.WHITE,           # Цвет текста кнопки
+            bgcolor=ft.Colors.ORANGE_800,    # Цвет фона кнопки
+            padding=10,                      # Внутренние отступы
+        ),
+        "tooltip": "Остановить генерацию ответа",  # Всплывающая подсказка
+        "height": 40,                        # Высота кнопки
+        "width": 130,                        # Ширина кнопки
+        "visible": False,                    # Показывается только во время генерации
+    }
+
     # Настройки кнопки сохранения диалога
     SAVE_BUTTON = {
         "text": "Сохранить",                 # Текст на кнопке
@@ -75,6 +90,20 @@ class AppStyles:
         "height": 40,                        # Высота кнопки
     }
 
+    # Настройки кнопки импорта истории
+    IMPORT_BUTTON = {
+        "text": "Импорт",                    # Текст на кнопке
+        "icon": ft.icons.UPLOAD_FILE,        # Иконка загрузки файла
+        "style": ft.ButtonStyle(             # Стиль оформления кнопки
+            color=ft.Colors.WHITE,           # Цвет текста
+            bgcolor=ft.Colors.BLUE_GREY_700, # Цвет фона
+            padding=10,                      # Внутренние отступы
+        ),
+        "tooltip": "Загрузить историю из файла экспорта или другой базы", # Всплывающая подсказка
+        "width": 130,                        # Ширина кнопки
+        "height": 40,                        # Высота кнопки
+    }
+
     # Настройки кнопки очистки истории
     CLEAR_BUTTON = {
         "text": "Очистить",                  # Текст на кнопке
@@ -103,6 +132,56 @@ class AppStyles:
         "height": 40,                        # Высота кнопки
     }
 
+    # Настройки отрисовки Markdown в ответах AI
+    MESSAGE_MARKDOWN = {
+        "selectable": True,                                # Возможность выделения текста
+        "extension_set": ft.MarkdownExtensionSet.GITHUB_WEB,  # Таблицы, списки задач и т.д.
+        "code_theme": ft.MarkdownCodeTheme.ATOM_ONE_DARK,  # Подсветка синтаксиса в блоках кода
+        "auto_follow_links": True,                         # Открытие ссылок в браузере
+    }
+
+    # Настройки выпадающего списка формата экспорта
+    EXPORT_FORMAT_DROPDOWN = {
+        "width": 300,                        # Ширина списка в пикселях
+        "label": "Формат",                   # Подпись списка
+        "border_color": ft.Colors.GREY_700,  # Цвет границы
+        "focused_border_color": ft.Colors.BLUE_400,  # Цвет границы при фокусе
+    }
+
+    # Настройки кнопки «Показать ещё» для длинных сообщений
+    SHOW_MORE_BUTTON = {
+        "style": ft.ButtonStyle(
+            color=ft.Colors.BLUE_200,        # Цвет текста кнопки
+            padding=5,                       # Внутренние отступы
+        ),
+    }
+
+    # Настройки колонки с полем ввода и оценкой токенов
+    INPUT_COLUMN = {
+        "spacing": 2,                        # Минимальный отступ до счетчика токенов
+        "tight": True,                       # Колонка по высоте содержимого
+    }
+
+    # Настройки оценки токенов под полем ввода
+    TOKEN_COUNTER = {
+        "size": 12,                          # Мелкий шрифт подписи
+        "color": ft.Colors.GREY_500,         # Приглушенный цвет
+    }
+
+    # Настройки отметки об остановленной генерации под ответом AI
+    TRUNCATED_NOTE = {
+        "size": 12,                          # Мелкий шрифт подписи
+        "italic": True,                      # Курсив
+        "color": ft.Colors.GREY_400,         # Приглушенный цвет
+    }
+
+    # Настройки отметки о сообщении, ожидающем отправки в очереди
+    QUEUED_NOTE = {
+        "size": 12,                          # Мелкий шрифт подписи
+        "italic": True,                      # Курсив
+        "color": ft.Colors.GREY_500,         # Приглушенный цвет
+    }
+
     # Настройки строки с полем ввода и кнопкой отправки
     INPUT_ROW = {
         "spacing": 10,                                    # Отступ между элементами
@@ -162,6 +241,25 @@ class AppStyles:
         "focused_bgcolor": ft.Colors.GREY_800,      # Цвет фона при фокусе
     }
 
+    # Настройки выпадающего списка бесед
+    CONVERSATION_DROPDOWN = {
+        "width": 300,                        # Ширина списка
+        "height": 45,                        # Высота в закрытом состоянии
+        "border_radius": 8,                  # Радиус скругления углов
+        "bgcolor": ft.Colors.GREY_900,       # Цвет фона
+        "border_color": ft.Colors.GREY_700,  # Цвет границы
+        "color": ft.Colors.WHITE,            # Цвет текста
+        "content_padding": 10,               # Внутренние отступы
+        "focused_border_color": ft.Colors.BLUE_400,  # Цвет границы при фокусе
+        "focused_bgcolor": ft.Colors.GREY_800,      # Цвет фона при фокусе
+    }
+
+    # Настройки строки выбора беседы
+    CONVERSATION_ROW = {
+        "spacing": 10,                                    # Отступ между элементами
+        "alignment": ft.MainAxisAlignment.CENTER,         # Выравнивание по центру
+    }
+
     # Настройки колонки с элементами выбора модели
     MODEL_SELECTION_COLUMN = {
         "spacing": 10,                                    # Отступ между элементами
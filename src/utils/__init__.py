@@ -1,15 +1,41 @@
 """
 Utils package initialization.
 Contains utility modules for the application.
+
+Classes are imported on first access (PEP 562), so importing one
+module of the package does not load the others and their dependencies.
 """
-from .analytics import Analytics
-from .cache import ChatCache
-from .logger import AppLogger
-from .monitor import PerformanceMonitor
-
-__all__ = [
-    'Analytics',
-    'ChatCache',
-    'AppLogger',
-    'PerformanceMonitor'
-]
+import importlib
+
+# Экспортируемое имя -> модуль пакета, в котором оно определено
+_EXPORTS = {
+    'Analytics': '.analytics',
+    'ChatCache': '.cache',
+    'ChatExporter': '.exporter',
+    'ChatImporter': '.importer',
+    'MessageCodec': '.compression',
+    'ConnectionPool': '.db_pool',
+    'AppLogger': '.logger',
+    'PerformanceMonitor': '.monitor',
+    'RetentionManager': '.retention',
+    'RetentionPolicy': '.retention',
+    'ModelSearchIndex': '.search',
+    'SendQueue': '.send_queue',
+    'ConversationSummarizer': '.summarizer',
+    'StartupTimeline': '.timeline',
+    'TokenEstimator': '.tokens'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
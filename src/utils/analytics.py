@@ -1,5 +1,6 @@
 # Импорт необходимых библиотек
 import time                  # Библиотека для работы с временными метками и измерения интервалов
+import threading             # Статистика обновляется из разных потоков
 from datetime import datetime  # Библиотека для работы с датой и временем в удобном формате
 
 class Analytics:
@@ -10,6 +11,8 @@ class Analytics:
     - Статистику по моделям
     - Время ответа
     - Использование токенов
+    - Долю токенов запроса, прочитанных из кэша поставщика
+    - Остановленные генерации и сэкономленные ими токены и время
     - Длину сообщений
     - Общую длительность сессии
     """
@@ -31,6 +34,13 @@ class Analytics:
         self.model_usage = {}
         self.session_data = []
         
+        # Загруженные из базы записи analytics_messages: для дозагрузки
+        # записей, добавленных другими экземплярами приложения
+        self._lock = threading.Lock()
+        self._last_id = 0           # Максимальный учтенный ID
+        self._loaded = 0            # Количество учтенных записей
+        self._own_ids = set()       # ID записей track_message, еще не встреченных в refresh
+        
         # Загрузка исторических данных из базы
         self._load_historical_data()
         
@@ -39,19 +49,49 @@ class Analytics:
         Загрузка исторических данных из базы данных.
         Обновляет статистику использования моделей и сессионные данные.
         """
-        history = self.cache.get_analytics_history()
+        self._apply_records(self.cache.get_analytics_history())
+
+        # Старые записи, свернутые политикой хранения в дневные сводки,
+        # учитываются только в статистике моделей
+        for rollup in self.cache.get_analytics_rollups():
+            (_, model, messages, _, _, tokens_used, prompt_tokens, cached_tokens,
+             cancelled, saved_tokens, saved_time) = rollup
+            usage = self._model_stats(model)
+            usage['count'] += messages
+            usage['tokens'] += tokens_used or 0
+            usage['prompt_tokens'] += prompt_tokens or 0
+            usage['cached_tokens'] += cached_tokens or 0
+            usage['cancelled'] += cancelled or 0
+            usage['saved_tokens'] += saved_tokens or 0
+            usage['saved_time'] += saved_time or 0
+
+    def _apply_records(self, history):
+        """
+        Учет записей analytics_messages в статистике.
         
+        Args:
+            history (list): Записи в формате ChatCache.get_analytics_history
+        """
         for record in history:
-            timestamp, model, message_length, response_time, tokens_used = record
+            (record_id, timestamp, model, message_length, response_time, tokens_used,
+             prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time) = record
+            self._last_id = max(self._last_id, record_id)
+            
+            # Запись этого экземпляра уже учтена в track_message
+            if record_id in self._own_ids:
+                self._own_ids.discard(record_id)
+                continue
+            self._loaded += 1
             
             # Обновление статистики моделей
-            if model not in self.model_usage:
-                self.model_usage[model] = {
-                    'count': 0,
-                    'tokens': 0
-                }
-            self.model_usage[model]['count'] += 1
-            self.model_usage[model]['tokens'] += tokens_used
+            usage = self._model_stats(model)
+            usage['count'] += 1
+            usage['tokens'] += tokens_used
+            usage['prompt_tokens'] += prompt_tokens or 0
+            usage['cached_tokens'] += cached_tokens or 0
+            usage['cancelled'] += cancelled or 0
+            usage['saved_tokens'] += saved_tokens or 0
+            usage['saved_time'] += saved_time or 0
             
             # Добавление в сессионные данные
             self.session_data.append({
@@ -59,10 +99,37 @@ class Analytics:
                 'model': model,
                 'message_length': message_length,
                 'response_time': response_time,
-                'tokens_used': tokens_used
+                'tokens_used': tokens_used,
+                'prompt_tokens': prompt_tokens or 0,
+                'cached_tokens': cached_tokens or 0,
+                'cancelled': bool(cancelled)
             })
 
-    def track_message(self, model: str, message_length: int, response_time: float, tokens_used: int):
+    def _model_stats(self, model: str) -> dict:
+        """
+        Статистика использования модели (создается при первом обращении).
+        
+        Args:
+            model (str): Идентификатор модели
+            
+        Returns:
+            dict: Счетчики модели
+        """
+        if model not in self.model_usage:
+            self.model_usage[model] = {
+                'count': 0,          # Счетчик использований
+                'tokens': 0,         # Счетчик токенов
+                'prompt_tokens': 0,  # Счетчик токенов запросов
+                'cached_tokens': 0,  # Из них прочитано из кэша
+                'cancelled': 0,      # Остановленных генераций
+                'saved_tokens': 0,   # Сэкономлено токенов остановкой
+                'saved_time': 0.0    # Сэкономлено времени остановкой (с)
+            }
+        return self.model_usage[model]
+
+    def track_message(self, model: str, message_length: int, response_time: float, tokens_used: int,
+                      prompt_tokens: int = 0, cached_tokens: int = 0, cancelled: bool = False,
+                      saved_tokens: int = 0, saved_time: float = 0.0):
         """
         Отслеживание метрик отдельного сообщения.
         
@@ -74,22 +141,43 @@ class Analytics:
             message_length (int): Длина сообщения в символах
             response_time (float): Время ответа в секундах
             tokens_used (int): Количество использованных токенов
+            prompt_tokens (int): Количество токенов запроса
+            cached_tokens (int): Из них прочитано из кэша поставщика
+                                 (дешевле и быстрее обычных)
+            cancelled (bool): Генерация остановлена пользователем
+            saved_tokens (int): Оценка токенов, не сгенерированных после остановки
+            saved_time (float): Оценка сэкономленного остановкой времени в секундах
         """
         timestamp = datetime.now()
         
-        # Сохранение в базу данных
-        self.cache.save_analytics(timestamp, model, message_length, response_time, tokens_used)
-        
-        # Инициализация статистики для новой модели при первом использовании
-        if model not in self.model_usage:
-            self.model_usage[model] = {
-                'count': 0,    # Счетчик использований
-                'tokens': 0    # Счетчик токенов
-            }
+        # Сохранение в базу данных (под блокировкой: refresh не должен
+        # учесть запись до того, как она попадет в _own_ids)
+        with self._lock:
+            record_id = self.cache.save_analytics(
+                timestamp, model, message_length, response_time, tokens_used,
+                prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time
+            )
+            self._track(record_id, timestamp, model, message_length, response_time,
+                        tokens_used, prompt_tokens, cached_tokens, cancelled,
+                        saved_tokens, saved_time)
 
+    def _track(self, record_id, timestamp, model, message_length, response_time, tokens_used,
+               prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time):
+        """Учет записи, сохраненной track_message (вызывается под _lock)."""
+        # Запись будет пропущена, когда refresh встретит ее в базе
+        self._own_ids.add(record_id)
+        self._loaded += 1
+        
         # Обновление статистики использования модели
-        self.model_usage[model]['count'] += 1          # Увеличение счетчика сообщений
-        self.model_usage[model]['tokens'] += tokens_used  # Добавление использованных токенов
+        # (создается при первом использовании модели)
+        usage = self._model_stats(model)
+        usage['count'] += 1                    # Увеличение счетчика сообщений
+        usage['tokens'] += tokens_used         # Добавление использованных токенов
+        usage['prompt_tokens'] += prompt_tokens  # Токены запроса
+        usage['cached_tokens'] += cached_tokens  # Токены из кэша
+        usage['cancelled'] += int(cancelled)   # Остановленные генерации
+        usage['saved_tokens'] += saved_tokens  # Сэкономленные токены
+        usage['saved_time'] += saved_time      # Сэкономленное время
 
         # Сохранение подробной информации о сообщении
         self.session_data.append({
@@ -97,7 +185,10 @@ class Analytics:
             'model': model,                   # Использованная модель
             'message_length': message_length, # Длина сообщения
             'response_time': response_time,   # Время ответа
-            'tokens_used': tokens_used        # Количество токенов
+            'tokens_used': tokens_used,       # Количество токенов
+            'prompt_tokens': prompt_tokens,   # Токены запроса
+            'cached_tokens': cached_tokens,   # Из них из кэша
+            'cancelled': cancelled            # Генерация остановлена
         })
 
     def get_statistics(self) -> dict:
@@ -114,6 +205,12 @@ class Analytics:
                 - session_duration: длительность сессии в секундах
                 - messages_per_minute: среднее количество сообщений в минуту
                 - tokens_per_message: среднее количество токенов на сообщение
+                - prompt_tokens: общее количество токенов запросов
+                - cached_tokens: из них прочитано из кэша поставщика
+                - cache_hit_rate: доля токенов запросов, прочитанных из кэша
+                - cancelled_messages: количество остановленных генераций
+                - saved_tokens: оценка токенов, сэкономленных остановкой
+                - saved_time: оценка времени, сэкономленного остановкой (с)
                 - model_usage: статистика использования каждой модели
         """
         # Расчет общей длительности сессии
@@ -125,6 +222,10 @@ class Analytics:
         # Подсчет общего количества сообщений по всем моделям
         total_messages = sum(model['count'] for model in self.model_usage.values())
 
+        # Подсчет токенов запросов и прочитанных из кэша поставщика
+        prompt_tokens = sum(model['prompt_tokens'] for model in self.model_usage.values())
+        cached_tokens = sum(model['cached_tokens'] for model in self.model_usage.values())
+
         # Формирование и возврат статистики
         return {
             'total_messages': total_messages,  # Общее количество сообщений
@@ -140,6 +241,16 @@ class Analytics:
             # Если сообщений нет, возвращаем 0 чтобы избежать деления на ноль
             'tokens_per_message': total_tokens / total_messages if total_messages > 0 else 0,
             
+            # Токены запросов: всего, из кэша и доля кэшированных
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'cache_hit_rate': cached_tokens / prompt_tokens if prompt_tokens > 0 else 0,
+            
+            # Остановленные генерации и сэкономленные ими токены и время
+            'cancelled_messages': sum(model['cancelled'] for model in self.model_usage.values()),
+            'saved_tokens': sum(model['saved_tokens'] for model in self.model_usage.values()),
+            'saved_time': sum(model['saved_time'] for model in self.model_usage.values()),
+            
             # Полная статистика использования моделей
             'model_usage': self.model_usage
         }
@@ -165,3 +276,41 @@ class Analytics:
         """
         self.model_usage.clear()    # Очистка статистики по моделям
         self.session_data.clear()   # Очистка истории сообщений
+
+    def reload(self):
+        """
+        Повторная загрузка статистики из базы данных.
+        
+        Нужна после изменения базы в обход track_message
+        (например, после импорта истории).
+        """
+        with self._lock:
+            self.model_usage.clear()    # Очистка статистики по моделям
+            self.session_data.clear()   # Очистка истории сообщений
+            self._last_id = self._loaded = 0
+            self._own_ids.clear()
+            self._load_historical_data()
+
+    def refresh(self):
+        """
+        Дозагрузка записей, добавленных в базу другими экземплярами приложения.
+        
+        Читаются только записи с ID больше уже учтенных. Если записи были
+        удалены (очистка истории или политика хранения в другом экземпляре),
+        статистика загружается заново.
+        
+        Returns:
+            bool: True если статистика изменилась
+        """
+        with self._lock:
+            loaded = self._loaded
+            self._apply_records(self.cache.get_analytics_history(after_id=self._last_id))
+            
+            # Записей до последнего учтенного ID меньше, чем учтено - часть удалена.
+            # Собственные записи с большими ID в базе еще не встречались
+            unseen = sum(1 for record_id in self._own_ids if record_id > self._last_id)
+            removed = self.cache.count_analytics(self._last_id) < self._loaded - unseen
+        
+        if removed:
+            self.reload()
+        return removed or self._loaded != loaded
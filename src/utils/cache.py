@@ -1,8 +1,140 @@
 # Импорт необходимых библиотек
-import sqlite3      # Библиотека для работы с SQLite базой данных
+import hashlib     # Хеш содержимого сообщения для дедупликации
 import json        # Библиотека для работы с JSON форматом
 from datetime import datetime  # Библиотека для работы с датой и временем
 import threading   # Библиотека для обеспечения потокобезопасности
+from collections import OrderedDict  # Упорядоченный словарь для LRU-кэша страниц
+from utils.compression import MessageCodec  # Прозрачное сжатие текстов сообщений
+from utils.db_pool import ConnectionPool    # Ограниченный пул соединений с базой
+
+def message_hash(model, user_message, ai_response, timestamp) -> str:
+    """
+    Хеш содержимого сообщения для поиска дубликатов при импорте.
+
+    Время входит в хеш: одинаковые вопрос и ответ в разное время -
+    разные сообщения.
+
+    Args:
+        model (str): Идентификатор модели
+        user_message (str): Текст сообщения пользователя
+        ai_response (str): Ответ AI модели
+        timestamp: Время создания (datetime или строка в формате базы)
+
+    Returns:
+        str: Шестнадцатеричный SHA-1 хеш
+    """
+    content = f"{model or ''}\x1f{user_message or ''}\x1f{ai_response or ''}\x1f{timestamp or ''}"
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+# Тексты не короче этого числа символов хранятся в таблице blobs
+# (одна копия на все одинаковые тексты), более короткие - прямо в messages
+BLOB_MIN_CHARS = 64
+
+# Выражения для чтения текстов сообщения из messages (псевдоним m) с учетом blobs
+MESSAGE_TEXT_COLUMNS = (
+    "COALESCE(m.user_message, ub.data) AS user_message, "
+    "COALESCE(m.ai_response, ab.data) AS ai_response"
+)
+MESSAGE_BLOB_JOINS = (
+    "LEFT JOIN blobs AS ub ON ub.id = m.user_blob "
+    "LEFT JOIN blobs AS ab ON ab.id = m.ai_blob"
+)
+
+
+def intern_text(conn, codec, text, known=None):
+    """
+    Подготовка текста сообщения к записи с дедупликацией.
+
+    Длинный текст сохраняется в blobs (если такого текста там еще нет) и
+    заменяется ссылкой; счетчик ссылок увеличивает триггер при записи
+    ссылки в messages. Короткий текст остается в строке сообщения.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой
+        codec (MessageCodec): Кодек сжатия
+        text (str): Текст сообщения
+        known (dict): Необязательный кэш хеш -> ID blob для массовой записи
+
+    Returns:
+        tuple: (значение для колонки текста, ID blob) - одно из них None
+    """
+    if text is None or len(text) < BLOB_MIN_CHARS:
+        return codec.encode(text), None
+
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    if known is not None and digest in known:
+        return None, known[digest]
+
+    row = conn.execute('SELECT id FROM blobs WHERE hash = ?', (digest,)).fetchone()
+    if row is None:
+        cursor = conn.execute('''
+            INSERT INTO blobs (hash, data, refcount) VALUES (?, ?, 0)
+            ON CONFLICT (hash) DO NOTHING
+        ''', (digest, codec.encode(text)))
+        # Текст мог добавить другой поток между проверкой и вставкой
+        row = (cursor.lastrowid,) if cursor.rowcount else conn.execute(
+            'SELECT id FROM blobs WHERE hash = ?', (digest,)
+        ).fetchone()
+    if known is not None:
+        known[digest] = row[0]
+    return None, row[0]
+
+
+def intern_message_texts(conn, codec, after_id=0, batch_size=500):
+    """
+    Перенос длинных текстов уже сохраненных сообщений в blobs.
+
+    Сообщения обрабатываются пачками по первичному ключу; функция не
+    фиксирует транзакцию, это делает вызывающий код после каждой пачки.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой
+        codec (MessageCodec): Кодек сжатия
+        after_id (int): Обрабатывать сообщения с ID больше указанного
+        batch_size (int): Количество сообщений в одной пачке
+
+    Yields:
+        int: Количество измененных сообщений в обработанной пачке
+    """
+    known = {}
+    last_id = after_id
+    while True:
+        rows = conn.execute('''
+            SELECT id, user_message, user_blob, ai_response, ai_blob FROM messages
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        updates = []
+        for row_id, *texts in rows:
+            values = []
+            changed = False
+            for text, blob_id in (texts[0:2], texts[2:4]):
+                # Сжатые значения всегда длиннее порога дедупликации
+                if isinstance(text, bytes) or (text is not None and len(text) >= BLOB_MIN_CHARS):
+                    text, blob_id = intern_text(conn, codec, codec.decode(text), known)
+                    changed = True
+                values += [text, blob_id]
+            if changed:
+                updates.append((*values, row_id))
+        conn.executemany('''
+            UPDATE messages SET user_message = ?, user_blob = ?, ai_response = ?, ai_blob = ?
+            WHERE id = ?
+        ''', updates)
+        yield len(updates)
+
+
+def _conversation_title(user_message, length=60) -> str:
+    """Название беседы по первой строке первого сообщения."""
+    lines = (user_message or '').strip().splitlines()
+    title = lines[0].strip() if lines else ''
+    if len(title) > length:
+        title = title[:length - 1].rstrip() + '…'
+    return title or 'Новый чат'
+
 
 class ChatCache:
     """
@@ -10,64 +142,104 @@ class ChatCache:
     
     Обеспечивает:
     - Потокобезопасное хранение истории сообщений
+    - Разделение истории на отдельные беседы (conversations)
     - Сохранение метаданных (модель, токены, время)
     - Форматированный вывод истории
     - Очистку истории
+    - Кэш последних страниц недавно открытых бесед в памяти
+    - Прозрачное сжатие длинных текстов сообщений
+    - Хранение одинаковых длинных текстов в одном экземпляре (таблица blobs)
     """
+    # Количество бесед, последние страницы которых хранятся в памяти
+    RECENT_CONVERSATIONS = 5
+    
+    # Количество последних сообщений беседы, хранимых в памяти
+    RECENT_PAGE_ROWS = 50
     
-    def __init__(self):
+    # Количество сообщений, по которым обучается словарь сжатия
+    DICTIONARY_SAMPLE_ROWS = 1000
+    
+    def __init__(self, db_name='chat_cache.db', codec=None):
         """
         Инициализация системы кэширования.
         
+        Args:
+            db_name (str): Путь к файлу базы данных SQLite
+            codec (MessageCodec): Кодек сжатия текстов (по умолчанию - из
+                                  переменных окружения MESSAGE_COMPRESSION*)
+        
         Создает:
         - Файл базы данных SQLite
-        - Потокобезопасное хранилище соединений
+        - Пул соединений (одно для записи, несколько для чтения)
         - Необходимые таблицы в базе данных
         """
         # Имя файла SQLite базы данных
-        self.db_name = 'chat_cache.db'
+        self.db_name = db_name
+        
+        # Пул соединений, общих для всех потоков: число открытых файлов
+        # не зависит от того, сколько потоков обращается к кэшу
+        self.pool = ConnectionPool(db_name)
+        
+        # LRU-кэш последних страниц бесед: ID беседы -> {"rows": [...], "complete": bool}
+        # complete - в списке все сообщения беседы
+        self._recent_pages = OrderedDict()
+        self._recent_lock = threading.Lock()
         
-        # Создание потокобезопасного хранилища соединений
-        # Каждый поток будет иметь свое собственное соединение с базой
-        self.local = threading.local()
+        # Кодек сжатия: тексты сообщений сжимаются при записи и
+        # распаковываются при чтении, остальной код видит обычные строки
+        self.codec = codec or MessageCodec.from_env()
         
         # Создание необходимых таблиц при инициализации
         self.create_tables()
-
-    def get_connection(self):
-        """
-        Получение соединения с базой данных для текущего потока.
         
-        Returns:
-            sqlite3.Connection: Объект соединения с базой данных
-            
-        Note:
-            Каждый поток получает свое собственное соединение,
-            что обеспечивает потокобезопасность работы с базой.
-        """
-        # Проверяем, есть ли уже соединение в текущем потоке
-        if not hasattr(self.local, 'connection'):
-            # Если соединения нет - создаем новое
-            self.local.connection = sqlite3.connect(self.db_name)
-        return self.local.connection
+        # Загрузка словарей сжатия (при необходимости - обучение первого).
+        # Словари, обученные позже другими процессами, кодек подгружает
+        # при первой встрече сжатого ими значения
+        self.codec.dictionary_loader = self.reload_dictionaries
+        self._load_dictionaries()
+        
+        # Версия данных, по которой poll_changes замечает изменения базы,
+        # сделанные другими экземплярами приложения
+        self._data_version = self.pool.data_version()
 
     def create_tables(self):
         """
         Создание необходимых таблиц в базе данных.
         
-        Создает таблицу messages со следующими полями:
+        Создает таблицу conversations (беседы: id, title, created_at, updated_at)
+        и таблицу messages со следующими полями:
         - id: уникальный идентификатор сообщения
         - model: идентификатор использованной модели
         - user_message: текст сообщения пользователя
         - ai_response: ответ AI модели
         - timestamp: время создания сообщения
         - tokens_used: количество использованных токенов
+        - content_hash: хеш содержимого для дедупликации при импорте
+        - conversation_id: беседа, к которой относится сообщение
+        - user_blob, ai_blob: ссылки на тексты в таблице blobs
+          (тогда user_message / ai_response пусты)
+        - truncated: ответ частичный, генерация остановлена пользователем
         """
-        # Создаем новое соединение с базой
-        conn = sqlite3.connect(self.db_name)
+        with self.pool.writer() as conn:
+            self._create_tables(conn)
+
+    def _create_tables(self, conn):
+        """Создание таблиц и перенос данных старых версий схемы."""
         cursor = conn.cursor()
         
+        # Инкрементальная очистка и режим WAL задаются при открытии
+        # соединения для записи (ConnectionPool.WRITER_PRAGMAS)
+        
         # SQL запросы для создания таблиц
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,  -- Уникальный ID беседы
+                title TEXT,                           -- Название беседы
+                created_at DATETIME,                  -- Время создания
+                updated_at DATETIME                   -- Время последнего сообщения
+            )
+        ''')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,  -- Уникальный ID сообщения
@@ -75,7 +247,112 @@ class ChatCache:
                 user_message TEXT,                    -- Текст от пользователя
                 ai_response TEXT,                     -- Ответ от AI
                 timestamp DATETIME,                   -- Время создания
-                tokens_used INTEGER                   -- Использовано токенов
+                tokens_used INTEGER,                  -- Использовано токенов
+                content_hash TEXT,                    -- Хеш содержимого
+                conversation_id INTEGER REFERENCES conversations(id),  -- Беседа
+                user_blob INTEGER,                    -- Ссылка на текст пользователя в blobs
+                ai_blob INTEGER,                      -- Ссылка на ответ AI в blobs
+                truncated INTEGER DEFAULT 0           -- Генерация ответа остановлена
+            )
+        ''')
+        
+        # Длинные тексты сообщений, по одному экземпляру на каждый уникальный текст
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                id INTEGER PRIMARY KEY,               -- ID, на который ссылаются сообщения
+                hash BLOB UNIQUE,                     -- SHA-1 несжатого текста (20 байт)
+                data TEXT,                            -- Текст (при сжатии - BLOB)
+                refcount INTEGER                      -- Количество ссылок из messages
+            )
+        ''')
+        
+        # Миграция баз, созданных до появления хеша содержимого
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(messages)')]
+        if 'content_hash' not in columns:
+            cursor.execute('ALTER TABLE messages ADD COLUMN content_hash TEXT')
+            conn.create_function('message_hash', 4, message_hash, deterministic=True)
+            cursor.execute('''
+                UPDATE messages
+                SET content_hash = message_hash(model, user_message, ai_response, timestamp)
+            ''')
+        
+        # Миграция баз, созданных до появления бесед:
+        # вся существующая история становится одной беседой
+        if 'conversation_id' not in columns:
+            cursor.execute(
+                'ALTER TABLE messages ADD COLUMN conversation_id INTEGER REFERENCES conversations(id)'
+            )
+            first, last = cursor.execute(
+                'SELECT MIN(timestamp), MAX(timestamp) FROM messages'
+            ).fetchone()
+            if first is not None:
+                cursor.execute('''
+                    INSERT INTO conversations (title, created_at, updated_at)
+                    VALUES (?, ?, ?)
+                ''', ('История чата', first, last))
+                cursor.execute(
+                    'UPDATE messages SET conversation_id = ?', (cursor.lastrowid,)
+                )
+        
+        # Миграция баз, созданных до появления таблицы blobs
+        if 'user_blob' not in columns:
+            cursor.execute('ALTER TABLE messages ADD COLUMN user_blob INTEGER')
+            cursor.execute('ALTER TABLE messages ADD COLUMN ai_blob INTEGER')
+        
+        # Миграция баз, созданных до остановки генерации
+        if 'truncated' not in columns:
+            cursor.execute('ALTER TABLE messages ADD COLUMN truncated INTEGER DEFAULT 0')
+        
+        # Счетчики ссылок на blobs поддерживаются триггерами, поэтому любое
+        # удаление сообщений (беседы, очистка, политики хранения) освобождает
+        # тексты, на которые больше никто не ссылается
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_blobs_insert AFTER INSERT ON messages
+            WHEN new.user_blob IS NOT NULL OR new.ai_blob IS NOT NULL
+            BEGIN
+                UPDATE blobs SET refcount = refcount + 1 WHERE id = new.user_blob;
+                UPDATE blobs SET refcount = refcount + 1 WHERE id = new.ai_blob;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_blobs_update
+            AFTER UPDATE OF user_blob, ai_blob ON messages
+            BEGIN
+                UPDATE blobs SET refcount = refcount + 1 WHERE id = new.user_blob;
+                UPDATE blobs SET refcount = refcount + 1 WHERE id = new.ai_blob;
+                UPDATE blobs SET refcount = refcount - 1 WHERE id = old.user_blob;
+                UPDATE blobs SET refcount = refcount - 1 WHERE id = old.ai_blob;
+                DELETE FROM blobs WHERE id IN (old.user_blob, old.ai_blob) AND refcount <= 0;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_blobs_delete AFTER DELETE ON messages
+            WHEN old.user_blob IS NOT NULL OR old.ai_blob IS NOT NULL
+            BEGIN
+                UPDATE blobs SET refcount = refcount - 1 WHERE id = old.user_blob;
+                UPDATE blobs SET refcount = refcount - 1 WHERE id = old.ai_blob;
+                DELETE FROM blobs WHERE id IN (old.user_blob, old.ai_blob) AND refcount <= 0;
+            END
+        ''')
+        
+        # Индекс для поиска дубликатов при импорте
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_messages_content_hash ON messages(content_hash)'
+        )
+        
+        # Индекс для постраничной выборки сообщений беседы по ID
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation
+            ON messages(conversation_id, id)
+        ''')
+        
+        # Словари сжатия текстов сообщений (ID хранится в заголовке сжатого значения)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                algorithm TEXT,
+                data BLOB,
+                created_at DATETIME
             )
         ''')
         
@@ -86,14 +363,71 @@ class ChatCache:
                 model TEXT,
                 message_length INTEGER,
                 response_time FLOAT,
-                tokens_used INTEGER
+                tokens_used INTEGER,
+                prompt_tokens INTEGER DEFAULT 0,    -- Токены запроса
+                cached_tokens INTEGER DEFAULT 0,    -- Из них прочитано из кэша поставщика
+                cancelled INTEGER DEFAULT 0,        -- Генерация остановлена пользователем
+                saved_tokens INTEGER DEFAULT 0,     -- Оценка не сгенерированных токенов
+                saved_time FLOAT DEFAULT 0          -- Оценка сэкономленного времени (с)
+            )
+        ''')
+        
+        # Дневные сводки аналитики, в которые сворачиваются старые записи
+        # analytics_messages (суммы по дню и модели)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_rollups (
+                period TEXT,                -- День в формате YYYY-MM-DD
+                model TEXT,                 -- Идентификатор модели
+                messages INTEGER,           -- Количество сообщений
+                message_length INTEGER,     -- Суммарная длина сообщений
+                response_time FLOAT,        -- Суммарное время ответа
+                tokens_used INTEGER,        -- Суммарно использовано токенов
+                prompt_tokens INTEGER DEFAULT 0,    -- Суммарно токенов запросов
+                cached_tokens INTEGER DEFAULT 0,    -- Из них прочитано из кэша
+                cancelled INTEGER DEFAULT 0,        -- Остановленных генераций
+                saved_tokens INTEGER DEFAULT 0,     -- Суммарно сэкономлено токенов
+                saved_time FLOAT DEFAULT 0,         -- Суммарно сэкономлено времени
+                PRIMARY KEY (period, model)
+            )
+        ''')
+        
+        # Миграция баз, созданных до учета кэшированных токенов запроса
+        for table in ('analytics_messages', 'analytics_rollups'):
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+            if 'cached_tokens' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN prompt_tokens INTEGER DEFAULT 0')
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN cached_tokens INTEGER DEFAULT 0')
+            # ... и до учета остановленных генераций
+            if 'cancelled' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN cancelled INTEGER DEFAULT 0')
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN saved_tokens INTEGER DEFAULT 0')
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN saved_time FLOAT DEFAULT 0')
+        
+        # Краткое содержание старой части длинных бесед, которым в запросе
+        # заменяются сообщения с ID до covered_id включительно
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                conversation_id INTEGER PRIMARY KEY REFERENCES conversations(id),
+                summary TEXT,               -- Текст краткого содержания
+                covered_id INTEGER,         -- ID последнего учтенного сообщения
+                model TEXT,                 -- Модель, составившая содержание
+                updated_at DATETIME         -- Время последнего обновления
             )
         ''')
         
+        # Содержание удаляется вместе с беседой при любом способе удаления
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS conversations_summary_delete
+            AFTER DELETE ON conversations
+            BEGIN
+                DELETE FROM conversation_summaries WHERE conversation_id = old.id;
+            END
+        ''')
+        
         conn.commit()  # Сохранение изменений в базе
-        conn.close()   # Закрытие соединения
 
-    def save_message(self, model, user_message, ai_response, tokens_used):
+    def save_message(self, model, user_message, ai_response, tokens_used, conversation_id=None,
+                     truncated=False):
         """
         Сохранение нового сообщения в базу данных.
         
@@ -102,16 +436,52 @@ class ChatCache:
             user_message (str): Текст сообщения пользователя
             ai_response (str): Ответ AI модели
             tokens_used (int): Количество использованных токенов
+            conversation_id (int): ID беседы
+            truncated (bool): Ответ частичный (генерация остановлена)
+            
+        Returns:
+            int: ID сохраненного сообщения
         """
-        conn = self.get_connection()  # Получение соединения для текущего потока
-        cursor = conn.cursor()
+        with self.pool.writer() as conn:  # Получение соединения для записи
+            cursor = conn.cursor()
+            
+            # Длинные тексты записываются в blobs один раз, сообщение хранит ссылки
+            user_text, user_blob = intern_text(conn, self.codec, user_message)
+            ai_text, ai_blob = intern_text(conn, self.codec, ai_response)
+            
+            # Вставка новой записи в таблицу messages
+            timestamp = datetime.now()
+            cursor.execute('''
+                INSERT INTO messages
+                (model, user_message, ai_response, timestamp, tokens_used, content_hash,
+                 conversation_id, user_blob, ai_blob, truncated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (model, user_text, ai_text, timestamp, tokens_used,
+                  message_hash(model, user_message, ai_response, timestamp), conversation_id,
+                  user_blob, ai_blob, int(truncated)))
+            row_id = cursor.lastrowid
+            
+            if conversation_id is not None:
+                # Беседа без названия получает его по первому сообщению
+                cursor.execute('''
+                    UPDATE conversations
+                    SET updated_at = ?, title = COALESCE(title, ?)
+                    WHERE id = ?
+                ''', (timestamp, _conversation_title(user_message), conversation_id))
+            conn.commit()  # Сохранение изменений
         
-        # Вставка новой записи в таблицу messages
-        cursor.execute('''
-            INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (model, user_message, ai_response, datetime.now(), tokens_used))
-        conn.commit()  # Сохранение изменений
+        # Дополнение страницы беседы в памяти, если она там есть
+        if conversation_id is not None:
+            row = (row_id, model, user_message, ai_response, str(timestamp), tokens_used,
+                   int(truncated))
+            with self._recent_lock:
+                entry = self._recent_pages.get(conversation_id)
+                if entry is not None:
+                    entry["rows"].append(row)
+                    if len(entry["rows"]) > self.RECENT_PAGE_ROWS:
+                        del entry["rows"][0]
+                        entry["complete"] = False
+        return row_id
 
     def get_chat_history(self, limit=50):
         """
@@ -124,18 +494,405 @@ class ChatCache:
             list: Список кортежей с данными сообщений, отсортированных
                  по времени в обратном порядке (новые сначала)
         """
-        conn = self.get_connection()  # Получение соединения для текущего потока
-        cursor = conn.cursor()
+        with self.pool.reader() as conn:  # Получение соединения для чтения
+            # Получение последних сообщений с ограничением по количеству
+            rows = conn.execute(f'''
+                SELECT m.id, m.model, {MESSAGE_TEXT_COLUMNS}, m.timestamp, m.tokens_used
+                FROM messages AS m {MESSAGE_BLOB_JOINS}
+                ORDER BY m.timestamp DESC 
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        return self._decode_rows(rows)  # Возврат всех найденных записей
+
+    def get_messages_page(self, before_id=None, after_id=None, limit=20, conversation_id=None):
+        """
+        Получение страницы сообщений по диапазону ID.
         
-        # Получение последних сообщений с ограничением по количеству
-        cursor.execute('''
-            SELECT * FROM messages 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
-        return cursor.fetchall()  # Возврат всех найденных записей
+        Выборка идет по первичному ключу (или индексу беседы), поэтому
+        стоимость не зависит от размера истории. Последние сообщения
+        недавно открытых бесед возвращаются из памяти без обращения к базе.
+        
+        Args:
+            before_id (int): Вернуть сообщения с ID меньше указанного
+                             (последние перед ним)
+            after_id (int): Вернуть сообщения с ID больше указанного
+                            (первые после него)
+            limit (int): Максимальное количество сообщений
+            conversation_id (int): ID беседы (None - сообщения всех бесед)
+            
+        Returns:
+            list: Кортежи (id, model, user_message, ai_response, timestamp, tokens_used,
+                  truncated), отсортированные по возрастанию ID
+        """
+        latest = before_id is None and after_id is None
+        if latest and conversation_id is not None:
+            rows = self._recent_page(conversation_id, limit)
+            if rows is not None:
+                return rows
+        
+        columns = f'm.id, m.model, {MESSAGE_TEXT_COLUMNS}, m.timestamp, m.tokens_used, m.truncated'
+        conditions = []
+        params = []
+        if conversation_id is not None:
+            conditions.append('m.conversation_id = ?')
+            params.append(conversation_id)
+        
+        if after_id is not None:
+            conditions.append('m.id > ?')
+            params.append(after_id)
+            with self.pool.reader() as conn:
+                rows = conn.execute(f'''
+                    SELECT {columns} FROM messages AS m {MESSAGE_BLOB_JOINS}
+                    WHERE {' AND '.join(conditions)} ORDER BY m.id ASC LIMIT ?
+                ''', (*params, limit)).fetchall()
+            return self._decode_rows(rows)
+        
+        if before_id is not None:
+            conditions.append('m.id < ?')
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        # Последняя страница беседы читается с запасом для кэша в памяти
+        remember = latest and conversation_id is not None
+        fetch = max(limit, self.RECENT_PAGE_ROWS) if remember else limit
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns} FROM messages AS m {MESSAGE_BLOB_JOINS}
+                {where} ORDER BY m.id DESC LIMIT ?
+            ''', (*params, fetch)).fetchall()
+        rows = self._decode_rows(rows[::-1])
+        
+        if remember:
+            with self._recent_lock:
+                self._recent_pages[conversation_id] = {
+                    "rows": rows,
+                    "complete": len(rows) < fetch
+                }
+                self._recent_pages.move_to_end(conversation_id)
+                while len(self._recent_pages) > self.RECENT_CONVERSATIONS:
+                    self._recent_pages.popitem(last=False)
+        return rows[-limit:] if limit else []
+
+    def _recent_page(self, conversation_id, limit):
+        """
+        Последние сообщения беседы из кэша в памяти.
+        
+        Returns:
+            list | None: Сообщения или None, если в кэше их недостаточно
+        """
+        with self._recent_lock:
+            entry = self._recent_pages.get(conversation_id)
+            if entry is None or (len(entry["rows"]) < limit and not entry["complete"]):
+                return None
+            self._recent_pages.move_to_end(conversation_id)
+            return list(entry["rows"][-limit:]) if limit else []
 
-    def save_analytics(self, timestamp, model, message_length, response_time, tokens_used):
+    def _decode_rows(self, rows):
+        """Распаковка текстов сообщений (колонки user_message и ai_response)."""
+        decode = self.codec.decode
+        # Несжатые строки возвращаются как есть, без пересборки кортежа
+        return [
+            row if type(row[2]) is not bytes and type(row[3]) is not bytes
+            else (row[0], row[1], decode(row[2]), decode(row[3])) + tuple(row[4:])
+            for row in rows
+        ]
+
+    def _load_dictionaries(self):
+        """
+        Загрузка словарей сжатия из базы.
+        
+        Если сжатие включено, а словаря для текущего алгоритма еще нет,
+        он обучается на последних сообщениях, как только их накопится
+        DICTIONARY_SAMPLE_ROWS.
+        """
+        self.reload_dictionaries()
+        if not self.codec.enabled or self.codec.dictionary_id:
+            return
+        
+        with self.pool.reader() as conn:
+            texts = conn.execute(f'''
+                SELECT {MESSAGE_TEXT_COLUMNS} FROM messages AS m {MESSAGE_BLOB_JOINS}
+                ORDER BY m.id DESC LIMIT ?
+            ''', (self.DICTIONARY_SAMPLE_ROWS,)).fetchall()
+        rows = self._decode_rows((0, None, user, ai) for user, ai in texts)
+        if len(rows) < self.DICTIONARY_SAMPLE_ROWS:
+            return
+        
+        data = self.codec.train_dictionary([text for row in rows for text in row[2:4]])
+        if not data:
+            return
+        with self.pool.writer() as conn:
+            # Проверка и запись - в одной транзакции записи: если другой процесс
+            # успел обучить словарь, используется его словарь, и все процессы
+            # сжимают новые записи одним словарем
+            existing = conn.execute(
+                'SELECT 1 FROM compression_dictionaries WHERE algorithm = ? LIMIT 1',
+                (self.codec.algorithm,)
+            ).fetchone()
+            if existing is None:
+                conn.execute('''
+                    INSERT INTO compression_dictionaries (algorithm, data, created_at)
+                    VALUES (?, ?, ?)
+                ''', (self.codec.algorithm, data, datetime.now()))
+            conn.commit()
+        self.reload_dictionaries()
+
+    def reload_dictionaries(self):
+        """
+        Регистрация в кодеке словарей сжатия, которых он еще не знает.
+        
+        Другой экземпляр приложения может обучить словарь и сжимать им
+        новые сообщения; вызывается при создании кэша, при изменениях базы
+        (poll_changes) и кодеком при встрече неизвестного словаря.
+        """
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                'SELECT id, algorithm, data FROM compression_dictionaries WHERE id > ? ORDER BY id',
+                (max(self.codec.dictionaries, default=0),)
+            ).fetchall()
+        for dictionary_id, algorithm, data in rows:
+            # ID словаря хранится в одном байте заголовка
+            if dictionary_id <= 255:
+                self.codec.add_dictionary(dictionary_id, algorithm, data)
+
+    def compress_messages(self, batch_size=500):
+        """
+        Сжатие ранее сохраненных несжатых сообщений.
+        
+        Сообщения обрабатываются пачками по первичному ключу, каждая пачка -
+        отдельная короткая транзакция, поэтому запись новых сообщений не
+        блокируется надолго.
+        
+        Args:
+            batch_size (int): Количество сообщений в одной пачке
+            
+        Returns:
+            int: Количество сжатых сообщений
+        """
+        if not self.codec.enabled:
+            return 0
+        
+        threshold = self.codec.threshold
+        last_id = 0
+        compressed = 0
+        while True:
+            # Кандидаты - только текстовые значения не короче порога
+            with self.pool.reader() as conn:
+                rows = conn.execute('''
+                    SELECT id, user_message, ai_response FROM messages
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            updates = []
+            for row_id, user_message, ai_response in rows:
+                if not any(isinstance(text, str) and len(text) * 4 >= threshold
+                           for text in (user_message, ai_response)):
+                    continue
+                encoded = (self.codec.encode(self.codec.decode(user_message)),
+                           self.codec.encode(self.codec.decode(ai_response)))
+                if encoded != (user_message, ai_response):
+                    updates.append(encoded + (row_id,))
+            if updates:
+                with self.pool.writer() as conn:
+                    conn.executemany(
+                        'UPDATE messages SET user_message = ?, ai_response = ? WHERE id = ?',
+                        updates
+                    )
+                    conn.commit()
+                compressed += len(updates)
+
+        # Тексты в blobs, записанные без сжатия
+        last_id = 0
+        while True:
+            with self.pool.reader() as conn:
+                rows = conn.execute('''
+                    SELECT id, data FROM blobs
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for row_id, data in rows:
+                if isinstance(data, str) and len(data) * 4 >= threshold:
+                    encoded = self.codec.encode(data)
+                    if encoded != data:
+                        updates.append((encoded, row_id))
+            if updates:
+                with self.pool.writer() as conn:
+                    conn.executemany('UPDATE blobs SET data = ? WHERE id = ?', updates)
+                    conn.commit()
+                compressed += len(updates)
+        return compressed
+
+    def deduplicate_messages(self, batch_size=500):
+        """
+        Перенос длинных текстов ранее сохраненных сообщений в blobs.
+
+        Нужен для баз, записанных до появления дедупликации. Каждая пачка -
+        отдельная короткая транзакция.
+
+        Args:
+            batch_size (int): Количество сообщений в одной пачке
+
+        Returns:
+            int: Количество измененных сообщений
+        """
+        with self.pool.writer() as conn:
+            batches = intern_message_texts(conn, self.codec, batch_size=batch_size)
+        changed = 0
+        while True:
+            # Писатель занят только на время пачки: между пачками
+            # другие потоки сохраняют новые сообщения
+            with self.pool.writer() as conn:
+                batch_changed = next(batches, None)
+                if batch_changed is None:
+                    break
+                conn.commit()
+            changed += batch_changed
+        return changed
+
+    def create_conversation(self, title=None):
+        """
+        Создание новой беседы.
+        
+        Args:
+            title (str): Название (None - по первому сообщению)
+            
+        Returns:
+            int: ID беседы
+        """
+        now = datetime.now()
+        with self.pool.writer() as conn:
+            cursor = conn.execute('''
+                INSERT INTO conversations (title, created_at, updated_at)
+                VALUES (?, ?, ?)
+            ''', (title, now, now))
+            conn.commit()
+        return cursor.lastrowid
+
+    def list_conversations(self):
+        """
+        Получение списка бесед.
+        
+        Returns:
+            list: Кортежи (id, title, updated_at), недавно обновленные сначала
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                SELECT id, title, updated_at FROM conversations
+                ORDER BY updated_at DESC, id DESC
+            ''').fetchall()
+
+    def delete_conversation(self, conversation_id):
+        """
+        Удаление беседы вместе с ее сообщениями.
+        
+        Args:
+            conversation_id (int): ID беседы
+        """
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM messages WHERE conversation_id = ?', (conversation_id,))
+            conn.execute('DELETE FROM conversations WHERE id = ?', (conversation_id,))
+            conn.commit()
+        with self._recent_lock:
+            self._recent_pages.pop(conversation_id, None)
+
+    def get_summary(self, conversation_id):
+        """
+        Получение краткого содержания старой части беседы.
+        
+        Args:
+            conversation_id (int): ID беседы
+            
+        Returns:
+            tuple | None: (текст, ID последнего учтенного сообщения)
+                          или None, если содержания еще нет
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                SELECT summary, covered_id FROM conversation_summaries
+                WHERE conversation_id = ?
+            ''', (conversation_id,)).fetchone()
+
+    def save_summary(self, conversation_id, summary, covered_id, model):
+        """
+        Сохранение краткого содержания беседы.
+        
+        Args:
+            conversation_id (int): ID беседы
+            summary (str): Текст краткого содержания
+            covered_id (int): ID последнего учтенного сообщения
+            model (str): Модель, составившая содержание
+        """
+        with self.pool.writer() as conn:
+            # Беседа могла быть удалена, пока содержание составлялось
+            conn.execute('''
+                INSERT INTO conversation_summaries
+                    (conversation_id, summary, covered_id, model, updated_at)
+                SELECT id, ?, ?, ?, ? FROM conversations WHERE id = ?
+                ON CONFLICT (conversation_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    covered_id = excluded.covered_id,
+                    model = excluded.model,
+                    updated_at = excluded.updated_at
+            ''', (summary, covered_id, model, datetime.now(), conversation_id))
+            conn.commit()
+
+    def get_last_message_id(self):
+        """
+        Получение ID последнего сохраненного сообщения.
+
+        Returns:
+            int: Максимальный ID или 0, если история пуста
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT MAX(id) FROM messages').fetchone()[0] or 0
+
+    def iter_messages(self, after_id=0, up_to_id=None, batch_size=500):
+        """
+        Потоковое чтение сообщений по возрастанию ID.
+
+        Сообщения читаются пачками по первичному ключу: в памяти находится
+        не больше одной пачки, а между пачками база не остается заблокированной
+        на чтение, поэтому новые сообщения сохраняются во время долгого чтения.
+
+        Args:
+            after_id (int): Читать сообщения с ID больше указанного
+            up_to_id (int): Последний читаемый ID (None - до конца истории)
+            batch_size (int): Количество строк в одной пачке
+
+        Yields:
+            tuple: (id, model, user_message, ai_response, timestamp, tokens_used,
+                    conversation_id, truncated)
+        """
+        if up_to_id is None:
+            up_to_id = self.get_last_message_id()
+
+        last_id = after_id
+        while last_id < up_to_id:
+            # Соединение занято только на время чтения пачки, не между пачками
+            with self.pool.reader() as conn:
+                rows = conn.execute(f'''
+                    SELECT m.id, m.model, {MESSAGE_TEXT_COLUMNS}, m.timestamp, m.tokens_used,
+                           m.conversation_id, m.truncated
+                    FROM messages AS m {MESSAGE_BLOB_JOINS}
+                    WHERE m.id > ? AND m.id <= ?
+                    ORDER BY m.id ASC LIMIT ?
+                ''', (last_id, up_to_id, batch_size)).fetchall()
+            rows = self._decode_rows(rows)
+            if not rows:
+                break
+            yield from rows
+            last_id = rows[-1][0]
+
+    def save_analytics(self, timestamp, model, message_length, response_time, tokens_used,
+                       prompt_tokens=0, cached_tokens=0, cancelled=False, saved_tokens=0,
+                       saved_time=0.0):
         """
         Сохранение данных аналитики в базу данных.
         
@@ -145,33 +902,118 @@ class ChatCache:
             message_length (int): Длина сообщения
             response_time (float): Время ответа
             tokens_used (int): Количество использованных токенов
+            prompt_tokens (int): Количество токенов запроса
+            cached_tokens (int): Из них прочитано из кэша поставщика
+            cancelled (bool): Генерация остановлена пользователем
+            saved_tokens (int): Оценка не сгенерированных после остановки токенов
+            saved_time (float): Оценка сэкономленного времени в секундах
+            
+        Returns:
+            int: ID сохраненной записи
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.pool.writer() as conn:
+            cursor = conn.execute('''
+                INSERT INTO analytics_messages 
+                (timestamp, model, message_length, response_time, tokens_used,
+                 prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (timestamp, model, message_length, response_time, tokens_used,
+                  prompt_tokens, cached_tokens, int(cancelled), saved_tokens, saved_time))
+            conn.commit()
+        return cursor.lastrowid
+
+    def get_analytics_history(self, after_id=0):
+        """
+        Получение истории аналитики.
         
-        cursor.execute('''
-            INSERT INTO analytics_messages 
-            (timestamp, model, message_length, response_time, tokens_used)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (timestamp, model, message_length, response_time, tokens_used))
-        conn.commit()
+        Args:
+            after_id (int): Вернуть записи с ID больше указанного
+                            (0 - всю историю)
+        
+        Returns:
+            list: Кортежи (id, timestamp, model, message_length, response_time,
+                  tokens_used, prompt_tokens, cached_tokens, cancelled,
+                  saved_tokens, saved_time)
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                SELECT id, timestamp, model, message_length, response_time, tokens_used,
+                       prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time
+                FROM analytics_messages
+                WHERE id > ?
+                ORDER BY timestamp ASC
+            ''', (after_id,)).fetchall()
 
-    def get_analytics_history(self):
+    def count_analytics(self, up_to_id):
         """
-        Получение всей истории аналитики.
+        Количество записей аналитики с ID не больше указанного.
         
+        Args:
+            up_to_id (int): Последний учитываемый ID
+            
         Returns:
-            list: Список записей аналитики
+            int: Количество записей
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.pool.reader() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM analytics_messages WHERE id <= ?', (up_to_id,)
+            ).fetchone()[0]
+
+    def get_analytics_rollups(self):
+        """
+        Получение дневных сводок аналитики.
         
-        cursor.execute('''
-            SELECT timestamp, model, message_length, response_time, tokens_used
-            FROM analytics_messages
-            ORDER BY timestamp ASC
-        ''')
-        return cursor.fetchall()
+        Returns:
+            list: Кортежи (period, model, messages, message_length, response_time,
+                  tokens_used, prompt_tokens, cached_tokens, cancelled, saved_tokens,
+                  saved_time), упорядоченные по дню
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                SELECT period, model, messages, message_length, response_time, tokens_used,
+                       prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time
+                FROM analytics_rollups
+                ORDER BY period ASC
+            ''').fetchall()
+
+    def poll_changes(self):
+        """
+        Проверка изменений базы, сделанных в обход этого ChatCache.
+        
+        Изменения фиксируют другие экземпляры приложения и скрипты, работающие
+        с той же базой, а также импорт и политики хранения. Проверка сводится
+        к чтению PRAGMA data_version и не зависит от размера базы. Если база
+        изменилась, кэш последних страниц бесед в памяти сбрасывается, а
+        словари сжатия, обученные другими экземплярами, загружаются.
+        
+        Returns:
+            bool: True если база изменилась с прошлой проверки
+        """
+        version = self.pool.data_version()
+        changed = version != self._data_version
+        self._data_version = version
+        if changed:
+            self.reset_recent_pages()
+            self.reload_dictionaries()
+        return changed
+
+    def reset_recent_pages(self):
+        """
+        Сброс кэша последних страниц бесед в памяти.
+        
+        Нужен после удаления сообщений в обход ChatCache
+        (например, политиками хранения).
+        """
+        with self._recent_lock:
+            self._recent_pages.clear()
+
+    def close(self):
+        """
+        Закрытие всех соединений с базой данных.
+        
+        После закрытия кэш нельзя использовать.
+        """
+        self.pool.close()
 
     def __del__(self):
         """
@@ -180,21 +1022,23 @@ class ChatCache:
         Закрывает соединения с базой данных при уничтожении объекта,
         предотвращая утечки ресурсов.
         """
-        # Проверка наличия соединения в текущем потоке
-        if hasattr(self.local, 'connection'):
-            self.local.connection.close()  # Закрытие соединения
+        # Пул мог не создаться, если конструктор завершился ошибкой
+        if hasattr(self, 'pool'):
+            self.pool.close()
             
     def clear_history(self):
         """
         Очистка всей истории сообщений.
         
-        Удаляет все записи из таблицы messages,
+        Удаляет все записи из таблиц messages и conversations,
         эффективно очищая всю историю чата.
         """
-        conn = self.get_connection()  # Получение соединения
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM messages')  # Удаление всех записей
-        conn.commit()  # Сохранение изменений
+        with self.pool.writer() as conn:  # Получение соединения для записи
+            conn.execute('DELETE FROM messages')  # Удаление всех записей
+            conn.execute('DELETE FROM conversations')  # Удаление всех бесед
+            conn.execute('DELETE FROM blobs')  # Удаление текстов сообщений
+            conn.commit()  # Сохранение изменений
+        self.reset_recent_pages()
 
     def get_formatted_history(self):
         """
@@ -211,30 +1055,28 @@ class ChatCache:
                     "tokens_used": int      # Использовано токенов
                 }
         """
-        conn = self.get_connection()  # Получение соединения
-        cursor = conn.cursor()
-        
-        # Получение всех сообщений, отсортированных по времени
-        cursor.execute('''
-            SELECT 
-                id,
-                model,
-                user_message,
-                ai_response,
-                timestamp,
-                tokens_used
-            FROM messages 
-            ORDER BY timestamp ASC
-        ''')
+        with self.pool.reader() as conn:  # Получение соединения для чтения
+            # Получение всех сообщений, отсортированных по времени
+            rows = conn.execute(f'''
+                SELECT 
+                    m.id,
+                    m.model,
+                    {MESSAGE_TEXT_COLUMNS},
+                    m.timestamp,
+                    m.tokens_used
+                FROM messages AS m {MESSAGE_BLOB_JOINS}
+                ORDER BY m.timestamp ASC
+            ''').fetchall()
         
         # Формирование списка словарей с данными сообщений
         history = []
-        for row in cursor.fetchall():
+        decode = self.codec.decode
+        for row in rows:
             history.append({
                 "id": row[0],              # ID сообщения
                 "model": row[1],           # Использованная модель
-                "user_message": row[2],    # Сообщение пользователя
-                "ai_response": row[3],     # Ответ AI
+                "user_message": decode(row[2]),  # Сообщение пользователя
+                "ai_response": decode(row[3]),   # Ответ AI
                 "timestamp": row[4],       # Временная метка
                 "tokens_used": row[5]      # Использовано токенов
             })
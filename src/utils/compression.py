@@ -0,0 +1,183 @@
+# Импорт необходимых библиотек
+import os           # Чтение настроек из переменных окружения
+import zlib         # Сжатие, доступное во всех сборках Python
+from collections import Counter     # Подсчет частых строк для словаря zlib
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+try:
+    import zstandard   # Необязательная зависимость: более быстрое и плотное сжатие
+except ImportError:
+    zstandard = None
+
+# Коды алгоритмов в первом байте сжатого значения
+ALGORITHM_CODES = {"zlib": 1, "zstd": 2}
+
+# Максимальный размер словаря (zlib использует не более 32 КБ)
+DICTIONARY_SIZE = 32 * 1024
+
+
+class MessageCodec:
+    """
+    Прозрачное сжатие текстов сообщений для хранения в SQLite.
+
+    Короткие тексты хранятся как обычные строки (TEXT). Тексты длиннее
+    порога сжимаются и хранятся как BLOB с заголовком из двух байт:
+    код алгоритма и ID словаря (0 - без словаря). При чтении значение
+    типа bytes распаковывается, строки возвращаются без изменений, поэтому
+    базы со сжатыми и несжатыми строками читаются одинаково.
+
+    Обеспечивает:
+    - Сжатие zlib (всегда доступно) или zstd (если установлен zstandard)
+    - Обучаемые словари для повторяющихся фраз в коротких сообщениях
+    - Порог, ниже которого сообщения не сжимаются
+    """
+
+    def __init__(self, algorithm: str = "zlib", threshold: int = 512, level: int = 6):
+        """
+        Инициализация кодека.
+
+        Args:
+            algorithm (str): "zlib", "zstd" или "none" (сжатие отключено)
+            threshold (int): Минимальный размер текста в байтах для сжатия
+            level (int): Уровень сжатия
+        """
+        if algorithm == "zstd" and zstandard is None:
+            AppLogger().warning("zstandard is not installed, falling back to zlib compression")
+            algorithm = "zlib"
+        self.algorithm = algorithm if algorithm in ALGORITHM_CODES else None
+        self.threshold = threshold
+        self.level = level
+
+        self.dictionaries = {}     # ID словаря -> (алгоритм, данные)
+        self.dictionary_id = 0     # Словарь для новых записей (0 - без словаря)
+
+        # Загрузка словарей, добавленных в базу после создания кодека
+        # (например, другим процессом); вызывается при встрече неизвестного словаря
+        self.dictionary_loader = None
+
+    @classmethod
+    def from_env(cls) -> "MessageCodec":
+        """Создание кодека по настройкам MESSAGE_COMPRESSION и MESSAGE_COMPRESSION_THRESHOLD."""
+        return cls(
+            algorithm=os.getenv("MESSAGE_COMPRESSION", "zlib").lower(),
+            threshold=int(os.getenv("MESSAGE_COMPRESSION_THRESHOLD", "512"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Сжатие новых записей включено."""
+        return self.algorithm is not None
+
+    def add_dictionary(self, dictionary_id: int, algorithm: str, data: bytes):
+        """
+        Регистрация словаря, сохраненного в базе.
+
+        Словарь текущего алгоритма с наибольшим ID используется для новых записей;
+        остальные нужны только для чтения старых.
+        """
+        self.dictionaries[dictionary_id] = (algorithm, data)
+        if algorithm == self.algorithm and dictionary_id > self.dictionary_id:
+            self.dictionary_id = dictionary_id
+
+    def encode(self, text):
+        """
+        Подготовка текста к записи в базу.
+
+        Returns:
+            str | bytes: Исходная строка или сжатое значение с заголовком
+        """
+        if not self.enabled or text is None:
+            return text
+        raw = text.encode("utf-8")
+        if len(raw) < self.threshold:
+            return text
+
+        dictionary = self.dictionaries.get(self.dictionary_id, (None, None))[1]
+        if self.algorithm == "zstd":
+            compressor = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            payload = compressor.compress(raw)
+        else:
+            compressor = zlib.compressobj(self.level, zdict=dictionary) if dictionary \
+                else zlib.compressobj(self.level)
+            payload = compressor.compress(raw) + compressor.flush()
+
+        # Несжимаемые данные хранятся как есть
+        if len(payload) + 2 >= len(raw):
+            return text
+        return bytes((ALGORITHM_CODES[self.algorithm], self.dictionary_id)) + payload
+
+    def decode(self, value):
+        """
+        Чтение значения из базы.
+
+        Returns:
+            str: Текст сообщения
+
+        Raises:
+            ValueError: Если значение сжато неизвестным алгоритмом или словарем
+        """
+        if not isinstance(value, bytes):
+            return value
+
+        code, dictionary_id, payload = value[0], value[1], value[2:]
+        dictionary = None
+        if dictionary_id:
+            if dictionary_id not in self.dictionaries and self.dictionary_loader is not None:
+                self.dictionary_loader()
+            if dictionary_id not in self.dictionaries:
+                raise ValueError(f"Unknown compression dictionary: {dictionary_id}")
+            dictionary = self.dictionaries[dictionary_id][1]
+
+        if code == ALGORITHM_CODES["zlib"]:
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary \
+                else zlib.decompressobj()
+            raw = decompressor.decompress(payload) + decompressor.flush()
+        elif code == ALGORITHM_CODES["zstd"]:
+            if zstandard is None:
+                raise ValueError("Message is compressed with zstd, but zstandard is not installed")
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            raw = decompressor.decompress(payload)
+        else:
+            raise ValueError(f"Unknown compression algorithm code: {code}")
+        return raw.decode("utf-8")
+
+    def train_dictionary(self, samples: list) -> bytes:
+        """
+        Построение словаря по образцам сообщений.
+
+        Для zstd используется штатное обучение; для zlib словарь составляется
+        из самых частых строк образцов (zlib ищет совпадения в конце словаря,
+        поэтому самые частые строки записываются последними).
+
+        Args:
+            samples (list): Тексты сообщений
+
+        Returns:
+            bytes: Данные словаря (пустые, если образцов недостаточно)
+        """
+        encoded = [sample.encode("utf-8") for sample in samples if sample]
+        if not encoded:
+            return b""
+
+        if self.algorithm == "zstd":
+            try:
+                return zstandard.train_dictionary(DICTIONARY_SIZE, encoded).as_bytes()
+            except zstandard.ZstdError:
+                return b""
+
+        counts = Counter(
+            line for sample in encoded for line in sample.splitlines(keepends=True)
+            if len(line.strip()) > 3
+        )
+        lines = [line for line, count in counts.most_common() if count > 1]
+        dictionary = b""
+        for line in lines:
+            if len(dictionary) + len(line) > DICTIONARY_SIZE:
+                break
+            dictionary = line + dictionary
+        return dictionary
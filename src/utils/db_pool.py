@@ -0,0 +1,232 @@
+# Импорт необходимых библиотек
+import os           # Переменные окружения и пути к файлам
+import random       # Случайный разброс пауз между попытками записи
+import sqlite3      # Работа с базой данных SQLite
+import threading    # Соединения используются из разных потоков
+import time         # Паузы между попытками записи
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    """Ошибка вызвана блокировкой базы другим соединением."""
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+class ConnectionPool:
+    """
+    Ограниченный набор соединений с базой SQLite.
+
+    Запись идет через одно соединение, которое потоки используют по очереди.
+    Чтение - через не больше max_readers соединений только для чтения,
+    которые открываются по мере необходимости и переиспользуются любыми
+    потоками. Поэтому число открытых файлов не растет с числом потоков
+    (например, рабочих потоков пула задач asyncio), а close() закрывает
+    все соединения.
+
+    Базу одновременно могут использовать несколько процессов (например,
+    два экземпляра приложения или скрипт рядом с приложением):
+    - база работает в режиме WAL, поэтому чтение не ждет записи, а запись
+      не ждет чтения
+    - каждый блок writer() - отдельная короткая транзакция, которая сразу
+      захватывает запись (BEGIN IMMEDIATE); пока запись занята другим
+      процессом, попытки повторяются с растущими паузами до busy_timeout
+    - data_version() позволяет заметить изменения, сделанные другими
+      соединениями
+
+    Пример:
+        with pool.reader() as conn:
+            conn.execute('SELECT ...')
+        with pool.writer() as conn:
+            conn.execute('INSERT ...')
+            conn.commit()
+    """
+
+    # Настройки соединения для записи, применяемые при его открытии:
+    # - новые базы создаются с инкрементальной очисткой: освобожденные после
+    #   удаления старых записей страницы возвращаются системе небольшими
+    #   порциями (PRAGMA incremental_vacuum) без полного VACUUM. Для
+    #   существующих баз настройка ни на что не влияет, а задать ее можно
+    #   только вне транзакции и до перехода в WAL
+    # - WAL: читатели и писатель разных процессов не блокируют друг друга
+    # - synchronous = NORMAL: в режиме WAL база не повреждается при сбое,
+    #   а фиксация транзакции не ждет записи на диск
+    WRITER_PRAGMAS = (
+        "PRAGMA auto_vacuum = INCREMENTAL",
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL"
+    )
+
+    # Ожидание встроенного обработчика блокировок SQLite для писателя (в секундах).
+    # Дальше захват записи повторяется в _begin с паузами и случайным разбросом,
+    # чтобы процессы, ждущие одну блокировку, не повторяли попытки одновременно
+    WRITER_BUSY_WAIT = 0.1
+
+    # Первая и максимальная паузы между попытками захвата записи (в секундах)
+    BACKOFF_MIN = 0.01
+    BACKOFF_MAX = 0.5
+
+    def __init__(self, db_name: str, max_readers: int = None, busy_timeout: float = None):
+        """
+        Инициализация пула без открытых соединений.
+
+        Args:
+            db_name (str): Путь к файлу базы данных SQLite
+            max_readers (int): Максимум соединений для чтения
+                               (по умолчанию - DB_READ_CONNECTIONS)
+            busy_timeout (float): Время ожидания блокировки базы в секундах
+                                  (по умолчанию - DB_BUSY_TIMEOUT)
+        """
+        self.db_name = db_name
+        if busy_timeout is None:
+            busy_timeout = float(os.getenv("DB_BUSY_TIMEOUT", "10"))
+        self.busy_timeout = busy_timeout
+        if max_readers is None:
+            max_readers = int(os.getenv("DB_READ_CONNECTIONS", "4"))
+        # База в памяти существует только в своем соединении: чтение идет через писателя
+        if db_name == ":memory:":
+            max_readers = 0
+        self.max_readers = max_readers
+
+        self._writer = None
+        self._write_lock = threading.RLock()        # Писатель используется одним потоком
+        self._idle = []                             # Свободные соединения для чтения
+        self._readers = threading.BoundedSemaphore(max_readers) if max_readers else None
+        self._lock = threading.Lock()               # Защита _idle и _closed
+        self._closed = False
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        """Открытие соединения, доступного из любого потока."""
+        if read_only:
+            # Соединение для чтения не может изменить базу по ошибке
+            uri = Path(os.path.abspath(self.db_name)).as_uri() + "?mode=ro"
+            return sqlite3.connect(uri, uri=True, timeout=self.busy_timeout,
+                                   check_same_thread=False)
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout,
+                               check_same_thread=False)
+        for pragma in self.WRITER_PRAGMAS:
+            conn.execute(pragma)
+        # Дальше ожидание записи - в _begin, обработчик SQLite ждет недолго
+        conn.execute(f"PRAGMA busy_timeout = {int(self.WRITER_BUSY_WAIT * 1000)}")
+        return conn
+
+    def _check_open(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        """Соединение для записи (вызывается под _write_lock)."""
+        self._check_open()
+        if self._writer is None:
+            self._writer = self._connect(read_only=False)
+        return self._writer
+
+    def _begin(self, conn: sqlite3.Connection):
+        """
+        Начало транзакции записи.
+
+        Пока запись занята другим процессом, попытки повторяются с
+        удваивающейся паузой (со случайным разбросом) до busy_timeout.
+
+        Raises:
+            sqlite3.OperationalError: Запись не освободилась за busy_timeout
+        """
+        deadline = time.monotonic() + self.busy_timeout
+        delay = self.BACKOFF_MIN
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(min(delay * random.uniform(0.5, 1.5), max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, self.BACKOFF_MAX)
+
+    @contextmanager
+    def writer(self):
+        """
+        Транзакция записи через соединение для записи (одно на пул).
+
+        Пока блок выполняется, другие потоки ждут писателя, а другие
+        процессы - освобождения записи, поэтому блок должен быть коротким.
+        Транзакция фиксируется по окончании блока (если блок не сделал
+        это сам) и откатывается, если в блоке возникло исключение.
+
+        Yields:
+            sqlite3.Connection: Соединение для записи
+        """
+        with self._write_lock:
+            conn = self._writer_connection()
+            self._begin(conn)
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """
+        Соединение для чтения.
+
+        Если все max_readers соединений заняты, поток ждет освобождения
+        одного из них.
+
+        Yields:
+            sqlite3.Connection: Соединение только для чтения
+        """
+        if self._readers is None:
+            with self.writer() as conn:
+                yield conn
+            return
+
+        with self._readers:
+            with self._lock:
+                self._check_open()
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect(read_only=True)
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    if self._closed:
+                        conn.close()
+                    else:
+                        self._idle.append(conn)
+
+    def data_version(self) -> int:
+        """
+        Номер версии данных базы (PRAGMA data_version).
+
+        Значение меняется, когда изменения фиксирует любое другое
+        соединение - другой процесс или отдельное соединение импорта и
+        политик хранения; собственная запись пула его не меняет.
+
+        Returns:
+            int: Номер версии для сравнения с прошлым значением
+        """
+        with self._write_lock:
+            conn = self._writer_connection()
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """
+        Закрытие всех соединений.
+
+        Соединения для чтения, занятые в момент вызова, закрываются при
+        освобождении. После закрытия пул нельзя использовать.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._closed = True
+                idle, self._idle = self._idle, []
+            for conn in idle:
+                conn.close()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
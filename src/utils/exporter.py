@@ -0,0 +1,158 @@
+# Импорт необходимых библиотек
+import gzip         # Сжатие файлов экспорта
+import json         # Библиотека для работы с JSON форматом
+import os           # Работа с путями и файлами
+from datetime import datetime       # Имена файлов экспорта
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+# Поддерживаемые форматы экспорта: имя -> расширение файла
+EXPORT_FORMATS = {
+    "jsonl": ".jsonl",      # Одно сообщение JSON на строку (NDJSON)
+    "markdown": ".md",      # Читаемый Markdown-документ
+}
+
+
+class ChatExporter:
+    """
+    Потоковый экспорт истории чата в файл.
+
+    Сообщения читаются из ChatCache пачками и сразу записываются в файл,
+    поэтому расход памяти не зависит от размера истории. Экспорт рассчитан
+    на выполнение в рабочем потоке и сообщает о прогрессе через callback.
+
+    Обеспечивает:
+    - Форматы NDJSON и Markdown, с необязательным сжатием gzip
+    - Инкрементальный экспорт только новых сообщений с прошлого экспорта
+    - Запись во временный файл: прерванный экспорт не оставляет неполных файлов
+    """
+    # Количество сообщений, читаемых из базы за один запрос
+    BATCH_SIZE = 500
+
+    # Файл с ID последнего экспортированного сообщения
+    STATE_FILE = "export_state.json"
+
+    def __init__(self, cache, exports_dir: str = "exports"):
+        """
+        Инициализация экспорта.
+
+        Args:
+            cache (ChatCache): Хранилище истории сообщений
+            exports_dir (str): Директория для файлов экспорта
+        """
+        self.cache = cache
+        self.exports_dir = exports_dir
+        self.logger = AppLogger()
+
+    def export(self, fmt: str = "jsonl", compress: bool = False,
+               incremental: bool = False, on_progress=None) -> dict:
+        """
+        Экспорт истории в новый файл.
+
+        Экспортируются сообщения, сохраненные до начала экспорта; сообщения,
+        добавленные во время экспорта, попадут в следующий инкрементальный.
+
+        Args:
+            fmt (str): Формат файла ("jsonl" или "markdown")
+            compress (bool): Сжимать файл gzip
+            incremental (bool): Экспортировать только сообщения после прошлого экспорта
+            on_progress (callable): Функция progress(доля от 0 до 1),
+                                    вызывается из потока экспорта
+
+        Returns:
+            dict: {"path": путь к файлу или None, если экспортировать нечего,
+                   "messages": количество сообщений}
+
+        Raises:
+            ValueError: Если формат не поддерживается
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        after_id = self._load_state().get("last_id", 0) if incremental else 0
+        up_to_id = self.cache.get_last_message_id()
+        if up_to_id <= after_id:
+            return {"path": None, "messages": 0}
+
+        os.makedirs(self.exports_dir, exist_ok=True)
+        suffix = "_new" if incremental else ""
+        filename = (
+            f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+            f"{EXPORT_FORMATS[fmt]}{'.gz' if compress else ''}"
+        )
+        path = os.path.join(self.exports_dir, filename)
+        temp_path = path + ".part"
+
+        write_row = write_jsonl_row if fmt == "jsonl" else _write_markdown_row
+        titles = {row[0]: row[1] for row in self.cache.list_conversations()}
+        span = up_to_id - after_id
+        count = 0
+        try:
+            with _open_output(temp_path, compress) as f:
+                if fmt == "markdown":
+                    f.write("# История чата\n\n")
+                for row in self.cache.iter_messages(after_id, up_to_id, self.BATCH_SIZE):
+                    write_row(f, row, titles.get(row[6]))
+                    count += 1
+                    # Прогресс считается по ID, а не по COUNT(*), который
+                    # потребовал бы полного прохода по таблице
+                    if on_progress and count % self.BATCH_SIZE == 0:
+                        on_progress((row[0] - after_id) / span)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._save_state({"last_id": up_to_id})
+        if on_progress:
+            on_progress(1.0)
+        self.logger.info(f"Exported {count} messages to {path}")
+        return {"path": path, "messages": count}
+
+    def _load_state(self) -> dict:
+        """Чтение состояния инкрементального экспорта."""
+        try:
+            with open(os.path.join(self.exports_dir, self.STATE_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: dict):
+        """Сохранение состояния инкрементального экспорта."""
+        with open(os.path.join(self.exports_dir, self.STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+
+def _open_output(path: str, compress: bool):
+    """Открытие файла экспорта на запись (с буферизацией, при необходимости - gzip)."""
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8", buffering=1024 * 1024)
+
+
+def write_jsonl_row(f, row, title):
+    """Запись сообщения одной строкой JSON (формат экспорта и архивов хранения)."""
+    row_id, model, user_message, ai_response, timestamp, tokens_used, conversation_id, truncated = row
+    f.write(json.dumps({
+        "id": row_id,
+        "conversation_id": conversation_id,
+        "conversation": title,
+        "timestamp": timestamp,
+        "model": model,
+        "user_message": user_message,
+        "ai_response": ai_response,
+        "tokens_used": tokens_used,
+        "truncated": bool(truncated)
+    }, ensure_ascii=False, default=str))
+    f.write("\n")
+
+
+def _write_markdown_row(f, row, title):
+    """Запись сообщения разделом Markdown-документа."""
+    _, model, user_message, ai_response, timestamp, tokens_used, _, truncated = row
+    f.write(f"## {timestamp} · {model}" + (f" · {title}" if title else "") + "\n\n")
+    f.write(f"**Пользователь:**\n\n{user_message}\n\n")
+    f.write(f"**AI:**\n\n{ai_response}\n\n")
+    if truncated:
+        f.write("*Генерация остановлена*\n\n")
+    f.write(f"*Токенов: {tokens_used}*\n\n---\n\n")
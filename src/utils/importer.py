@@ -0,0 +1,459 @@
+# Импорт необходимых библиотек
+import gzip         # Чтение сжатых файлов экспорта
+import json         # Библиотека для работы с JSON форматом
+import os           # Имена файлов для названий бесед
+import sqlite3      # Библиотека для работы с SQLite базой данных
+from datetime import datetime       # Время для записей без временной метки
+from utils.cache import (   # Хеш содержимого и хранение длинных текстов в blobs
+    message_hash, intern_text, intern_message_texts
+)
+from utils.compression import MessageCodec  # Чтение сжатых текстов базы-источника
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+# Колонки сообщения, переносимые из временной таблицы в messages
+_COLUMNS = (
+    "model, user_message, ai_response, timestamp, tokens_used, content_hash, user_blob, ai_blob,"
+    " truncated"
+)
+
+# Колонки временной таблицы: сообщение и беседа, к которой оно относилось в источнике
+_STAGING_COLUMNS = _COLUMNS + ", conversation_key, conversation_title"
+
+# Колонки таблицы аналитики
+_ANALYTICS_COLUMNS = (
+    "timestamp, model, message_length, response_time, tokens_used, prompt_tokens, cached_tokens,"
+    " cancelled, saved_tokens, saved_time"
+)
+
+# Колонки дневных сводок аналитики
+_ROLLUP_COLUMNS = (
+    "period, model, messages, message_length, response_time, tokens_used,"
+    " prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time"
+)
+
+
+class ChatImporter:
+    """
+    Массовый импорт истории чата в ChatCache.
+
+    Строки загружаются пачками через executemany во временную таблицу без
+    индексов, дубликаты удаляются одним запросом по хешу содержимого, после
+    чего новые сообщения переносятся в messages одним INSERT ... SELECT.
+    Весь импорт выполняется в одной транзакции: при ошибке база не меняется.
+
+    Обеспечивает:
+    - Импорт файлов экспорта: JSON-массив (старый формат) и JSON Lines, в том числе .gz
+    - Объединение с другой базой chat_cache.db (сообщения и аналитика)
+    - Пропуск сообщений, которые уже есть в базе или повторяются в файле
+    - Перенос бесед источника как новых бесед (без смешивания с существующими)
+    - Перестроение индексов после загрузки вместо обновления на каждую строку
+    """
+    # Количество строк в одном вызове executemany
+    BATCH_SIZE = 50_000
+
+    # При импорте стольких новых строк индексы удаляются и строятся заново:
+    # одна сортировка быстрее, чем вставка каждой строки в индекс
+    INDEX_REBUILD_ROWS = 100_000
+
+    def __init__(self, cache):
+        """
+        Инициализация импорта.
+
+        Args:
+            cache (ChatCache): Хранилище истории сообщений
+        """
+        self.cache = cache
+        self.logger = AppLogger()
+
+    def import_file(self, path: str, on_progress=None) -> dict:
+        """
+        Импорт файла экспорта (JSON или JSON Lines, при необходимости .gz).
+
+        Args:
+            path (str): Путь к файлу
+            on_progress (callable): Функция progress(прочитано строк),
+                                    вызывается из потока импорта
+
+        Returns:
+            dict: {"read": прочитано, "imported": добавлено, "duplicates": пропущено}
+
+        Raises:
+            ValueError: Если файл имеет неподдерживаемый формат
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_staging(conn)
+                read = 0
+                rows = self._intern_records(conn, _read_records(path))
+                for batch in _batches(rows, self.BATCH_SIZE):
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO import_staging ({_STAGING_COLUMNS}) "
+                        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch
+                    )
+                    read += len(batch)
+                    if on_progress:
+                        on_progress(read)
+                imported = self._merge_staging(conn, _import_title(path))
+                # Тексты, записанные только для пропущенных дубликатов
+                conn.execute("DELETE FROM main.blobs WHERE refcount = 0")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        result = {"read": read, "imported": imported, "duplicates": read - imported}
+        self.logger.info(f"Imported {path}: {result}")
+        return result
+
+    def import_database(self, path: str) -> dict:
+        """
+        Объединение с другой базой данных приложения.
+
+        Переносятся сообщения (без дубликатов) и записи аналитики,
+        которых еще нет в текущей базе; дневные сводки аналитики
+        складываются с имеющимися.
+
+        Args:
+            path (str): Путь к файлу базы chat_cache.db
+
+        Returns:
+            dict: {"read", "imported", "duplicates", "analytics_imported"}
+        """
+        conn = self._connect()
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (path,))
+            source_columns = [
+                row[1] for row in conn.execute("PRAGMA source.table_info(messages)")
+            ]
+            if not source_columns:
+                raise ValueError(f"No messages table in {path}")
+
+            # В базах старых версий хеша и бесед нет - хеш вычисляется при переносе,
+            # а все сообщения попадают в одну беседу
+            source_hash = "m.content_hash" if "content_hash" in source_columns else "NULL"
+            has_conversations = "conversation_id" in source_columns
+            source_key = (
+                "COALESCE(CAST(m.conversation_id AS TEXT), '')" if has_conversations else "''"
+            )
+            source_title = "c.title" if has_conversations else "NULL"
+            source_truncated = "m.truncated" if "truncated" in source_columns else "0"
+            source_join = (
+                "LEFT JOIN source.conversations AS c ON c.id = m.conversation_id"
+                if has_conversations else ""
+            )
+
+            # Длинные тексты новых баз хранятся в blobs источника
+            source_user_text, source_ai_text, source_blob_join = "m.user_message", "m.ai_response", ""
+            if "user_blob" in source_columns:
+                source_user_text = "COALESCE(m.user_message, ub.data)"
+                source_ai_text = "COALESCE(m.ai_response, ab.data)"
+                source_blob_join = (
+                    "LEFT JOIN source.blobs AS ub ON ub.id = m.user_blob "
+                    "LEFT JOIN source.blobs AS ab ON ab.id = m.ai_blob"
+                )
+
+            # Тексты источника распаковываются его словарями; сжатие настройками
+            # текущей базы и перенос в blobs выполняются после объединения
+            source_codec = MessageCodec(algorithm="none")
+            if conn.execute(
+                "SELECT 1 FROM source.sqlite_master WHERE type = 'table' "
+                "AND name = 'compression_dictionaries'"
+            ).fetchone():
+                for dictionary_id, algorithm, data in conn.execute(
+                    "SELECT id, algorithm, data FROM source.compression_dictionaries"
+                ):
+                    source_codec.add_dictionary(dictionary_id, algorithm, data)
+            conn.create_function("source_text", 1, source_codec.decode, deterministic=True)
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_staging(conn)
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO import_staging ({_STAGING_COLUMNS})
+                    SELECT m.model,
+                           source_text({source_user_text}),
+                           source_text({source_ai_text}),
+                           m.timestamp, m.tokens_used,
+                           COALESCE({source_hash}, message_hash(
+                               m.model, source_text({source_user_text}),
+                               source_text({source_ai_text}), m.timestamp
+                           )),
+                           NULL, NULL, {source_truncated},
+                           {source_key}, {source_title}
+                    FROM source.messages AS m {source_join} {source_blob_join}
+                    ORDER BY m.id
+                ''')
+                read = conn.execute("SELECT COUNT(*) FROM source.messages").fetchone()[0]
+                last_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM main.messages").fetchone()[0]
+                imported = self._merge_staging(conn, _import_title(path))
+                # Длинные тексты перенесенных сообщений - в blobs, короткие сжимаются на месте
+                for _ in intern_message_texts(conn, self.cache.codec, after_id=last_id):
+                    pass
+
+                analytics_imported = 0
+                if conn.execute(
+                    "SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = 'analytics_messages'"
+                ).fetchone():
+                    cursor = conn.execute(f'''
+                        INSERT INTO main.analytics_messages ({_ANALYTICS_COLUMNS})
+                        SELECT {_source_columns(conn, "analytics_messages", _ANALYTICS_COLUMNS)}
+                        FROM source.analytics_messages
+                        EXCEPT
+                        SELECT {_ANALYTICS_COLUMNS} FROM main.analytics_messages
+                    ''')
+                    analytics_imported = cursor.rowcount
+
+                # Дневные сводки старой аналитики складываются с имеющимися
+                if conn.execute(
+                    "SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = 'analytics_rollups'"
+                ).fetchone():
+                    conn.execute(f'''
+                        INSERT INTO main.analytics_rollups ({_ROLLUP_COLUMNS})
+                        SELECT {_source_columns(conn, "analytics_rollups", _ROLLUP_COLUMNS)}
+                        FROM source.analytics_rollups WHERE true
+                        ON CONFLICT (period, model) DO UPDATE SET
+                            messages = messages + excluded.messages,
+                            message_length = message_length + excluded.message_length,
+                            response_time = response_time + excluded.response_time,
+                            tokens_used = tokens_used + excluded.tokens_used,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            cached_tokens = cached_tokens + excluded.cached_tokens,
+                            cancelled = cancelled + excluded.cancelled,
+                            saved_tokens = saved_tokens + excluded.saved_tokens,
+                            saved_time = saved_time + excluded.saved_time
+                    ''')
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("DETACH DATABASE source")
+        finally:
+            conn.close()
+
+        result = {
+            "read": read,
+            "imported": imported,
+            "duplicates": read - imported,
+            "analytics_imported": analytics_imported
+        }
+        self.logger.info(f"Imported database {path}: {result}")
+        return result
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Отдельное соединение для импорта с явным управлением транзакциями.
+
+        Соединение не входит в пул соединений ChatCache и
+        закрывается по окончании импорта.
+        """
+        # Запись захватывается в начале транзакции (BEGIN IMMEDIATE): пока ее
+        # держит другой процесс, импорт ждет до DB_BUSY_TIMEOUT, а не прерывается
+        # посреди транзакции
+        conn = sqlite3.connect(self.cache.db_name, isolation_level=None,
+                               timeout=self.cache.pool.busy_timeout)
+        decode = self.cache.codec.decode
+
+        # Хеш считается по распакованным текстам
+        conn.create_function(
+            "message_hash", 4,
+            lambda model, user_message, ai_response, timestamp: message_hash(
+                model, decode(user_message), decode(ai_response), timestamp
+            ),
+            deterministic=True
+        )
+        conn.execute("PRAGMA cache_size = -65536")   # 64 МБ кэша страниц на время импорта
+        return conn
+
+    def _intern_records(self, conn, records):
+        """
+        Подготовка текстов записей файла к загрузке: длинные тексты
+        сохраняются в blobs (по одному экземпляру), короткие сжимаются.
+
+        Yields:
+            tuple: Строка временной таблицы в порядке _STAGING_COLUMNS
+        """
+        codec = self.cache.codec
+        known = {}
+        for model, user_message, ai_response, timestamp, tokens_used, content_hash, truncated, \
+                *conversation in records:
+            user_text, user_blob = intern_text(conn, codec, user_message, known)
+            ai_text, ai_blob = intern_text(conn, codec, ai_response, known)
+            yield (model, user_text, ai_text, timestamp, tokens_used, content_hash,
+                   user_blob, ai_blob, truncated, *conversation)
+
+    def _create_staging(self, conn):
+        """
+        Создание временной таблицы для загружаемых строк.
+
+        Уникальный индекс по хешу отбрасывает повторы внутри импортируемых
+        данных прямо при загрузке (INSERT OR IGNORE).
+        """
+        conn.execute(f"CREATE TEMP TABLE import_staging ({_STAGING_COLUMNS})")
+        conn.execute(
+            "CREATE UNIQUE INDEX temp.idx_import_staging_hash ON import_staging(content_hash)"
+        )
+
+    def _merge_staging(self, conn, default_title: str) -> int:
+        """
+        Перенос новых строк из временной таблицы в messages.
+
+        Для каждой беседы источника создается новая беседа; сообщения
+        без беседы попадают в беседу с названием default_title.
+
+        Args:
+            conn (sqlite3.Connection): Соединение импорта
+            default_title (str): Название беседы для сообщений без беседы
+
+        Returns:
+            int: Количество добавленных сообщений
+        """
+        # Строки без хеша в базе (записанные старыми версиями) хешируются,
+        # чтобы дубликаты среди них тоже были найдены
+        conn.execute('''
+            UPDATE main.messages
+            SET content_hash = message_hash(model, user_message, ai_response, timestamp)
+            WHERE content_hash IS NULL
+        ''')
+
+        # Сообщения, которые уже есть в базе (поиск по индексу хеша)
+        conn.execute('''
+            DELETE FROM import_staging WHERE EXISTS (
+                SELECT 1 FROM main.messages
+                WHERE main.messages.content_hash = import_staging.content_hash
+            )
+        ''')
+
+        new_rows = conn.execute("SELECT COUNT(*) FROM import_staging").fetchone()[0]
+        if not new_rows:
+            return 0
+
+        # Индексы удаляются внутри транзакции: при ошибке они вернутся при откате
+        indexes = []
+        if new_rows >= self.INDEX_REBUILD_ROWS:
+            indexes = conn.execute('''
+                SELECT name, sql FROM main.sqlite_master
+                WHERE type = 'index' AND tbl_name = 'messages' AND sql IS NOT NULL
+            ''').fetchall()
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX main."{name}"')
+
+        # Новые беседы: по одной на каждую беседу источника
+        conn.execute('''
+            CREATE TEMP TABLE import_conversations (
+                conversation_key TEXT PRIMARY KEY,
+                conversation_id INTEGER
+            )
+        ''')
+        groups = conn.execute('''
+            SELECT conversation_key, MAX(conversation_title), MIN(timestamp), MAX(timestamp)
+            FROM import_staging GROUP BY conversation_key
+        ''').fetchall()
+        for key, title, first, last in groups:
+            cursor = conn.execute('''
+                INSERT INTO main.conversations (title, created_at, updated_at)
+                VALUES (?, ?, ?)
+            ''', (title or default_title, first, last))
+            conn.execute(
+                "INSERT INTO import_conversations VALUES (?, ?)", (key, cursor.lastrowid)
+            )
+
+        staged = ", ".join(f"s.{column.strip()}" for column in _COLUMNS.split(","))
+        conn.execute(f'''
+            INSERT INTO main.messages ({_COLUMNS}, conversation_id)
+            SELECT {staged}, c.conversation_id
+            FROM import_staging AS s
+            -- CROSS JOIN фиксирует порядок: строки читаются подряд,
+            -- беседа находится по первичному ключу
+            CROSS JOIN import_conversations AS c ON c.conversation_key = s.conversation_key
+            ORDER BY s.rowid
+        ''')
+
+        for _, sql in indexes:
+            conn.execute(sql)
+
+        # Временная таблица удаляется вместе с соединением импорта
+        return new_rows
+
+
+def _read_records(path: str):
+    """
+    Чтение сообщений из файла экспорта.
+
+    JSON Lines читается построчно; JSON-массив (формат старых версий)
+    загружается целиком.
+
+    Yields:
+        tuple: (model, user_message, ai_response, timestamp, tokens_used,
+                content_hash, truncated, conversation_key, conversation_title)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        # Формат определяется по первому значащему символу файла
+        first = ""
+        while not first:
+            chunk = f.read(1)
+            if not chunk:
+                return
+            first = chunk.strip()
+        f.seek(0)
+
+        if first == "[":
+            records = json.load(f)
+        elif first == "{":
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            raise ValueError(f"Unsupported import file format: {path}")
+
+        for record in records:
+            if isinstance(record, dict):
+                yield _record_row(record)
+
+
+def _record_row(record: dict) -> tuple:
+    """Преобразование записи экспорта в строку временной таблицы."""
+    model = record.get("model")
+    user_message = record.get("user_message") or ""
+    ai_response = record.get("ai_response") or ""
+    timestamp = record.get("timestamp") or str(datetime.now())
+    tokens_used = int(record.get("tokens_used") or 0)
+    conversation_id = record.get("conversation_id")
+    return (model, user_message, ai_response, timestamp, tokens_used,
+            message_hash(model, user_message, ai_response, timestamp),
+            int(bool(record.get("truncated"))),
+            "" if conversation_id is None else str(conversation_id),
+            record.get("conversation"))
+
+
+def _import_title(path: str) -> str:
+    """Название беседы для импортированных сообщений без беседы."""
+    return f"Импорт: {os.path.basename(path)}"
+
+
+def _batches(rows, size: int):
+    """Разбиение потока строк на списки заданного размера."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _source_columns(conn, table: str, columns: str) -> str:
+    """
+    Список колонок для чтения из таблицы базы-источника.
+
+    Колонки, которых нет в базах старых версий, заменяются нулями.
+    """
+    existing = {row[1] for row in conn.execute(f"PRAGMA source.table_info({table})")}
+    return ", ".join(
+        column if column in existing else f"0 AS {column}"
+        for column in (name.strip() for name in columns.split(","))
+    )
@@ -23,7 +23,18 @@ class AppLogger:
         - Форматирование сообщений
         - Обработчики для файла и консоли
         - Уровни логирования
+
+        Все экземпляры пишут в один логгер 'ChatApp', поэтому обработчики
+        добавляются только при создании первого экземпляра: иначе каждый
+        новый экземпляр открывал бы еще один файл, а каждая строка лога
+        выводилась бы столько раз, сколько экземпляров создано.
         """
+        # Получение общего логгера приложения
+        self.logger = logging.getLogger('ChatApp')  # Создание логгера с именем
+        if self.logger.handlers:
+            # Логгер уже настроен другим экземпляром
+            return
+
         # Создание директории для хранения файлов логов
         self.logs_dir = "logs"
         if not os.path.exists(self.logs_dir):
@@ -53,7 +64,6 @@ class AppLogger:
         console_handler.setFormatter(formatter)  # Установка того же форматирования
         
         # Настройка основного логгера приложения
-        self.logger = logging.getLogger('ChatApp')  # Создание логгера с именем
         self.logger.setLevel(logging.DEBUG)         # Установка уровня логирования
         self.logger.addHandler(file_handler)        # Добавление файлового обработчика
         self.logger.addHandler(console_handler)     # Добавление консольного обработчика
@@ -1,5 +1,5 @@
 # Импорт необходимых библиотек
-import psutil      # Библиотека для мониторинга системных ресурсов (CPU, память, потоки)
+import os          # Переменные окружения с настройками
 import time        # Библиотека для работы с временными метками и измерения интервалов
 from datetime import datetime  # Библиотека для работы с датой и временем
 import threading   # Библиотека для работы с потоками
@@ -14,9 +14,12 @@ class PerformanceMonitor:
     - Количество активных потоков
     - Время работы приложения
     - Общее состояние системы
+
+    Библиотека psutil загружается при первом замере, а при выключенном
+    мониторинге (PERFORMANCE_MONITORING=False) не загружается совсем.
     """
     
-    def __init__(self):
+    def __init__(self, enabled: bool = None):
         """
         Инициализация системы мониторинга производительности.
         
@@ -25,10 +28,16 @@ class PerformanceMonitor:
         - Хранилище истории метрик
         - Отслеживание текущего процесса
         - Пороговые значения для метрик
+
+        Args:
+            enabled (bool): Сбор метрик включен (по умолчанию - PERFORMANCE_MONITORING)
         """
+        if enabled is None:
+            enabled = os.getenv("PERFORMANCE_MONITORING", "True").lower() == "true"
+        self.enabled = enabled
         self.start_time = time.time()  # Сохранение времени запуска для расчета uptime
         self.metrics_history = []      # Список для хранения истории метрик
-        self.process = psutil.Process()  # Получение объекта текущего процесса
+        self._process = None           # Объект текущего процесса, создается при первом замере
         
         # Пороговые значения для определения проблем с производительностью
         self.thresholds = {
@@ -37,6 +46,14 @@ class PerformanceMonitor:
             'thread_count': 50      # Максимально допустимое количество потоков
         }
 
+    @property
+    def process(self):
+        """Объект текущего процесса psutil (библиотека загружается при первом обращении)."""
+        if self._process is None:
+            import psutil  # Библиотека для мониторинга системных ресурсов (CPU, память, потоки)
+            self._process = psutil.Process()
+        return self._process
+
     def get_metrics(self) -> dict:
         """
         Получение текущих метрик производительности.
@@ -50,8 +67,15 @@ class PerformanceMonitor:
                 - uptime: время работы приложения
                 
         Note:
-            В случае ошибки возвращает словарь с ключом 'error'
+            В случае ошибки или при выключенном мониторинге
+            возвращает словарь с ключом 'error'
         """
+        if not self.enabled:
+            return {
+                'error': 'Performance monitoring is disabled',
+                'timestamp': datetime.now()
+            }
+
         try:
             # Сбор текущих метрик производительности
             metrics = {
@@ -164,6 +188,9 @@ class PerformanceMonitor:
         Args:
             logger: Объект логгера для записи информации
         """
+        if not self.enabled:
+            return
+
         metrics = self.get_metrics()   # Получение текущих метрик
         health = self.check_health()   # Проверка состояния системы
         
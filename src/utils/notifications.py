@@ -1,7 +1,7 @@
 import os
 import logging
+import threading
 from dotenv import load_dotenv
-import requests
 from typing import Optional
 
 # Настройка логирования
@@ -79,6 +79,8 @@ class TelegramNotifier:
 
     def _send_telegram_message(self, message: str) -> bool:
         """Внутренняя функция отправки сообщения в Telegram"""
+        import requests  # Загружается только при отправке уведомления
+
         try:
             url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
             
@@ -102,8 +104,30 @@ class TelegramNotifier:
             logger.error(f"Unexpected error sending Telegram notification: {e}")
             return False
 
-# Синглтон экземпляр для использования во всем приложении
-telegram_notifier = TelegramNotifier()
+# Общий экземпляр создается при первом уведомлении, а не при импорте модуля
+_notifier = None
+_notifier_lock = threading.Lock()
+
+def get_notifier() -> Optional[TelegramNotifier]:
+    """
+    Общий экземпляр для использования во всем приложении
+    
+    Returns:
+        TelegramNotifier | None: Экземпляр или None, если TELEGRAM_BOT_TOKEN
+                                 и TELEGRAM_CHAT_ID не заданы
+    """
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = TelegramNotifier()
+    return _notifier if _notifier.is_configured else None
+
+def __getattr__(name):
+    # Совместимость с прежним синглтоном telegram_notifier
+    if name == "telegram_notifier":
+        get_notifier()
+        return _notifier
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def check_and_notify_low_balance(balance: float, threshold: float = 1.0) -> bool:
     """
@@ -116,12 +140,15 @@ def check_and_notify_low_balance(balance: float, threshold: float = 1.0) -> bool
     Returns:
         bool: True если уведомление отправлено, False если нет
     """
-    return telegram_notifier.send_low_balance_notification(balance, threshold)
+    notifier = get_notifier()
+    return notifier.send_low_balance_notification(balance, threshold) if notifier else False
 
 def notify_startup(version: str = "1.0.0") -> bool:
     """Отправляет уведомление о запуске приложения"""
-    return telegram_notifier.send_startup_notification(version)
+    notifier = get_notifier()
+    return notifier.send_startup_notification(version) if notifier else False
 
 def notify_error(error_message: str) -> bool:
     """Отправляет уведомление об ошибке"""
-    return telegram_notifier.send_error_notification(error_message)
\ No newline at end of file
+    notifier = get_notifier()
+    return notifier.send_error_notification(error_message) if notifier else False
\ No newline at end of file
@@ -0,0 +1,395 @@
+# Импорт необходимых библиотек
+import gzip         # Сжатие архивных файлов
+import os           # Переменные окружения и работа с файлами
+import sqlite3      # Библиотека для работы с SQLite базой данных
+import threading    # Фоновое выполнение очистки
+import time         # Паузы между пачками удалений
+from datetime import datetime, timedelta  # Расчет границы хранения по возрасту
+from utils.cache import MESSAGE_TEXT_COLUMNS, MESSAGE_BLOB_JOINS  # Чтение текстов из blobs
+from utils.exporter import write_jsonl_row  # Архив пишется в формате экспорта
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+# Примерный размер строки таблицы в байтах (с учетом служебных колонок и индексов),
+# по которому лимит размера переводится в количество строк. Тексты в blobs
+# общие для многих сообщений и в размер строки не входят
+_ROW_SIZE = {
+    "messages": "IFNULL(length(CAST(user_message AS BLOB)), 0)"
+                " + IFNULL(length(CAST(ai_response AS BLOB)), 0) + 150",
+    "analytics_messages": "80",
+}
+
+
+class RetentionPolicy:
+    """
+    Лимиты хранения записей одной таблицы.
+
+    Запись устаревает, если нарушает хотя бы один из заданных лимитов.
+    Незаданный лимит (None) не применяется.
+    """
+
+    def __init__(self, max_age_days: float = None, max_rows: int = None, max_bytes: int = None):
+        """
+        Инициализация политики.
+
+        Args:
+            max_age_days (float): Максимальный возраст записи в днях
+            max_rows (int): Максимальное количество хранимых записей
+            max_bytes (int): Максимальный примерный объем таблицы в байтах
+        """
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "RetentionPolicy":
+        """
+        Создание политики по переменным окружения <prefix>_DAYS,
+        <prefix>_ROWS и <prefix>_MB. Пустые значения - лимит не задан.
+        """
+        days = os.getenv(f"{prefix}_DAYS")
+        rows = os.getenv(f"{prefix}_ROWS")
+        megabytes = os.getenv(f"{prefix}_MB")
+        return cls(
+            max_age_days=float(days) if days else None,
+            max_rows=int(rows) if rows else None,
+            max_bytes=int(float(megabytes) * 1024 * 1024) if megabytes else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Задан хотя бы один лимит."""
+        return any(limit is not None for limit in (self.max_age_days, self.max_rows, self.max_bytes))
+
+
+class RetentionManager:
+    """
+    Применение политик хранения к базе ChatCache.
+
+    Устаревшие сообщения сначала записываются в сжатый архив (JSON Lines
+    в формате экспорта, его можно загрузить обратно импортом), затем
+    удаляются. Устаревшие записи аналитики сворачиваются в дневные сводки
+    analytics_rollups, поэтому общая статистика по моделям не меняется.
+    Удаление идет небольшими пачками в отдельных коротких транзакциях,
+    после чего освободившееся место возвращается через incremental_vacuum.
+
+    Обеспечивает:
+    - Лимиты по возрасту, количеству строк и размеру для каждой таблицы
+    - Архивацию сообщений перед удалением
+    - Выполнение в фоновом потоке без долгих блокировок базы
+    """
+    # Количество строк, удаляемых в одной транзакции
+    BATCH_SIZE = 500
+
+    # Пауза между пачками, чтобы запись новых сообщений не ждала очистку
+    BATCH_PAUSE = 0.05
+
+    # Количество страниц, освобождаемых одним вызовом incremental_vacuum
+    VACUUM_PAGES = 256
+
+    # Количество последних строк, по которым оценивается размер строки
+    SIZE_SAMPLE_ROWS = 1000
+
+    def __init__(self, cache, archive_dir: str = "archive", messages: RetentionPolicy = None,
+                 analytics: RetentionPolicy = None):
+        """
+        Инициализация очистки.
+
+        Args:
+            cache (ChatCache): Хранилище истории сообщений
+            archive_dir (str): Директория для архивов удаленных сообщений
+            messages (RetentionPolicy): Политика для messages
+                                        (по умолчанию - из RETENTION_MESSAGES_*)
+            analytics (RetentionPolicy): Политика для analytics_messages
+                                         (по умолчанию - из RETENTION_ANALYTICS_*)
+        """
+        self.cache = cache
+        self.archive_dir = archive_dir
+        self.messages_policy = messages or RetentionPolicy.from_env("RETENTION_MESSAGES")
+        self.analytics_policy = analytics or RetentionPolicy.from_env("RETENTION_ANALYTICS")
+        self.logger = AppLogger()
+
+        self._run_lock = threading.Lock()   # Не больше одной очистки одновременно
+        self._stopped = threading.Event()   # Остановка фонового потока
+
+    @property
+    def enabled(self) -> bool:
+        """Задана хотя бы одна политика."""
+        return self.messages_policy.enabled or self.analytics_policy.enabled
+
+    def start(self, interval: float = 6 * 3600) -> threading.Thread:
+        """
+        Запуск периодической очистки в фоновом потоке.
+
+        Первая очистка выполняется сразу, следующие - через interval секунд.
+
+        Args:
+            interval (float): Интервал между очистками в секундах
+
+        Returns:
+            threading.Thread: Запущенный поток
+        """
+        def worker():
+            while not self._stopped.is_set():
+                try:
+                    self.run()
+                except Exception as e:
+                    self.logger.error(f"Retention run failed: {e}")
+                self._stopped.wait(interval)
+
+        self._stopped.clear()
+        thread = threading.Thread(target=worker, name="retention", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Остановка фонового потока после текущей очистки."""
+        self._stopped.set()
+
+    def run(self) -> dict:
+        """
+        Однократное применение политик.
+
+        Returns:
+            dict: {"messages_archived": удалено сообщений,
+                   "archive": путь к архиву или None,
+                   "analytics_rolled_up": свернуто записей аналитики,
+                   "pages_freed": возвращено страниц файла базы}
+        """
+        with self._run_lock:
+            conn = sqlite3.connect(self.cache.db_name, isolation_level=None, timeout=30)
+            try:
+                archived, archive = self._archive_messages(conn)
+                rolled_up = self._rollup_analytics(conn)
+                freed = self._incremental_vacuum(conn) if archived or rolled_up else 0
+            finally:
+                conn.close()
+
+        if archived:
+            # Страницы бесед в памяти могли содержать удаленные сообщения
+            self.cache.reset_recent_pages()
+        result = {
+            "messages_archived": archived,
+            "archive": archive,
+            "analytics_rolled_up": rolled_up,
+            "pages_freed": freed
+        }
+        if archived or rolled_up:
+            self.logger.info(f"Retention run finished: {result}")
+        return result
+
+    def _expired_condition(self, conn, table: str, policy: RetentionPolicy):
+        """
+        Условие SQL для устаревших записей таблицы.
+
+        Границы вычисляются один раз в начале очистки: записи, добавленные
+        позже (ID больше текущего максимума), не затрагиваются.
+
+        Returns:
+            tuple | None: (условие, параметры) или None, если удалять нечего
+        """
+        if not policy.enabled:
+            return None
+        up_to_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+        if up_to_id is None:
+            return None
+
+        conditions = []
+        params = []
+
+        # Лимит размера переводится в количество строк по среднему размеру последних строк
+        keep = policy.max_rows
+        if policy.max_bytes is not None:
+            average = conn.execute(f'''
+                SELECT AVG({_ROW_SIZE[table]}) FROM (
+                    SELECT * FROM {table} ORDER BY id DESC LIMIT ?
+                )
+            ''', (self.SIZE_SAMPLE_ROWS,)).fetchone()[0]
+            if average:
+                by_size = int(policy.max_bytes // average)
+                keep = by_size if keep is None else min(keep, by_size)
+        if keep is not None:
+            # ID первой строки, не входящей в keep последних
+            boundary = conn.execute(
+                f"SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?", (keep,)
+            ).fetchone()
+            if boundary:
+                conditions.append("id <= ?")
+                params.append(boundary[0])
+
+        if policy.max_age_days is not None:
+            conditions.append("timestamp < ?")
+            params.append(str(datetime.now() - timedelta(days=policy.max_age_days)))
+
+        if not conditions:
+            return None
+        return f"id <= ? AND ({' OR '.join(conditions)})", [up_to_id, *params]
+
+    def _archive_messages(self, conn):
+        """
+        Архивация и удаление устаревших сообщений.
+
+        Сначала все устаревшие сообщения записываются в архив (во временный
+        файл, переименовываемый после записи), и только потом удаляются
+        пачками по диапазонам ID, найденным при архивации.
+
+        Returns:
+            tuple: (количество удаленных сообщений, путь к архиву или None)
+        """
+        expired = self._expired_condition(conn, "messages", self.messages_policy)
+        if expired is None:
+            return 0, None
+        condition, params = expired
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        temp_path = os.path.join(
+            self.archive_dir, f"messages_{datetime.now().strftime('%Y%m%d_%H%M%S')}.part"
+        )
+        titles = dict(conn.execute("SELECT id, title FROM conversations").fetchall())
+        decode = self.cache.codec.decode
+
+        # Последние ID пачек: по ним удаление повторяет те же границы
+        batch_ends = []
+        newest = None
+        try:
+            with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                last_id = 0
+                while True:
+                    rows = conn.execute(f'''
+                        SELECT m.id, m.model, {MESSAGE_TEXT_COLUMNS}, m.timestamp,
+                               m.tokens_used, m.conversation_id, m.truncated
+                        FROM messages AS m {MESSAGE_BLOB_JOINS}
+                        WHERE m.id IN (
+                            SELECT id FROM messages
+                            WHERE id > ? AND {condition}
+                            ORDER BY id LIMIT ?
+                        )
+                        ORDER BY m.id
+                    ''', (last_id, *params, self.BATCH_SIZE)).fetchall()
+                    if not rows:
+                        break
+                    if not batch_ends:
+                        first_archived = rows[0][0]
+                    for row in rows:
+                        row = row[:2] + (decode(row[2]), decode(row[3])) + row[4:]
+                        write_jsonl_row(f, row, titles.get(row[6]))
+                        newest = max(newest or row[4], row[4])
+                    last_id = rows[-1][0]
+                    batch_ends.append(last_id)
+            if not batch_ends:
+                os.remove(temp_path)
+                return 0, None
+            # Диапазон ID в имени делает имена архивов уникальными
+            path = f"{temp_path[:-len('.part')]}_{first_archived}-{last_id}.jsonl.gz"
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        deleted = 0
+        first_id = 0
+        for last_id in batch_ends:
+            cursor = conn.execute(
+                f"DELETE FROM messages WHERE id > ? AND id <= ? AND {condition}",
+                (first_id, last_id, *params)
+            )
+            deleted += cursor.rowcount
+            first_id = last_id
+            time.sleep(self.BATCH_PAUSE)
+
+        # Беседы, все сообщения которых удалены (новые пустые беседы не трогаются)
+        conn.execute('''
+            DELETE FROM conversations
+            WHERE updated_at <= ?
+              AND NOT EXISTS (SELECT 1 FROM messages WHERE conversation_id = conversations.id)
+        ''', (newest,))
+        return deleted, path
+
+    def _rollup_analytics(self, conn) -> int:
+        """
+        Сворачивание устаревших записей аналитики в дневные сводки.
+
+        Каждая пачка добавляется к сводкам и удаляется в одной транзакции,
+        поэтому при прерывании записи не теряются и не учитываются дважды.
+
+        Returns:
+            int: Количество свернутых записей
+        """
+        expired = self._expired_condition(conn, "analytics_messages", self.analytics_policy)
+        if expired is None:
+            return 0
+        condition, params = expired
+
+        rolled_up = 0
+        last_id = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = conn.execute(f'''
+                    SELECT id FROM analytics_messages
+                    WHERE id > ? AND {condition}
+                    ORDER BY id LIMIT ?
+                ''', (last_id, *params, self.BATCH_SIZE)).fetchall()
+                if not ids:
+                    conn.execute("COMMIT")
+                    break
+                span = (last_id, ids[-1][0], *params)
+                conn.execute(f'''
+                    INSERT INTO analytics_rollups
+                        (period, model, messages, message_length, response_time, tokens_used,
+                         prompt_tokens, cached_tokens, cancelled, saved_tokens, saved_time)
+                    SELECT substr(timestamp, 1, 10), model, COUNT(*), SUM(message_length),
+                           SUM(response_time), SUM(tokens_used),
+                           SUM(prompt_tokens), SUM(cached_tokens),
+                           SUM(cancelled), SUM(saved_tokens), SUM(saved_time)
+                    FROM analytics_messages
+                    WHERE id > ? AND id <= ? AND {condition}
+                    GROUP BY 1, 2
+                    ON CONFLICT (period, model) DO UPDATE SET
+                        messages = messages + excluded.messages,
+                        message_length = message_length + excluded.message_length,
+                        response_time = response_time + excluded.response_time,
+                        tokens_used = tokens_used + excluded.tokens_used,
+                        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                        cached_tokens = cached_tokens + excluded.cached_tokens,
+                        cancelled = cancelled + excluded.cancelled,
+                        saved_tokens = saved_tokens + excluded.saved_tokens,
+                        saved_time = saved_time + excluded.saved_time
+                ''', span)
+                cursor = conn.execute(
+                    f"DELETE FROM analytics_messages WHERE id > ? AND id <= ? AND {condition}",
+                    span
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            rolled_up += cursor.rowcount
+            last_id = ids[-1][0]
+            time.sleep(self.BATCH_PAUSE)
+        return rolled_up
+
+    def _incremental_vacuum(self, conn) -> int:
+        """
+        Возврат свободных страниц файла базы небольшими порциями.
+
+        Returns:
+            int: Количество освобожденных страниц
+        """
+        # 2 - INCREMENTAL; базы, созданные до появления очистки, переводятся
+        # в этот режим только полным VACUUM, который здесь не запускается
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.logger.info("Database is not in incremental auto_vacuum mode, free pages are reused in place")
+            return 0
+
+        initial = free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free:
+            # execute() выполняет лишь один шаг прагмы (одну страницу),
+            # executescript() - прагму целиком
+            conn.executescript(f"PRAGMA incremental_vacuum({self.VACUUM_PAGES});")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break
+            free = remaining
+            time.sleep(self.BATCH_PAUSE)
+        return initial - free
@@ -0,0 +1,141 @@
+# Импорт необходимых библиотек
+import re  # Регулярные выражения для разбиения строк на токены
+
+# Разделители токенов: все, кроме букв и цифр
+_SEPARATORS = re.compile(r"[^0-9a-zа-яё]+")
+
+# Ранги совпадений (меньше - лучше)
+EXACT_MATCH = 0       # Запрос совпадает с ID, названием или частью ID после "/"
+PREFIX_MATCH = 1      # Запрос - начало одного из токенов
+SUBSTRING_MATCH = 2   # Запрос - подстрока ID или названия без разделителей
+FUZZY_MATCH = 3       # Символы запроса встречаются в том же порядке
+
+
+class ModelSearchIndex:
+    """
+    Поисковый индекс по каталогу моделей с ранжированным нечетким поиском.
+
+    Все нормализованные представления строятся один раз при создании
+    индекса, поэтому обработка нажатия клавиши не требует повторного
+    приведения к нижнему регистру всех названий.
+
+    Обеспечивает:
+    - Поиск по ID и названию без учета регистра и разделителей
+      ("gpt4o" находит "openai/gpt-4o")
+    - Индекс триграмм для быстрого отбора кандидатов
+    - Нечеткий поиск по подпоследовательности символов
+    - Ранжирование: точное совпадение, префикс токена, подстрока, нечеткое
+    """
+
+    def __init__(self, models: list):
+        """
+        Построение индекса.
+
+        Args:
+            models (list): Список моделей в формате
+                          [{"id": "model-id", "name": "Model Name"}, ...]
+        """
+        self.keys = []          # ID моделей в исходном порядке
+        self.exact = []         # Множества строк для точного совпадения
+        self.tokens = []        # Токены ID и названия
+        self.compact = []       # ID и название без разделителей
+        self.trigrams = {}      # Триграмма -> множество позиций моделей
+
+        for position, model in enumerate(models):
+            model_id = model["id"].lower()
+            name = model["name"].lower()
+            compact = (_compact(model_id), _compact(name))
+
+            self.keys.append(model["id"])
+            self.exact.append({model_id, name, model_id.split("/")[-1]})
+            self.tokens.append(tuple(t for t in _SEPARATORS.split(f"{model_id} {name}") if t))
+            self.compact.append(compact)
+
+            for text in compact:
+                for gram in _trigrams(text):
+                    self.trigrams.setdefault(gram, set()).add(position)
+
+    def search(self, query: str) -> list:
+        """
+        Поиск моделей по запросу.
+
+        Каждое слово запроса должно совпасть с моделью; итоговый ранг -
+        сумма рангов слов. При равенстве выше стоят более короткие ID.
+
+        Args:
+            query (str): Текст поискового запроса
+
+        Returns:
+            list: ID найденных моделей, отсортированные по релевантности
+        """
+        words = [w for w in query.lower().split() if w]
+        if not words:
+            return list(self.keys)
+
+        scores = None
+        for word in words:
+            word_scores = self._match_word(word)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    position: score + word_scores[position]
+                    for position, score in scores.items()
+                    if position in word_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores, key=lambda p: (scores[p], len(self.keys[p]), p))
+        return [self.keys[position] for position in ranked]
+
+    def _match_word(self, word: str) -> dict:
+        """
+        Ранги совпадения одного слова запроса со всеми моделями.
+
+        Returns:
+            dict: Позиция модели -> ранг совпадения
+        """
+        compact_word = _compact(word)
+        if not compact_word:
+            return {}
+
+        # Отбор кандидатов на совпадение подстроки по индексу триграмм
+        grams = _trigrams(compact_word)
+        if grams:
+            postings = sorted((self.trigrams.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+        else:
+            candidates = range(len(self.keys))
+
+        scores = {}
+        for position in candidates:
+            if word in self.exact[position]:
+                scores[position] = EXACT_MATCH
+            elif any(token.startswith(compact_word) for token in self.tokens[position]):
+                scores[position] = PREFIX_MATCH
+            elif any(compact_word in text for text in self.compact[position]):
+                scores[position] = SUBSTRING_MATCH
+
+        # Нечеткий поиск нужен, только если точных совпадений подстроки нет
+        if not scores:
+            for position, texts in enumerate(self.compact):
+                if any(_is_subsequence(compact_word, text) for text in texts):
+                    scores[position] = FUZZY_MATCH
+        return scores
+
+
+def _compact(text: str) -> str:
+    """Строка в нижнем регистре без разделителей."""
+    return _SEPARATORS.sub("", text.lower())
+
+
+def _trigrams(text: str) -> set:
+    """Множество триграмм строки (пустое для строк короче трех символов)."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_subsequence(needle: str, haystack: str) -> bool:
+    """Проверка, что символы needle встречаются в haystack в том же порядке."""
+    iterator = iter(haystack)
+    return all(char in iterator for char in needle)
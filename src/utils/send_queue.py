@@ -0,0 +1,105 @@
+# Импорт необходимых библиотек
+import asyncio      # Обработчики очередей выполняются в цикле событий страницы
+import os           # Переменные окружения с настройками
+from collections import deque  # Очередь сообщений беседы
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+
+class SendQueue:
+    """
+    Очереди отправки сообщений по беседам.
+
+    Сообщения одной беседы обрабатываются по одному в порядке отправки,
+    поэтому ответы отображаются и сохраняются в том же порядке, а к API
+    от беседы одновременно идет не больше одного запроса. Разные беседы
+    обрабатываются независимо.
+
+    Все методы вызываются из цикла событий страницы.
+    """
+
+    def __init__(self, handler, max_depth: int = None, on_change=None):
+        """
+        Инициализация очередей.
+
+        Args:
+            handler (callable): Асинхронная обработка одного сообщения: handler(item)
+            max_depth (int): Максимум сообщений, ожидающих обработки в беседе
+                             (по умолчанию - SEND_QUEUE_DEPTH)
+            on_change (callable): Вызывается при изменении очереди беседы
+                                  с ее ID (например, для обновления кнопки)
+        """
+        self.handler = handler
+        if max_depth is None:
+            max_depth = int(os.getenv("SEND_QUEUE_DEPTH", "3"))
+        # Хотя бы одно ожидающее сообщение: иначе при занятой беседе новому
+        # сообщению негде ждать и не с чем объединиться
+        self.max_depth = max(1, max_depth)
+        self.on_change = on_change
+        self.logger = AppLogger()
+
+        self._pending = {}      # ID беседы -> ожидающие сообщения
+        self._workers = {}      # ID беседы -> задача, обрабатывающая очередь
+
+    def busy(self, conversation_id) -> bool:
+        """Сообщение беседы сейчас обрабатывается или ждет обработки."""
+        return conversation_id in self._workers
+
+    def pending(self, conversation_id) -> int:
+        """Количество сообщений беседы, ожидающих обработки (без обрабатываемого)."""
+        return len(self._pending.get(conversation_id) or ())
+
+    def saturated(self, conversation_id) -> bool:
+        """Очередь беседы заполнена до max_depth."""
+        return self.pending(conversation_id) >= self.max_depth
+
+    def last(self, conversation_id):
+        """Последнее ожидающее сообщение беседы или None."""
+        queue = self._pending.get(conversation_id)
+        return queue[-1] if queue else None
+
+    def submit(self, conversation_id, item) -> bool:
+        """
+        Добавление сообщения в очередь беседы.
+
+        Args:
+            conversation_id: ID беседы
+            item: Сообщение, передаваемое в handler
+
+        Returns:
+            bool: True если сообщение добавлено, False если очередь заполнена
+        """
+        if self.saturated(conversation_id):
+            return False
+        if conversation_id in self._workers:
+            self._pending[conversation_id].append(item)
+        else:
+            # Беседа свободна: сообщение сразу передается новому обработчику
+            self._pending[conversation_id] = deque()
+            self._workers[conversation_id] = asyncio.get_running_loop().create_task(
+                self._run(conversation_id, item)
+            )
+        self._changed(conversation_id)
+        return True
+
+    async def _run(self, conversation_id, item):
+        """Последовательная обработка сообщений беседы, пока очередь не опустеет."""
+        queue = self._pending[conversation_id]
+        try:
+            while item is not None:
+                try:
+                    await self.handler(item)
+                except Exception as e:
+                    # Ошибка одного сообщения не останавливает очередь
+                    self.logger.error(f"Send queue handler failed: {e}", exc_info=True)
+                item = queue.popleft() if queue else None
+                if item is not None:
+                    self._changed(conversation_id)
+        finally:
+            del self._pending[conversation_id]
+            del self._workers[conversation_id]
+            self._changed(conversation_id)
+
+    def _changed(self, conversation_id):
+        """Уведомление об изменении очереди беседы."""
+        if self.on_change:
+            self.on_change(conversation_id)
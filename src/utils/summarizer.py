@@ -0,0 +1,271 @@
+# Импорт необходимых библиотек
+import os           # Переменные окружения с настройками
+import threading    # Фоновое обновление краткого содержания
+import time         # Измерение времени ответа модели
+from utils.logger import AppLogger  # Импорт собственного логгера
+from utils.tokens import cached_prompt_tokens  # Токены запроса из кэша поставщика
+
+# Инструкция модели, составляющей краткое содержание
+SUMMARY_PROMPT = (
+    "Ты ведешь краткое содержание беседы пользователя с AI-ассистентом. "
+    "Объедини текущее содержание с новыми репликами в одно связное содержание: "
+    "сохрани факты, решения, договоренности, имена, фрагменты кода и открытые вопросы, "
+    "опусти приветствия и повторы. Пиши на языке беседы, кратко, без вступлений."
+)
+
+# Заголовок, с которым содержание передается в запрос вместо старых сообщений
+SUMMARY_HEADER = "Краткое содержание предыдущей части беседы:"
+
+
+class ConversationSummarizer:
+    """
+    Сворачивание старой части длинных бесед в краткое содержание.
+
+    Когда несвернутые сообщения беседы превышают порог токенов, самые старые
+    из них вместе с текущим содержанием отправляются дешевой модели
+    (SUMMARY_MODEL), и ее ответ становится новым содержанием. В запрос
+    к основной модели вместо свернутых сообщений попадает только содержание,
+    поэтому размер запроса и время ответа на длинных беседах не растут.
+
+    Обеспечивает:
+    - Инкрементальное обновление содержания в фоновом потоке
+    - Сборку контекста запроса: содержание и последние сообщения в пределах бюджета
+    """
+    # Максимум сообщений, сворачиваемых одним запросом к модели
+    BATCH_ROWS = 40
+
+    # Доля бюджета, которую занимает окно истории после сдвига его начала
+    WINDOW_FILL = 0.75
+
+    def __init__(self, api_client, cache, tokens, analytics=None, model: str = None,
+                 threshold: int = None, keep_tokens: int = None, max_tokens: int = None,
+                 on_update=None):
+        """
+        Инициализация сворачивания.
+
+        Args:
+            api_client (OpenRouterClient): Клиент API для запросов к модели
+            cache (ChatCache): Хранилище сообщений и содержаний
+            tokens (TokenEstimator): Оценка количества токенов
+            analytics (Analytics): Учет запросов к модели содержания (необязательно)
+            model (str): Модель содержания (по умолчанию - SUMMARY_MODEL,
+                         пустое значение отключает сворачивание)
+            threshold (int): Объем несвернутых сообщений в токенах, после которого
+                             начинается сворачивание (SUMMARY_THRESHOLD_TOKENS)
+            keep_tokens (int): Объем последних сообщений, которые остаются в запросе
+                               дословно (по умолчанию - половина порога)
+            max_tokens (int): Ограничение длины содержания (SUMMARY_MAX_TOKENS)
+            on_update (callable): Функция on_update(ID беседы), вызывается
+                                  после сохранения нового содержания
+        """
+        self.api_client = api_client
+        self.cache = cache
+        self.tokens = tokens
+        self.analytics = analytics
+        self.model = model if model is not None else os.getenv("SUMMARY_MODEL", "")
+        self.threshold = threshold or int(os.getenv("SUMMARY_THRESHOLD_TOKENS", "3000"))
+        self.keep_tokens = keep_tokens or self.threshold // 2
+        self.max_tokens = max_tokens or int(os.getenv("SUMMARY_MAX_TOKENS", "500"))
+        self.on_update = on_update
+        self.logger = AppLogger()
+
+        self._running = set()           # Беседы, содержание которых сейчас обновляется
+        self._lock = threading.Lock()
+        self._window_starts = {}        # ID беседы -> ID первого сообщения окна истории
+
+    @property
+    def enabled(self) -> bool:
+        """Задана модель содержания."""
+        return bool(self.model)
+
+    def build_context(self, conversation_id: int, budget: int, model: str = None,
+                      update_window: bool = True):
+        """
+        Сборка контекста запроса для беседы.
+
+        Начало окна истории сдвигается скачками, а не на одно сообщение
+        с каждым ответом: пока окно помещается в бюджет, префикс запроса
+        остается побайтно тем же и читается из кэша поставщика. При сдвиге
+        окно сокращается до WINDOW_FILL бюджета, оставляя место новым сообщениям.
+
+        Args:
+            conversation_id (int): ID беседы
+            budget (int): Максимальное количество токенов контекста
+            model (str): ID модели, для которой оцениваются токены
+            update_window (bool): Запомнить сдвинутое начало окна (False - только
+                                  оценка, следующий запрос соберется заново)
+
+        Returns:
+            tuple: (сообщения в формате API по порядку, оценка их токенов)
+        """
+        prefix = []
+        used = 0
+        covered_id = 0
+        summary = self.cache.get_summary(conversation_id)
+        if summary:
+            text, covered_id = summary
+            content = f"{SUMMARY_HEADER}\n{text}"
+            used = self.tokens.count_message(("summary", conversation_id, covered_id), content, model)
+            if used <= budget:
+                prefix = [{"role": "system", "content": content}]
+            else:
+                used = 0
+
+        rows = self.cache.get_messages_page(
+            limit=self.cache.RECENT_PAGE_ROWS,
+            conversation_id=conversation_id
+        )
+        rows = [row for row in rows if row[0] > covered_id]
+        window = [row for row in rows if row[0] >= self._window_starts.get(conversation_id, 0)]
+        history, history_tokens = self.tokens.trim_history(window, budget - used, model)
+        if len(history) < 2 * len(window):
+            window = rows
+            history, history_tokens = self.tokens.trim_history(
+                rows, int((budget - used) * self.WINDOW_FILL), model
+            )
+        if history and update_window:
+            self._window_starts[conversation_id] = window[-(len(history) // 2)][0]
+        return prefix + history, used + history_tokens
+
+    def schedule(self, conversation_id: int):
+        """
+        Обновление содержания беседы в фоновом потоке.
+
+        Для каждой беседы одновременно выполняется не больше одного обновления.
+
+        Args:
+            conversation_id (int): ID беседы
+
+        Returns:
+            threading.Thread | None: Запущенный поток или None, если
+                                     обновление отключено или уже идет
+        """
+        if not self.enabled or conversation_id is None:
+            return None
+        with self._lock:
+            if conversation_id in self._running:
+                return None
+            self._running.add(conversation_id)
+
+        def worker():
+            try:
+                self.update(conversation_id)
+            except Exception as e:
+                self.logger.error(f"Summary update failed: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(conversation_id)
+
+        thread = threading.Thread(target=worker, name="summarizer", daemon=True)
+        thread.start()
+        return thread
+
+    def update(self, conversation_id: int) -> bool:
+        """
+        Сворачивание старых сообщений беседы, если превышен порог.
+
+        Args:
+            conversation_id (int): ID беседы
+
+        Returns:
+            bool: Содержание обновлено
+        """
+        summary, covered_id = self.cache.get_summary(conversation_id) or ("", 0)
+
+        # Объем несвернутой части по последним сообщениям беседы
+        recent = self.cache.get_messages_page(
+            limit=self.cache.RECENT_PAGE_ROWS,
+            conversation_id=conversation_id
+        )
+        pending = [row for row in recent if row[0] > covered_id]
+        sizes = [self._row_tokens(row) for row in pending]
+        if sum(sizes) <= self.threshold:
+            return False
+
+        # Последние сообщения в пределах keep_tokens остаются в запросе дословно
+        keep_from = len(pending)
+        kept = 0
+        while keep_from > 0 and kept + sizes[keep_from - 1] <= self.keep_tokens:
+            keep_from -= 1
+            kept += sizes[keep_from]
+        keep_id = pending[keep_from][0] if keep_from < len(pending) else None
+
+        # Сворачиваемые сообщения читаются от границы содержания, поэтому
+        # длинная беседа без содержания сворачивается за несколько обновлений
+        rows = []
+        batch_tokens = 0
+        for row in self.cache.get_messages_page(
+            after_id=covered_id,
+            limit=self.BATCH_ROWS,
+            conversation_id=conversation_id
+        ):
+            if keep_id is not None and row[0] >= keep_id:
+                break
+            batch_tokens += self._row_tokens(row)
+            if rows and batch_tokens > self.threshold:
+                break
+            rows.append(row)
+        if not rows:
+            return False
+
+        prompt = self._build_prompt(summary, rows)
+        start_time = time.time()
+        response = self.api_client.send_message(
+            prompt,
+            self.model,
+            history=[{"role": "system", "content": SUMMARY_PROMPT}],
+            max_tokens=self.max_tokens
+        )
+        if "error" in response:
+            self.logger.warning(f"Summary request failed: {response['error']}")
+            return False
+        text = (response["choices"][0]["message"].get("content") or "").strip()
+        if not text:
+            return False
+
+        self.cache.save_summary(conversation_id, text, rows[-1][0], self.model)
+        if self.analytics:
+            self.analytics.track_message(
+                model=self.model,
+                message_length=len(prompt),
+                response_time=time.time() - start_time,
+                tokens_used=response.get("usage", {}).get("total_tokens", 0),
+                prompt_tokens=response.get("usage", {}).get("prompt_tokens", 0),
+                cached_tokens=cached_prompt_tokens(response.get("usage"))
+            )
+        self.logger.info(
+            f"Conversation {conversation_id} summary updated: "
+            f"{len(rows)} messages folded, covered up to id {rows[-1][0]}"
+        )
+        if self.on_update:
+            self.on_update(conversation_id)
+        return True
+
+    def _row_tokens(self, row) -> int:
+        """Оценка токенов сообщения (вопрос и ответ) в запросе."""
+        return (
+            self.tokens.count_message((row[0], "user"), row[2])
+            + self.tokens.count_message((row[0], "assistant"), row[3])
+        )
+
+    @staticmethod
+    def _build_prompt(summary: str, rows: list) -> str:
+        """
+        Текст запроса к модели содержания.
+
+        Args:
+            summary (str): Текущее содержание (пустая строка - его еще нет)
+            rows (list): Сворачиваемые сообщения в формате ChatCache
+
+        Returns:
+            str: Текущее содержание и новые реплики
+        """
+        parts = []
+        if summary:
+            parts.append(f"Текущее краткое содержание:\n{summary}")
+        lines = []
+        for row in rows:
+            lines.append(f"Пользователь: {row[2]}")
+            lines.append(f"Ассистент: {row[3]}")
+        parts.append("Новые реплики:\n" + "\n\n".join(lines))
+        return "\n\n".join(parts)
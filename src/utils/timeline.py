@@ -0,0 +1,50 @@
+# Импорт необходимых библиотек
+import threading    # Отметки ставятся из разных потоков
+import time         # Монотонные часы для измерения интервалов
+
+
+class StartupTimeline:
+    """
+    Отметки времени этапов запуска приложения.
+
+    Время каждой отметки отсчитывается от начала запуска (origin) в
+    миллисекундах. Повторная отметка этапа игнорируется, поэтому
+    фиксируется момент, когда этап был достигнут впервые.
+    """
+
+    def __init__(self, origin: float = None):
+        """
+        Инициализация шкалы.
+
+        Args:
+            origin (float): Начало отсчета по time.perf_counter()
+                            (по умолчанию - момент создания)
+        """
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.marks = {}                 # Название этапа -> мс от начала запуска
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> float:
+        """
+        Отметка достижения этапа.
+
+        Args:
+            name (str): Название этапа
+
+        Returns:
+            float: Время этапа в миллисекундах от начала запуска
+        """
+        elapsed = (time.perf_counter() - self.origin) * 1000
+        with self._lock:
+            return self.marks.setdefault(name, elapsed)
+
+    def get(self, name: str):
+        """Время этапа в миллисекундах или None, если этап еще не достигнут."""
+        with self._lock:
+            return self.marks.get(name)
+
+    def format(self) -> str:
+        """Строка с этапами в порядке их достижения: "этап=N мс, ..."."""
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        return ", ".join(f"{name}={elapsed:.0f} мс" for name, elapsed in marks)
@@ -0,0 +1,222 @@
+# Импорт необходимых библиотек
+import threading    # Потокобезопасный кэш оценок
+from collections import OrderedDict  # LRU-кэш оценок сохраненных сообщений
+
+# Параметры оценки по семействам моделей (приближение к их токенизаторам):
+# - chars_per_token: символов ASCII (буквы, цифры, пробелы) на токен
+# - symbol: токенов на знак препинания или спецсимвол
+# - narrow: токенов на двухбайтовый символ UTF-8 (кириллица, греческий, диакритика)
+# - wide: токенов на символ из трех и более байт (CJK, эмодзи)
+# - message: служебные токены на одно сообщение чата (роль, разделители)
+TOKEN_PROFILES = {
+    "openai":    {"chars_per_token": 4.0, "symbol": 0.6, "narrow": 0.40, "wide": 1.0, "message": 4},
+    "anthropic": {"chars_per_token": 3.5, "symbol": 0.7, "narrow": 0.50, "wide": 1.2, "message": 5},
+    "google":    {"chars_per_token": 4.0, "symbol": 0.6, "narrow": 0.35, "wide": 0.9, "message": 4},
+    "meta":      {"chars_per_token": 3.8, "symbol": 0.6, "narrow": 0.45, "wide": 1.1, "message": 5},
+    "mistral":   {"chars_per_token": 3.5, "symbol": 0.7, "narrow": 0.55, "wide": 1.3, "message": 5},
+    "deepseek":  {"chars_per_token": 3.8, "symbol": 0.6, "narrow": 0.45, "wide": 0.8, "message": 5},
+    "qwen":      {"chars_per_token": 3.8, "symbol": 0.6, "narrow": 0.40, "wide": 0.7, "message": 5},
+    "default":   {"chars_per_token": 3.8, "symbol": 0.6, "narrow": 0.45, "wide": 1.0, "message": 5},
+}
+
+# Семейство по фрагменту ID модели (в том числе без префикса поставщика)
+_FAMILY_MARKERS = (
+    ("openai", "openai"), ("gpt", "openai"), ("o1", "openai"), ("o3", "openai"),
+    ("anthropic", "anthropic"), ("claude", "anthropic"),
+    ("google", "google"), ("gemini", "google"), ("gemma", "google"),
+    ("meta-llama", "meta"), ("llama", "meta"),
+    ("mistral", "mistral"), ("mixtral", "mistral"), ("codestral", "mistral"),
+    ("deepseek", "deepseek"),
+    ("qwen", "qwen"),
+)
+
+# Байты, удаляемые при подсчете: буквы, цифры и пробельные символы ASCII
+_PLAIN_BYTES = bytes(
+    b for b in range(128) if chr(b).isalnum() or chr(b).isspace()
+)
+_ASCII_BYTES = bytes(range(128))
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))   # Продолжения многобайтовых символов
+_NARROW_LEAD_BYTES = bytes(range(0xC0, 0xE0))    # Начало двухбайтового символа
+
+
+def model_family(model: str) -> str:
+    """
+    Определение семейства модели по ее идентификатору.
+
+    Args:
+        model (str): ID модели, например "openai/gpt-4o" или "claude-3-sonnet"
+
+    Returns:
+        str: Ключ TOKEN_PROFILES
+    """
+    model = (model or "").lower()
+    vendor = model.split("/", 1)[0]
+    for marker, family in _FAMILY_MARKERS:
+        if vendor == marker:
+            return family
+    for marker, family in _FAMILY_MARKERS:
+        if marker in model:
+            return family
+    return "default"
+
+
+def cached_prompt_tokens(usage: dict) -> int:
+    """
+    Количество токенов запроса, прочитанных из кэша поставщика.
+
+    Args:
+        usage (dict): Статистика токенов из ответа API
+
+    Returns:
+        int: prompt_tokens_details.cached_tokens или 0
+    """
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or 0
+
+
+class TokenEstimator:
+    """
+    Быстрая локальная оценка количества токенов без сети и токенизаторов.
+
+    Текст один раз кодируется в UTF-8 и разбирается несколькими проходами
+    bytes.translate (выполняются в C), поэтому оценка линейна по длине и
+    подходит для пересчета на каждое нажатие клавиши. Оценки сохраненных
+    сообщений запоминаются по их ID.
+
+    Обеспечивает:
+    - Оценку текста и списка сообщений чата для семейства модели
+    - Обрезку истории беседы под бюджет токенов
+    - Прогноз стоимости запроса по ценам каталога моделей
+    """
+    # Количество запоминаемых оценок сообщений
+    CACHE_SIZE = 10_000
+
+    def __init__(self):
+        """Инициализация оценщика с пустым кэшем."""
+        self._cache = OrderedDict()     # (ключ сообщения, семейство) -> токены
+        self._lock = threading.Lock()
+
+    def count(self, text: str, model: str = None) -> int:
+        """
+        Оценка количества токенов в тексте.
+
+        Args:
+            text (str): Текст
+            model (str): ID модели (определяет параметры оценки)
+
+        Returns:
+            int: Примерное количество токенов
+        """
+        if not text:
+            return 0
+        profile = TOKEN_PROFILES[model_family(model)]
+
+        raw = text.encode("utf-8", "surrogatepass")
+        rest = raw.translate(None, _PLAIN_BYTES)         # Знаки и все байты вне ASCII
+        high = rest.translate(None, _ASCII_BYTES)        # Только байты вне ASCII
+        leads = high.translate(None, _CONTINUATION_BYTES)  # Первый байт каждого символа
+        wide = len(leads.translate(None, _NARROW_LEAD_BYTES))
+        narrow = len(leads) - wide
+        symbols = len(rest) - len(high)
+        plain = len(text) - len(leads) - symbols
+
+        tokens = (
+            plain / profile["chars_per_token"]
+            + symbols * profile["symbol"]
+            + narrow * profile["narrow"]
+            + wide * profile["wide"]
+        )
+        return max(1, round(tokens))
+
+    def count_message(self, key, text: str, model: str = None) -> int:
+        """
+        Оценка одного сообщения чата с запоминанием результата.
+
+        Args:
+            key: Неизменяемый ключ сообщения, например (ID в базе, роль)
+            text (str): Текст сообщения
+            model (str): ID модели
+
+        Returns:
+            int: Примерное количество токенов вместе со служебными
+        """
+        family = model_family(model)
+        cache_key = (key, family)
+        with self._lock:
+            tokens = self._cache.get(cache_key)
+            if tokens is not None:
+                self._cache.move_to_end(cache_key)
+                return tokens
+
+        tokens = self.count(text, model) + TOKEN_PROFILES[family]["message"]
+        with self._lock:
+            self._cache[cache_key] = tokens
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: list, model: str = None) -> int:
+        """
+        Оценка списка сообщений в формате API ({"role", "content"}) без запоминания.
+
+        Returns:
+            int: Примерное количество токенов запроса
+        """
+        overhead = TOKEN_PROFILES[model_family(model)]["message"]
+        return sum(self.count(message.get("content"), model) + overhead for message in messages)
+
+    def trim_history(self, rows: list, budget: int, model: str = None):
+        """
+        Выбор последних сообщений беседы, помещающихся в бюджет токенов.
+
+        Args:
+            rows (list): Кортежи (id, model, user_message, ai_response, ...)
+                         по возрастанию ID, как из ChatCache
+            budget (int): Максимальное количество токенов истории
+            model (str): ID модели
+
+        Returns:
+            tuple: (сообщения в формате API по порядку, оценка их токенов)
+        """
+        selected = []
+        total = 0
+        for row in reversed(rows):
+            row_id, user_message, ai_response = row[0], row[2], row[3]
+            tokens = (
+                self.count_message((row_id, "user"), user_message, model)
+                + self.count_message((row_id, "assistant"), ai_response, model)
+            )
+            if total + tokens > budget:
+                break
+            total += tokens
+            selected.append(row)
+
+        messages = []
+        for row in reversed(selected):
+            messages.append({"role": "user", "content": row[2]})
+            messages.append({"role": "assistant", "content": row[3]})
+        return messages, total
+
+    @staticmethod
+    def estimate_cost(pricing: dict, prompt_tokens: int, completion_tokens: int = 0):
+        """
+        Прогноз стоимости запроса.
+
+        Args:
+            pricing (dict): Цены из каталога OpenRouter
+                            ({"prompt": "$ за токен", "completion": "$ за токен"})
+            prompt_tokens (int): Токены запроса
+            completion_tokens (int): Ожидаемые токены ответа
+
+        Returns:
+            float | None: Стоимость в долларах или None, если цены неизвестны
+        """
+        if not pricing:
+            return None
+        try:
+            return (
+                float(pricing.get("prompt") or 0) * prompt_tokens
+                + float(pricing.get("completion") or 0) * completion_tokens
+            )
+        except (TypeError, ValueError):
+            return None
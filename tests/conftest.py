@@ -0,0 +1,18 @@
+# Импорт необходимых библиотек
+import os           # Смена рабочей директории на время тестов
+import sys          # Путь поиска модулей приложения
+
+import pytest
+
+# Модули приложения импортируются так же, как при запуске из src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def work_dir(tmp_path_factory):
+    """Рабочая директория тестов: логи и базы не попадают в репозиторий."""
+    path = tmp_path_factory.mktemp("work")
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
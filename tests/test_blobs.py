@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from utils.cache import BLOB_MIN_CHARS, ChatCache
+
+LONG_ANSWER = "Длинный повторяющийся ответ модели. " * 10
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ChatCache(str(tmp_path / "chat_cache.db"))
+    yield cache
+    cache.close()
+
+
+def _blobs(cache):
+    conn = sqlite3.connect(cache.db_name)
+    try:
+        return conn.execute("SELECT id, refcount FROM blobs ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def _execute(cache, sql, params=()):
+    conn = sqlite3.connect(cache.db_name)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_short_texts_stay_in_messages(cache):
+    cache.save_message("test/model", "вопрос", "a" * (BLOB_MIN_CHARS - 1), 1)
+    assert _blobs(cache) == []
+
+
+def test_equal_texts_share_one_blob(cache):
+    conversation_id = cache.create_conversation()
+    for index in range(3):
+        cache.save_message("test/model", f"вопрос {index}", LONG_ANSWER, 1, conversation_id)
+    (_, refcount), = _blobs(cache)
+    assert refcount == 3
+    assert [row[3] for row in cache.iter_messages()] == [LONG_ANSWER] * 3
+
+
+def test_same_text_in_question_and_answer_counts_twice(cache):
+    cache.save_message("test/model", LONG_ANSWER, LONG_ANSWER, 1)
+    assert [refcount for _, refcount in _blobs(cache)] == [2]
+
+
+def test_delete_decrements_and_removes_unreferenced_blob(cache):
+    first = cache.save_message("test/model", "первый", LONG_ANSWER, 1)
+    second = cache.save_message("test/model", "второй", LONG_ANSWER, 1)
+    _execute(cache, "DELETE FROM messages WHERE id = ?", (first,))
+    assert [refcount for _, refcount in _blobs(cache)] == [1]
+    _execute(cache, "DELETE FROM messages WHERE id = ?", (second,))
+    assert _blobs(cache) == []
+
+
+def test_update_moves_reference(cache):
+    row_id = cache.save_message("test/model", "вопрос", LONG_ANSWER, 1)
+    other = cache.save_message("test/model", "вопрос", LONG_ANSWER + "!", 1)
+    (old_blob, _), (new_blob, _) = _blobs(cache)
+    _execute(cache, "UPDATE messages SET ai_blob = ? WHERE id = ?", (new_blob, row_id))
+    assert _blobs(cache) == [(new_blob, 2)]
+    _execute(cache, "DELETE FROM messages WHERE id IN (?, ?)", (row_id, other))
+    assert _blobs(cache) == []
+
+
+def test_delete_conversation_releases_blobs(cache):
+    kept = cache.create_conversation()
+    deleted = cache.create_conversation()
+    cache.save_message("test/model", "вопрос", LONG_ANSWER, 1, kept)
+    cache.save_message("test/model", "вопрос", LONG_ANSWER, 1, deleted)
+    cache.save_message("test/model", "вопрос", LONG_ANSWER * 2, 1, deleted)
+    cache.delete_conversation(deleted)
+    assert [refcount for _, refcount in _blobs(cache)] == [1]
@@ -0,0 +1,98 @@
+import zlib
+
+import pytest
+
+from utils.cache import ChatCache
+from utils.compression import ALGORITHM_CODES, MessageCodec
+
+LONG_TEXT = "Повторяющийся абзац ответа модели.\n" * 100
+
+
+def test_short_text_is_stored_as_is():
+    codec = MessageCodec(threshold=512)
+    assert codec.encode("короткий ответ") == "короткий ответ"
+    assert codec.decode("короткий ответ") == "короткий ответ"
+
+
+def test_header_without_dictionary():
+    value = MessageCodec().encode(LONG_TEXT)
+    assert isinstance(value, bytes)
+    assert value[:2] == bytes((ALGORITHM_CODES["zlib"], 0))
+    assert zlib.decompress(value[2:]).decode("utf-8") == LONG_TEXT
+    assert MessageCodec(algorithm="none").decode(value) == LONG_TEXT
+
+
+def test_disabled_codec_still_reads_compressed_values():
+    codec = MessageCodec(algorithm="none")
+    assert codec.encode(LONG_TEXT) == LONG_TEXT
+    assert codec.decode(MessageCodec().encode(LONG_TEXT)) == LONG_TEXT
+
+
+def test_incompressible_text_is_stored_as_is():
+    # Без повторов сжатые данные с заголовком длиннее исходного текста
+    text = "abcdefghijklmnopqrstuvwxyz0123456789"
+    assert MessageCodec(threshold=16).encode(text) == text
+
+
+def test_dictionary_id_in_header():
+    codec = MessageCodec(threshold=16)
+    dictionary = codec.train_dictionary([LONG_TEXT, LONG_TEXT])
+    assert dictionary
+    codec.add_dictionary(3, "zlib", dictionary)
+    value = codec.encode("Повторяющийся абзац ответа модели.\nи немного нового")
+    assert value[:2] == bytes((ALGORITHM_CODES["zlib"], 3))
+    assert codec.decode(value) == "Повторяющийся абзац ответа модели.\nи немного нового"
+
+
+def test_newest_dictionary_of_current_algorithm_is_used():
+    codec = MessageCodec()
+    codec.add_dictionary(2, "zlib", b"abc")
+    codec.add_dictionary(1, "zlib", b"abc")
+    codec.add_dictionary(5, "zstd", b"abc")
+    assert codec.dictionary_id == 2
+
+
+def test_unknown_dictionary():
+    value = bytes((ALGORITHM_CODES["zlib"], 4)) + zlib.compress(b"text")
+    with pytest.raises(ValueError):
+        MessageCodec().decode(value)
+
+
+def test_unknown_algorithm_code():
+    with pytest.raises(ValueError):
+        MessageCodec().decode(bytes((9, 0)) + b"payload")
+
+
+def test_unknown_dictionary_uses_loader():
+    writer = MessageCodec(threshold=16)
+    dictionary = writer.train_dictionary([LONG_TEXT, LONG_TEXT])
+    writer.add_dictionary(4, "zlib", dictionary)
+    value = writer.encode(LONG_TEXT)
+
+    reader = MessageCodec()
+    with pytest.raises(ValueError):
+        reader.decode(value)
+    reader.dictionary_loader = lambda: reader.add_dictionary(4, "zlib", dictionary)
+    assert reader.decode(value) == LONG_TEXT
+
+
+def test_cache_reads_dictionary_trained_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChatCache, "DICTIONARY_SAMPLE_ROWS", 5)
+    path = str(tmp_path / "chat_cache.db")
+    reader = ChatCache(path, codec=MessageCodec(threshold=16))
+
+    first = ChatCache(path, codec=MessageCodec(threshold=16))
+    for index in range(5):
+        first.save_message("test/model", f"вопрос {index}", f"{LONG_TEXT}{index}", 1)
+    first.close()
+
+    # Новый экземпляр обучает словарь и сжимает им новые сообщения
+    writer = ChatCache(path, codec=MessageCodec(threshold=16))
+    assert writer.codec.dictionary_id
+    writer.save_message("test/model", "вопрос", f"{LONG_TEXT}новое", 1)
+    writer.close()
+
+    assert not reader.codec.dictionaries
+    assert reader.get_messages_page(limit=1)[0][3] == f"{LONG_TEXT}новое"
+    assert reader.codec.dictionary_id == writer.codec.dictionary_id
+    reader.close()
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.db_pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_readers=2, busy_timeout=0.3)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+    yield pool
+    pool.close()
+
+
+def _values(pool):
+    with pool.reader() as conn:
+        return [row[0] for row in conn.execute("SELECT value FROM items ORDER BY value")]
+
+
+def test_writer_commits_and_readers_see_changes(pool):
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+    assert _values(pool) == [1]
+
+
+def test_writer_rolls_back_on_error(pool):
+    with pytest.raises(RuntimeError):
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+            raise RuntimeError("failed inside transaction")
+    assert _values(pool) == []
+
+
+def test_readers_are_read_only(pool):
+    with pool.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO items VALUES (1)")
+
+
+def test_database_uses_wal(pool):
+    with pool.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_reader_connections_are_reused(pool):
+    with pool.reader() as first:
+        pass
+    with pool.reader() as second:
+        assert second is first
+
+
+def test_reader_count_is_bounded(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "bounded.db"), max_readers=1)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+    acquired = threading.Event()
+
+    def read():
+        with pool.reader():
+            acquired.set()
+
+    with pool.reader():
+        thread = threading.Thread(target=read)
+        thread.start()
+        # Единственное соединение для чтения занято: второй поток ждет
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join(5)
+    pool.close()
+
+
+def test_reading_does_not_wait_for_open_write(pool):
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+        # Незафиксированная запись не видна и не блокирует чтение (WAL)
+        assert _values(pool) == []
+    assert _values(pool) == [1]
+
+
+def test_writer_waits_for_other_process_then_gives_up(pool):
+    other = sqlite3.connect(pool.db_name, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.writer():
+            pass
+    assert time.monotonic() - start >= 0.25
+    other.execute("ROLLBACK")
+    other.close()
+
+
+def test_writer_retries_until_lock_is_released(pool):
+    other = sqlite3.connect(pool.db_name, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.1, lambda: other.execute("ROLLBACK")).start()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items VALUES (2)")
+    other.close()
+    assert _values(pool) == [2]
+
+
+def test_data_version_tracks_other_connections_only(pool):
+    version = pool.data_version()
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+    assert pool.data_version() == version
+
+    other = sqlite3.connect(pool.db_name)
+    other.execute("INSERT INTO items VALUES (2)")
+    other.commit()
+    other.close()
+    assert pool.data_version() != version
+
+
+def test_memory_database_reads_through_writer():
+    pool = ConnectionPool(":memory:", max_readers=4)
+    assert pool.max_readers == 0
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+        conn.execute("INSERT INTO items VALUES (1)")
+    assert _values(pool) == [1]
+    pool.close()
+
+
+def test_closed_pool_rejects_use(pool):
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.reader():
+            pass
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.writer():
+            pass
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from utils.cache import ChatCache
+from utils.importer import ChatImporter
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ChatCache(str(tmp_path / "chat_cache.db"))
+    yield cache
+    cache.close()
+
+
+def _record(index, conversation_id=1):
+    return {
+        "id": index,
+        "conversation_id": conversation_id,
+        "conversation": f"Беседа {conversation_id}",
+        "timestamp": f"2024-01-01 00:00:{index:02d}",
+        "model": "test/model",
+        "user_message": f"вопрос {index}",
+        "ai_response": f"ответ {index}",
+        "tokens_used": index,
+    }
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+def test_duplicates_inside_file_are_skipped(cache, tmp_path):
+    path = _write_jsonl(tmp_path / "export.jsonl", [_record(1), _record(2), _record(1)])
+    result = ChatImporter(cache).import_file(path)
+    assert result == {"read": 3, "imported": 2, "duplicates": 1}
+
+
+def test_reimport_adds_nothing(cache, tmp_path):
+    path = _write_jsonl(tmp_path / "export.jsonl", [_record(index) for index in range(5)])
+    importer = ChatImporter(cache)
+    importer.import_file(path)
+    assert importer.import_file(path) == {"read": 5, "imported": 0, "duplicates": 5}
+    assert len(list(cache.iter_messages())) == 5
+
+
+def test_messages_already_in_database_are_skipped(cache, tmp_path):
+    conversation_id = cache.create_conversation()
+    cache.save_message("test/model", "локальный вопрос", "локальный ответ", 3, conversation_id)
+    exported = tmp_path / "exported.jsonl"
+    with open(exported, "w", encoding="utf-8") as f:
+        for row in cache.iter_messages():
+            f.write(json.dumps({
+                "model": row[1], "user_message": row[2], "ai_response": row[3],
+                "timestamp": row[4], "tokens_used": row[5]
+            }, ensure_ascii=False) + "\n")
+    result = ChatImporter(cache).import_file(str(exported))
+    assert result["imported"] == 0
+
+
+def test_source_conversations_become_new_conversations(cache, tmp_path):
+    path = _write_jsonl(tmp_path / "export.jsonl", [_record(1, 7), _record(2, 7), _record(3, 8)])
+    ChatImporter(cache).import_file(path)
+    titles = sorted(title for _, title, _ in cache.list_conversations())
+    assert titles == ["Беседа 7", "Беседа 8"]
+
+
+def test_import_database_skips_shared_messages(cache, tmp_path):
+    other = ChatCache(str(tmp_path / "other.db"))
+    conversation_id = other.create_conversation()
+    for index in range(3):
+        other.save_message("test/model", f"вопрос {index}", "ответ " * 200, 1, conversation_id)
+    other.close()
+
+    importer = ChatImporter(cache)
+    first = importer.import_database(str(tmp_path / "other.db"))
+    second = importer.import_database(str(tmp_path / "other.db"))
+    assert (first["imported"], first["duplicates"]) == (3, 0)
+    assert (second["imported"], second["duplicates"]) == (0, 3)
+    assert [row[3] for row in cache.iter_messages()] == ["ответ " * 200] * 3
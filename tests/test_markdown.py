@@ -0,0 +1,87 @@
+import hashlib
+
+from ui import markdown
+from ui.markdown import MarkdownContent, parse_blocks
+
+TEXT = (
+    "Первый абзац.\n\n"
+    "- пункт\n\n  продолжение пункта\n\n"
+    "```python\ndef f():\n\n    return 1\n```\n\n"
+    "Последний абзац."
+)
+
+
+def _stream(text, step):
+    content = MarkdownContent()
+    for start in range(0, len(text), step):
+        content.append(text[start:start + step])
+    return content
+
+
+def test_blank_lines_inside_fence_do_not_split_blocks():
+    assert parse_blocks(TEXT) == (
+        "Первый абзац.",
+        "- пункт\n\n  продолжение пункта",
+        "```python\ndef f():\n\n    return 1\n```",
+        "Последний абзац.",
+    )
+
+
+def test_streamed_blocks_match_full_parse():
+    for step in (1, 3, 7, len(TEXT)):
+        content = _stream(TEXT, step)
+        assert [control.value for control in content.controls] == list(parse_blocks(TEXT))
+
+
+def test_delta_inside_last_block_updates_only_tail():
+    content = _stream("Абзац.\n\nНачало", 100)
+    first, tail = content.controls
+    assert content.append(" хвоста") == [tail]
+    assert tail.value == "Начало хвоста"
+    assert first.value == "Абзац."
+
+
+def test_finish_caches_streamed_blocks():
+    text = "Кэшируемый ответ.\n\nВторой блок."
+    content = _stream(text, 5)
+    key = hashlib.sha1(text.encode("utf-8")).digest()
+    assert key not in markdown._block_cache
+    content.finish()
+    assert markdown._block_cache[key] == ("Кэшируемый ответ.", "Второй блок.")
+
+
+def _code(lines):
+    return "".join(f"line = {index:05d}\n" for index in range(lines))
+
+
+def test_long_streamed_fence_is_split_into_closed_blocks():
+    body = _code(1000)
+    content = _stream(f"```python\n{body}", 50)
+    values = [control.value for control in content.controls]
+    assert len(values) > 1
+    for value in values[:-1]:
+        assert value.startswith("```python\n") and value.endswith("\n```")
+        assert len(value) <= markdown.STREAM_TAIL_CHARS + 100
+    assert values[-1].startswith("```python\n")
+
+    # Разрезанный блок содержит исходный код без потерь и повторов
+    lines = [line for value in values for line in value.split("\n") if line.startswith("line")]
+    assert "\n".join(lines) + "\n" == body
+
+
+def test_split_fence_closes_and_parsing_continues():
+    content = _stream(f"```\n{_code(1000)}```\n\nПосле кода.", 50)
+    assert content.controls[-2].value.endswith("\n```")
+    assert content.controls[-1].value == "После кода."
+    # Разрезанные блоки не совпадают с обычным разбором и не кэшируются
+    content.finish()
+    assert hashlib.sha1(content.text.encode("utf-8")).digest() not in markdown._block_cache
+
+
+def test_paginate_blocks_splits_long_fence():
+    block = f"~~~\n{_code(2000)}~~~"
+    pages = markdown.paginate_blocks((block,), size=8_000)
+    pieces = [piece for page in pages for piece in page]
+    assert len(pieces) > 1
+    assert all(piece.startswith("~~~\n") and piece.endswith("\n~~~") for piece in pieces)
+    assert all(len(page) == 1 for page in pages)
@@ -0,0 +1,40 @@
+from utils.search import ModelSearchIndex
+
+MODELS = [
+    {"id": "openai/gpt-4o", "name": "OpenAI: GPT-4o"},
+    {"id": "openai/gpt-4o-mini", "name": "OpenAI: GPT-4o mini"},
+    {"id": "anthropic/claude-3.5-sonnet", "name": "Anthropic: Claude 3.5 Sonnet"},
+    {"id": "meta-llama/llama-3.1-70b-instruct", "name": "Meta: Llama 3.1 70B Instruct"},
+]
+
+
+def test_empty_query_returns_catalog_order():
+    index = ModelSearchIndex(MODELS)
+    assert index.search("  ") == [model["id"] for model in MODELS]
+
+
+def test_separators_are_ignored():
+    index = ModelSearchIndex(MODELS)
+    assert index.search("gpt4o")[:2] == ["openai/gpt-4o", "openai/gpt-4o-mini"]
+
+
+def test_exact_match_ranks_first():
+    index = ModelSearchIndex(MODELS)
+    assert index.search("GPT-4o-mini")[0] == "openai/gpt-4o-mini"
+
+
+def test_prefix_beats_substring():
+    index = ModelSearchIndex(MODELS)
+    # "son" - начало токена "sonnet"; у остальных моделей совпадения нет
+    assert index.search("son") == ["anthropic/claude-3.5-sonnet"]
+
+
+def test_fuzzy_subsequence():
+    index = ModelSearchIndex(MODELS)
+    assert index.search("clsnt") == ["anthropic/claude-3.5-sonnet"]
+
+
+def test_every_word_must_match():
+    index = ModelSearchIndex(MODELS)
+    assert index.search("llama instruct") == ["meta-llama/llama-3.1-70b-instruct"]
+    assert index.search("llama sonnet") == []
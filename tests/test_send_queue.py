@@ -0,0 +1,121 @@
+import asyncio
+
+from utils.send_queue import SendQueue
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class Recorder:
+    """Обработчик, который ждет разрешения на завершение каждого сообщения."""
+
+    def __init__(self):
+        self.started = []
+        self.finished = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, item):
+        self.started.append(item["text"])
+        await self.release.wait()
+        self.finished.append(item["text"])
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_conversation_messages_are_processed_in_order():
+    async def scenario():
+        handler = Recorder()
+        queue = SendQueue(handler, max_depth=3)
+        for text in ("a", "b", "c"):
+            assert queue.submit(1, {"text": text})
+        await _settle()
+        # К API от беседы идет один запрос, остальные ждут
+        assert handler.started == ["a"]
+        assert queue.pending(1) == 2
+        handler.release.set()
+        await _settle()
+        assert handler.finished == ["a", "b", "c"]
+        assert not queue.busy(1)
+    _run(scenario())
+
+
+def test_conversations_are_independent():
+    async def scenario():
+        handler = Recorder()
+        queue = SendQueue(handler, max_depth=3)
+        queue.submit(1, {"text": "first"})
+        queue.submit(2, {"text": "second"})
+        await _settle()
+        assert handler.started == ["first", "second"]
+        assert (queue.pending(1), queue.pending(2)) == (0, 0)
+        handler.release.set()
+        await _settle()
+    _run(scenario())
+
+
+def test_saturated_queue_rejects_and_last_item_can_be_merged():
+    async def scenario():
+        handler = Recorder()
+        queue = SendQueue(handler, max_depth=2)
+        for text in ("a", "b", "c"):
+            assert queue.submit(1, {"text": text})
+        assert queue.saturated(1)
+        assert not queue.submit(1, {"text": "d"})
+
+        # Так отправка объединяет сообщение с последним ожидающим
+        queue.last(1)["text"] += "\n\nd"
+        handler.release.set()
+        await _settle()
+        assert handler.finished == ["a", "b", "c\n\nd"]
+    _run(scenario())
+
+
+def test_depth_is_at_least_one(monkeypatch):
+    async def scenario():
+        handler = Recorder()
+        queue = SendQueue(handler, max_depth=0)
+        assert queue.max_depth == 1
+        assert queue.submit(1, {"text": "a"})
+        assert queue.submit(1, {"text": "b"})
+        assert queue.last(1) == {"text": "b"}
+        handler.release.set()
+        await _settle()
+    _run(scenario())
+
+    monkeypatch.setenv("SEND_QUEUE_DEPTH", "-5")
+    assert SendQueue(Recorder()).max_depth == 1
+
+
+def test_failed_message_does_not_stop_queue():
+    async def scenario():
+        processed = []
+
+        async def handler(item):
+            if item["text"] == "bad":
+                raise RuntimeError("handler failed")
+            processed.append(item["text"])
+
+        queue = SendQueue(handler, max_depth=3)
+        queue.submit(1, {"text": "bad"})
+        queue.submit(1, {"text": "good"})
+        await _settle()
+        assert processed == ["good"]
+    _run(scenario())
+
+
+def test_on_change_reports_conversation():
+    async def scenario():
+        changes = []
+        handler = Recorder()
+        queue = SendQueue(handler, max_depth=3, on_change=changes.append)
+        queue.submit(7, {"text": "a"})
+        queue.submit(7, {"text": "b"})
+        handler.release.set()
+        await _settle()
+        # Добавление двух сообщений, переход ко второму и опустевшая очередь
+        assert changes == [7, 7, 7, 7]
+    _run(scenario())
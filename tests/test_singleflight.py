@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from api.openrouter import OpenRouterClient
+from api.singleflight import SingleFlight
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def _blocking_call(started, release, value):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        assert release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return fn, calls
+
+
+def _wait_for_waiters(flights, count):
+    for _ in range(500):
+        if flights.shared == count:
+            return
+        time.sleep(0.01)
+    raise AssertionError("waiters did not join the call")
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    fn, calls = _blocking_call(started, release, "result")
+
+    leader, results, _ = _run_concurrently(1, lambda: flights.do("key", fn))
+    assert started.wait(5)
+    waiters, shared_results, _ = _run_concurrently(3, lambda: flights.do("key", fn))
+    _wait_for_waiters(flights, 3)
+    release.set()
+    for thread in leader + waiters:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [("result", False)]
+    assert shared_results == [("result", True)] * 3
+
+
+def test_error_is_raised_in_every_waiter():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    fn, _ = _blocking_call(started, release, RuntimeError("upstream failed"))
+
+    leader, _, leader_errors = _run_concurrently(1, lambda: flights.do("key", fn))
+    assert started.wait(5)
+    waiters, _, errors = _run_concurrently(2, lambda: flights.do("key", fn))
+    _wait_for_waiters(flights, 2)
+    release.set()
+    for thread in leader + waiters:
+        thread.join(5)
+
+    assert [str(error) for error in leader_errors + errors] == ["upstream failed"] * 3
+
+
+def test_key_is_released_after_call():
+    flights = SingleFlight()
+    calls = []
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == (1, False)
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == (2, False)
+    assert flights.shared == 0
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    fn, _ = _blocking_call(started, release, "slow")
+    threads, _, _ = _run_concurrently(1, lambda: flights.do("slow", fn))
+    assert started.wait(5)
+    assert flights.do("fast", lambda: "fast") == ("fast", False)
+    release.set()
+    threads[0].join(5)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setenv("BASE_URL", "http://openrouter.test/api/v1")
+    client = OpenRouterClient(load_models=False)
+    yield client
+    client.session.close()
+
+
+def test_coalesced_callers_get_separate_responses(client, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    posts = []
+
+    def post(url, json=None, stream=False):
+        posts.append(url)
+        started.set()
+        assert release.wait(5)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = b'{"choices": []}'
+        return response
+
+    monkeypatch.setattr(client.session, "post", post)
+    payload = {"model": "test/model", "messages": [], "temperature": 0}
+    leader, results, _ = _run_concurrently(1, lambda: client.post_completion(payload))
+    assert started.wait(5)
+    waiters, shared, _ = _run_concurrently(2, lambda: client.post_completion(payload))
+    _wait_for_waiters(client._flights, 2)
+    release.set()
+    for thread in leader + waiters:
+        thread.join(5)
+
+    responses = results + shared
+    assert len(posts) == 1
+    assert len({id(response) for response in responses}) == 3
+    assert [response.json() for response in responses] == [{"choices": []}] * 3
+    assert all(response.status_code == 200 for response in responses)
+
+
+def test_nonzero_temperature_is_not_coalesced(client, monkeypatch):
+    posts = []
+    monkeypatch.setattr(client.session, "post", lambda *a, **k: posts.append(1) or requests.Response())
+    client.post_completion({"model": "test/model", "messages": [], "temperature": 0.7})
+    client.post_completion({"model": "test/model", "messages": [], "temperature": 0.7})
+    assert len(posts) == 2
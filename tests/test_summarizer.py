@@ -0,0 +1,46 @@
+import pytest
+
+from utils.cache import ChatCache
+from utils.summarizer import ConversationSummarizer
+from utils.tokens import TokenEstimator
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ChatCache(str(tmp_path / "chat_cache.db"))
+    yield cache
+    cache.close()
+
+
+def _conversation(cache, rows):
+    conversation_id = cache.create_conversation()
+    for index in range(rows):
+        cache.save_message("test/model", "abcd" * 25, "abcd" * 25, 1, conversation_id)
+    return conversation_id
+
+
+def test_window_start_moves_only_when_requested(cache):
+    summarizer = ConversationSummarizer(None, cache, TokenEstimator(), model="")
+    conversation_id = _conversation(cache, 10)
+
+    history, tokens = summarizer.build_context(
+        conversation_id, 200, "openai/gpt-4o", update_window=False
+    )
+    assert history and tokens <= 200
+    assert summarizer._window_starts == {}
+
+    assert summarizer.build_context(conversation_id, 200, "openai/gpt-4o") == (history, tokens)
+    assert conversation_id in summarizer._window_starts
+
+
+def test_window_stays_while_history_fits(cache):
+    summarizer = ConversationSummarizer(None, cache, TokenEstimator(), model="")
+    conversation_id = _conversation(cache, 10)
+    summarizer.build_context(conversation_id, 300, "openai/gpt-4o")
+    start = summarizer._window_starts[conversation_id]
+
+    # Новое сообщение помещается в бюджет: начало окна (и префикс запроса) прежнее
+    cache.save_message("test/model", "a", "b", 1, conversation_id)
+    history, _ = summarizer.build_context(conversation_id, 300, "openai/gpt-4o")
+    assert summarizer._window_starts[conversation_id] == start
+    assert history[-1]["content"] == "b"
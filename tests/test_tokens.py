@@ -0,0 +1,51 @@
+import pytest
+
+from utils.tokens import TOKEN_PROFILES, TokenEstimator, model_family
+
+
+def test_model_family():
+    assert model_family("openai/gpt-4o") == "openai"
+    assert model_family("anthropic/claude-3.5-sonnet") == "anthropic"
+    assert model_family("claude-3-haiku") == "anthropic"
+    assert model_family("meta-llama/llama-3.1-70b-instruct") == "meta"
+    assert model_family("unknown/model") == "default"
+    assert model_family(None) == "default"
+
+
+def test_count_by_character_class():
+    tokens = TokenEstimator()
+    assert tokens.count("") == 0
+    assert tokens.count("a") == 1
+    # 40 букв ASCII при 4 символах на токен
+    assert tokens.count("abcd" * 10, "openai/gpt-4o") == 10
+    # Кириллица дороже латиницы, CJK - дороже кириллицы
+    assert tokens.count("абвг" * 10, "openai/gpt-4o") == 16
+    assert tokens.count("漢字" * 10, "openai/gpt-4o") == 20
+    assert tokens.count("!?" * 10, "openai/gpt-4o") == 12
+
+
+def test_count_message_is_cached_by_key():
+    tokens = TokenEstimator()
+    first = tokens.count_message((1, "user"), "abcd" * 10, "openai/gpt-4o")
+    assert first == 10 + TOKEN_PROFILES["openai"]["message"]
+    # Сохраненное сообщение не пересчитывается: текст по ключу не перечитывается
+    assert tokens.count_message((1, "user"), "другой текст", "openai/gpt-4o") == first
+    assert tokens.count_message((1, "user"), "abcd", "anthropic/claude-3") != first
+
+
+def test_trim_history_keeps_latest_rows_within_budget():
+    tokens = TokenEstimator()
+    rows = [(index, "m", "abcd" * 10, "abcd" * 10, "", 0, 0) for index in range(1, 6)]
+    per_row = 2 * (10 + TOKEN_PROFILES["openai"]["message"])
+    messages, total = tokens.trim_history(rows, 2 * per_row + 1, "openai/gpt-4o")
+    assert total == 2 * per_row
+    assert [message["role"] for message in messages] == ["user", "assistant"] * 2
+    assert tokens.trim_history(rows, per_row - 1, "openai/gpt-4o") == ([], 0)
+
+
+def test_estimate_cost():
+    pricing = {"prompt": "0.000001", "completion": "0.000002"}
+    assert TokenEstimator.estimate_cost(pricing, 1000, 500) == pytest.approx(0.002)
+    assert TokenEstimator.estimate_cost(None, 1000) is None
+    assert TokenEstimator.estimate_cost({"prompt": "n/a"}, 1000) is None
+